@@ -0,0 +1,145 @@
+"""Cold-start budget check for STARTUP_MODE=serve (serverless request-serving instances).
+
+Profiles `import server` with `python -X importtime` in a fresh interpreter, then times
+the serve-mode startup hook, and fails (exit 1) when either goes over budget or when a
+module that is supposed to load lazily (Motor/pymongo, emergentintegrations, pyarrow)
+is pulled in at import or startup time.
+
+    python benchmarks/cold_start.py
+    python benchmarks/cold_start.py --import-budget-ms 600 --startup-budget-ms 50 --top 15
+
+Nothing here needs a reachable MongoDB or LLM key.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+IMPORT_BUDGET_MS = 800
+STARTUP_BUDGET_MS = 100
+
+# Loaded on first use only - importing any of these at cold start is a regression
+LAZY_MODULES = ["motor", "pymongo", "bson", "emergentintegrations", "litellm", "pyarrow"]
+
+STARTUP_PROBE = """
+import asyncio, json, os, sys, time
+started = time.perf_counter()
+import server
+imported = time.perf_counter()
+
+async def probe():
+    await server.startup_event()
+    # Sampled before the background warm-up gets to run
+    return time.perf_counter(), [name for name in %r if name in sys.modules]
+
+ready, loaded = asyncio.run(probe())
+print(json.dumps({"import_ms": (imported - started) * 1000, "startup_ms": (ready - imported) * 1000, "loaded": loaded}))
+sys.stdout.flush()
+# Don't sit out the warm-up's Mongo server selection timeout at interpreter exit
+os._exit(0)
+""" % (LAZY_MODULES,)
+
+
+def serve_env() -> dict:
+    env = {
+        **os.environ,
+        "STARTUP_MODE": "serve",
+        "WRITE_BEHIND_SPOOL_DIR": tempfile.mkdtemp(prefix="cold-start-spool-"),
+        "PYTHONDONTWRITEBYTECODE": "1",
+    }
+    # Never contacted - serve mode connects on first use
+    env.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    env.setdefault("DB_NAME", "cold_start")
+    return env
+
+
+def import_profile() -> list:
+    """(self_us, cumulative_us, depth, module) for every import under `import server`"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import server"],
+        cwd=BACKEND_DIR, env=serve_env(), capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        sys.exit(f"import server failed:\n{result.stderr[-2000:]}")
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((int(self_us), int(cumulative_us), depth, name.strip()))
+    return rows
+
+
+def startup_probe() -> dict:
+    result = subprocess.run(
+        [sys.executable, "-c", STARTUP_PROBE],
+        cwd=BACKEND_DIR, env=serve_env(), capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        sys.exit(f"serve-mode startup failed:\n{result.stderr[-2000:]}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def server_subtree(rows: list) -> tuple:
+    """server's own row and the rows for everything it imported"""
+    # -X importtime lists a module after its children: server's subtree is the run of
+    # nested rows right before it
+    end = next(i for i, row in enumerate(rows) if row[3] == "server")
+    start = end
+    while start > 0 and rows[start - 1][2] > 0:
+        start -= 1
+    return rows[end], rows[start:end]
+
+
+def check(rows: list, probe: dict, import_budget_ms: float, startup_budget_ms: float) -> list:
+    """Budget and lazy-import failures for one import profile and startup probe"""
+    server_row, subtree = server_subtree(rows)
+    imported = {row[3] for row in subtree}
+    failures = []
+    if server_row[1] / 1000 > import_budget_ms:
+        failures.append(f"import took {server_row[1] / 1000:.0f}ms, budget {import_budget_ms:.0f}ms")
+    if probe["startup_ms"] > startup_budget_ms:
+        failures.append(f"startup took {probe['startup_ms']:.0f}ms, budget {startup_budget_ms:.0f}ms")
+    eager = sorted({name for name in LAZY_MODULES if name in imported} | set(probe["loaded"]))
+    if eager:
+        failures.append(f"lazily-loaded modules imported at cold start: {', '.join(eager)}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--import-budget-ms", type=float, default=IMPORT_BUDGET_MS,
+                        help="Max cumulative -X importtime for `import server`")
+    parser.add_argument("--startup-budget-ms", type=float, default=STARTUP_BUDGET_MS,
+                        help="Max time for the serve-mode startup hook")
+    parser.add_argument("--top", type=int, default=10, help="Slowest direct imports to list")
+    args = parser.parse_args()
+
+    rows = import_profile()
+    server_row, subtree = server_subtree(rows)
+    # Direct imports are the depth-1 rows
+    direct = sorted((row for row in subtree if row[2] == 1), key=lambda row: row[1], reverse=True)
+
+    print(f"import server: {server_row[1] / 1000:.0f}ms cumulative ({server_row[0] / 1000:.0f}ms in server.py itself)")
+    print("slowest direct imports:")
+    for self_us, cumulative_us, _, name in direct[:args.top]:
+        print(f"  {cumulative_us / 1000:8.1f}ms  {name}")
+
+    probe = startup_probe()
+    print(f"serve-mode startup hook: {probe['startup_ms']:.1f}ms (wall-clock import {probe['import_ms']:.0f}ms)")
+
+    failures = check(rows, probe, args.import_budget_ms, args.startup_budget_ms)
+    if failures:
+        print("FAIL: " + "; ".join(failures))
+        sys.exit(1)
+    print("PASS")
+
+
+if __name__ == "__main__":
+    main()
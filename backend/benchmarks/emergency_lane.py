@@ -0,0 +1,270 @@
+"""Emergency lane: classifier accuracy, its cost on normal traffic, and reply latency under LLM load.
+
+1. Runs the emergency pre-classifier over labelled emergency and routine messages and
+   fails on any miss or false positive.
+2. Times it on routine traffic next to the FAQ matcher, which every request already
+   pays for, and fails if the mean per-message cost is over --overhead-budget-us.
+3. Starts the app under uvicorn with a slow mock LLM and a tiny
+   LLM_MAX_CONCURRENCY, saturates the admission queue with LLM-bound questions, and
+   times emergency messages over real HTTP while the queue is full. It fails if
+   their p95 is over --latency-budget-ms.
+
+    python benchmarks/emergency_lane.py --mongomock
+    python benchmarks/emergency_lane.py --backlog 100 --emergencies 100 --latency-budget-ms 10
+
+Without --mongomock the server uses the Mongo in MONGO_URL. The emergency lane makes no
+Mongo calls on the request path.
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+EMERGENCY_MESSAGES = [
+    "There's a water main break on my street",
+    "Water main broke on Elm St and it's flooding the road",
+    "Sewage is backing up into my basement",
+    "sewer backup in the basement, what do I do",
+    "The sewer is overflowing in my yard",
+    "I have no water at all since this morning",
+    "We've been without water for 3 hours",
+    "Water is gushing up from the street in front of my house",
+    "My toilet is backed up and the tub drain too",
+    "There is no water pressure at all",
+    "Extremely low water pressure in the whole house",
+    "The manhole cover on my road is missing",
+    "There's an open manhole in the middle of the street",
+    "Sewage is coming out of the manhole and the manhole is overflowing",
+    "There's a sinkhole near the hydrant",
+    "The street is flooded, looks like a burst main",
+    "What's the emergency number?",
+]
+
+ROUTINE_MESSAGES = [
+    "Why is my bill so high?",
+    "How do I pay my bill?",
+    "I think I have a leak",
+    "My water tastes like dirt",
+    "I need to start service at my new house",
+    "What are the permit office hours on Wednesday?",
+    "How do I qualify for CAP?",
+    "What is the income limit for a family of four?",
+    "Can I pay with Western Union?",
+    "How long does a commercial permit take?",
+    "Is there a late fee?",
+    "How is my bill calculated?",
+    "Can I get a payment plan?",
+    "How do I check my toilet for a leak?",
+    "Does the water pressure affect my bill?",
+    "How do I read my water meter?",
+    "Can I maintain autopay while I'm traveling?",
+    "Is my water safe to drink?",
+    "How do I stop service when I move out?",
+    "What does the ready-to-serve charge pay for?",
+    # Assistance and billing questions that use emergency vocabulary
+    "How do I apply for the Emergency Relief Fund?",
+    "Is the emergency customer relief fund still open?",
+    "Why does my bill show no water usage this quarter?",
+    "My bill says no water used",
+    "Is there an emergency payment plan?",
+    "Can I get emergency assistance with my bill?",
+    "Do you offer emergency financial help?",
+    "Why is there no water fee on my bill?",
+    "I have no water bill this month",
+    "How long will I be without water during your scheduled maintenance?",
+    "Who do I call about a manhole cover that is loose?",
+]
+
+
+SERVER_ENV = {
+    "LLM_BACKEND": "mock",
+    "MOCK_LLM_FIRST_TOKEN_MS": "1000",
+    "MOCK_LLM_TOKENS_PER_SEC": "0",
+    "LLM_MAX_CONCURRENCY": "2",
+    "LLM_MAX_QUEUE": "10000",
+    "LLM_QUEUE_TIMEOUT": "120",
+    "INDEX_SELF_CHECK": "off",
+    "ANSWER_PROMOTION_ENABLED": "false",
+}
+
+# Off-topic and numbered, so no FAQ, cache or coalesced answer lets it skip the LLM queue
+BACKLOG_MESSAGE = "Request {n}: could you draft a short poem about autumn leaves for my newsletter"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def load_server():
+    """Import the app in this process for the classifier checks"""
+    os.environ.update(SERVER_ENV)
+    os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    os.environ.setdefault("DB_NAME", "emergency_lane")
+    sys.path.insert(0, str(BACKEND_DIR))
+    import server
+    return server
+
+
+def start_server(port: int, spool: str, use_mongomock: bool, verbose: bool) -> subprocess.Popen:
+    """uvicorn in its own process, so the load generator doesn't share the app's event loop"""
+    env = {**os.environ, **SERVER_ENV, "WRITE_BEHIND_SPOOL_DIR": spool}
+    if use_mongomock:
+        # mongomock runs each flush synchronously on the server's event loop, which Motor doesn't;
+        # hold writes until shutdown so that stall doesn't land on the timed requests
+        env.update({"WRITE_BEHIND_FLUSH_INTERVAL": "600", "WRITE_BEHIND_BATCH_SIZE": "100000"})
+        target = ["--factory", "benchmarks.worker_scaling:mongomock_app"]
+    else:
+        target = ["server:app"]
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", *target, "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env,
+        stdout=None if verbose else subprocess.DEVNULL,
+        stderr=None if verbose else subprocess.DEVNULL
+    )
+
+
+def check_accuracy(server) -> list:
+    classify = server.emergency_classifier.classify
+    misses = [m for m in EMERGENCY_MESSAGES if not classify(m)]
+    false_positives = [f"{m!r} ({classify(m)['trigger']!r})" for m in ROUTINE_MESSAGES if classify(m)]
+    print(f"accuracy: {len(EMERGENCY_MESSAGES) - len(misses)}/{len(EMERGENCY_MESSAGES)} emergencies caught, "
+          f"{len(false_positives)}/{len(ROUTINE_MESSAGES)} routine messages misrouted")
+    failures = []
+    if misses:
+        failures.append(f"missed emergencies: {misses}")
+    if false_positives:
+        failures.append(f"routine messages sent to the emergency lane: {false_positives}")
+    return failures
+
+
+def per_message_us(call, messages: list, rounds: int) -> float:
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for message in messages:
+            call(message)
+    return (time.perf_counter() - started) / (rounds * len(messages)) * 1e6
+
+
+def check_overhead(server, budget_us: float) -> list:
+    rounds = 2000
+    lane_us = per_message_us(server.match_emergency, ROUTINE_MESSAGES, rounds)
+    faq_us = per_message_us(server.match_faq, ROUTINE_MESSAGES, rounds // 10)
+    print(f"routine traffic: emergency classifier {lane_us:.2f}us/msg, "
+          f"FAQ matcher {faq_us:.1f}us/msg ({lane_us / faq_us * 100:.1f}% on top of it)")
+    if lane_us > budget_us:
+        return [f"classifier costs {lane_us:.1f}us per routine message, budget {budget_us:.0f}us"]
+    return []
+
+
+async def wait_ready(http: httpx.AsyncClient, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await http.get("/api/", timeout=1)).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.2)
+    sys.exit(f"Server did not come up in {timeout:.0f}s")
+
+
+async def queue_depth(http: httpx.AsyncClient) -> int:
+    return (await http.get("/api/ai/stats")).json()["llm_admission"]["queue_depth"]
+
+
+async def check_latency(server, args) -> list:
+    from wssc import faq
+
+    assert not faq.faq_matcher.match(BACKLOG_MESSAGE.format(n=0)), "backlog message matches an FAQ"
+    port = free_port()
+    spool = tempfile.mkdtemp(prefix="emergency-lane-spool-")
+    proc = start_server(port, spool, args.mongomock, args.verbose)
+    limits = httpx.Limits(max_connections=args.backlog + 10, max_keepalive_connections=args.backlog + 10)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=300, limits=limits) as http:
+            await wait_ready(http)
+
+            async def routine(n: int) -> float:
+                started = time.perf_counter()
+                resp = await http.post("/api/chat", json={
+                    "message": BACKLOG_MESSAGE.format(n=n), "session_id": f"routine-{n}"
+                })
+                resp.raise_for_status()
+                return (time.perf_counter() - started) * 1000
+
+            queued = [asyncio.create_task(routine(n)) for n in range(args.backlog)]
+            deadline = time.monotonic() + 30
+            while (depth := await queue_depth(http)) < args.backlog - int(SERVER_ENV["LLM_MAX_CONCURRENCY"]):
+                if time.monotonic() > deadline:
+                    sys.exit(f"LLM queue never filled (depth {depth})")
+                await asyncio.sleep(0.05)
+
+            # One untimed request opens the keep-alive connection the timed ones reuse
+            await http.post("/api/chat", json={"message": EMERGENCY_MESSAGES[0], "session_id": "emergency-warmup"})
+            latencies = []
+            for n in range(args.emergencies):
+                started = time.perf_counter()
+                resp = await http.post("/api/chat", json={
+                    "message": EMERGENCY_MESSAGES[n % len(EMERGENCY_MESSAGES)], "session_id": f"emergency-{n}"
+                })
+                resp.raise_for_status()
+                latencies.append((time.perf_counter() - started) * 1000)
+                assert resp.json()["source"] == "emergency", resp.json()
+                assert "301-206-4002" in resp.json()["response"]
+            depth_after = await queue_depth(http)
+            routine_ms = await asyncio.gather(*queued)
+    finally:
+        # SIGINT takes the graceful path (lifespan shutdown flushes the write-behind queue)
+        proc.send_signal(2)
+        proc.wait(timeout=60)
+        shutil.rmtree(spool, ignore_errors=True)
+
+    latencies.sort()
+
+    def pct(q):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * q))]
+
+    print(f"LLM queue depth {depth} -> {depth_after} while timing: emergency replies p50 {pct(0.5):.1f}ms, "
+          f"p95 {pct(0.95):.1f}ms, p99 {pct(0.99):.1f}ms, max {latencies[-1]:.1f}ms over HTTP")
+    print(f"queued LLM-bound requests took {statistics.fmean(routine_ms):.0f}ms on average")
+    if pct(0.95) > args.latency_budget_ms:
+        return [f"emergency p95 {pct(0.95):.1f}ms, budget {args.latency_budget_ms:.0f}ms"]
+    return []
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backlog", type=int, default=40, help="LLM-bound requests to queue before timing")
+    parser.add_argument("--emergencies", type=int, default=50, help="Emergency messages to time")
+    parser.add_argument("--overhead-budget-us", type=float, default=10, help="Max classifier cost per routine message")
+    parser.add_argument("--latency-budget-ms", type=float, default=10, help="Max p95 emergency reply time")
+    parser.add_argument("--mongomock", action="store_true", help="Give the server an in-memory mongomock")
+    parser.add_argument("--verbose", action="store_true", help="Show the server's own log output")
+    args = parser.parse_args()
+
+    server = load_server()
+    failures = check_accuracy(server)
+    failures += check_overhead(server, args.overhead_budget_us)
+    failures += await check_latency(server, args)
+
+    if failures:
+        print("FAIL: " + "; ".join(failures))
+        sys.exit(1)
+    print("PASS")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
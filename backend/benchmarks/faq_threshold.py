@@ -0,0 +1,133 @@
+"""Pick FAQ_MATCH_THRESHOLD from labelled queries.
+
+Scores every labelled query with the FAQ matcher, then sweeps thresholds and reports,
+for each one, how many positives get their own intent's canned answer, how many get
+another intent's answer, and how many negatives get a canned answer at all. A wrong
+canned answer costs more than an LLM call, so only thresholds with none are candidates;
+of those, the ones with the best recall form a window, and the recommendation is its
+middle, keeping a margin on both sides for phrasings the labels don't cover.
+
+    python benchmarks/faq_threshold.py
+    python benchmarks/faq_threshold.py --verbose
+
+Exits 1 when the configured FAQ_MATCH_THRESHOLD gives any wrong canned answer.
+Needs no MongoDB.
+"""
+import argparse
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "benchmark")
+
+# (query, intent that should answer it) - phrasings that aren't matcher examples verbatim
+POSITIVE = [
+    ("Why is my water bill so high this time?", "top6:billing_disputes"),
+    ("my bill is way higher than normal", "top6:billing_disputes"),
+    ("I want to dispute my water bill", "top6:billing_disputes"),
+    ("I need help paying my water bill", "top6:payment_assistance"),
+    ("I can't afford to pay my bill", "top6:payment_assistance"),
+    ("Can I get help paying my bill?", "top6:payment_assistance"),
+    ("I think there is a leak in my house", "top6:leaks_high_usage"),
+    ("how can I check my toilet for a leak", "top6:leaks_high_usage"),
+    ("I have a leak", "top6:leaks_high_usage"),
+    ("I have no water", "top6:emergencies"),
+    ("low water pressure", "top6:emergencies"),
+    ("How do I report a water main break?", "top6:emergencies"),
+    ("I need to start my service", "top6:start_stop_service"),
+    ("how do I stop service", "top6:start_stop_service"),
+    ("start or stop service", "top6:start_stop_service"),
+    ("my water smells strange", "top6:water_quality"),
+    ("The water tastes strange", "top6:water_quality"),
+    ("Is my water safe to drink?", "top6:water_quality"),
+    ("How do I pay my bill?", "kb_faq:payment_methods"),
+    ("how can I pay my water bill", "kb_faq:payment_methods"),
+    ("can I pay my bill by phone?", "kb_faq:payment_methods"),
+    ("Where do I pay my bill?", "kb_faq:payment_methods"),
+]
+
+# Queries no canned answer fits - they belong to the LLM (with retrieval)
+NEGATIVE = [
+    "How do I read my bill?",
+    "I paid my bill but it still says overdue",
+    "What is the income limit for the water main replacement program?",
+    "My bill says no water used",
+    "Is there a late fee?",
+    "How do I qualify for CAP?",
+    "What is the income limit for a family of four?",
+    "How long does a commercial permit take?",
+    "What are the permit office hours on Wednesday?",
+    "How is my bill calculated?",
+    "What does the ready-to-serve charge pay for?",
+    "How do I read my water meter?",
+    "Who can repair an underground service line?",
+    "How do I apply for the Emergency Relief Fund?",
+    "Does WSSC have a mobile app?",
+    "When was WSSC founded?",
+    "Can I water my lawn during a drought?",
+    "Why does my bill show an estimated read?",
+    "How do I change the name on my account?",
+    "What is the Bay Restoration fee?",
+]
+
+
+def score(matcher) -> tuple:
+    positives = [(query, intent, matcher.match(query)) for query, intent in POSITIVE]
+    negatives = [(query, matcher.match(query)) for query in NEGATIVE]
+    return positives, negatives
+
+
+def evaluate(threshold: float, positives, negatives) -> dict:
+    def answered(match):
+        return match is not None and match["score"] >= threshold
+
+    return {
+        "correct": sum(1 for _, intent, m in positives if answered(m) and m["intent"] == intent),
+        "misrouted": [q for q, intent, m in positives if answered(m) and m["intent"] != intent],
+        "false_positives": [q for q, m in negatives if answered(m)],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--verbose", action="store_true", help="Print every query's best intent and score")
+    args = parser.parse_args()
+
+    from wssc import faq
+
+    positives, negatives = score(faq.faq_matcher)
+    if args.verbose:
+        for query, intent, match in positives:
+            got = f"{match['intent']} {match['score']:.2f}" if match else "-"
+            print(f"  + {query!r:<70} {got}{'' if match and match['intent'] == intent else '  <- expected ' + intent}")
+        for query, match in negatives:
+            print(f"  - {query!r:<70} {match['intent'] + ' %.2f' % match['score'] if match else '-'}")
+
+    print(f"{'threshold':>9} {'correct':>8} {'misrouted':>9} {'false pos':>9}")
+    clean = []
+    for step in range(20, 100, 5):
+        threshold = step / 100
+        result = evaluate(threshold, positives, negatives)
+        if not result["misrouted"] and not result["false_positives"]:
+            clean.append((result["correct"], threshold))
+        print(f"{threshold:>9.2f} {result['correct']:>5}/{len(positives):<2} {len(result['misrouted']):>9} "
+              f"{len(result['false_positives']):>9}")
+    if clean:
+        best = max(correct for correct, _ in clean)
+        window = [threshold for correct, threshold in clean if correct == best]
+        print(f"no wrong canned answers and best recall ({best}/{len(positives)}) for {window[0]:.2f}-{window[-1]:.2f}: "
+              f"recommend {round((window[0] + window[-1]) / 2 * 20) / 20:.2f}")
+
+    current = evaluate(faq.FAQ_MATCH_THRESHOLD, positives, negatives)
+    print(f"configured FAQ_MATCH_THRESHOLD={faq.FAQ_MATCH_THRESHOLD}: "
+          f"{current['correct']}/{len(positives)} answered locally")
+    if current["misrouted"] or current["false_positives"]:
+        print(f"FAIL: misrouted {current['misrouted']}, false positives {current['false_positives']}")
+        sys.exit(1)
+    print("PASS")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""GET /api/knowledge: per-request serialization vs the precomputed, precompressed payload.
+
+Drives the ASGI apps directly (no sockets, no HTTP client), so CPU per request is the
+server's own work:
+
+- dict via FastAPI: the endpoint returns the KB dict, which goes through
+  jsonable_encoder + JSONResponse on every call. With gzip clients, GZipMiddleware
+  also compresses it on every call.
+- precomputed: the app's ApiResponseCache entry. It is serialized (orjson when
+  installed) and gzip/brotli-compressed once per KB version, then the stored bytes
+  for the client's Accept-Encoding are served as-is.
+
+    python benchmarks/knowledge_payload.py --requests 2000
+
+Needs no MongoDB: the cache entry is filled from the in-code WSSC_KNOWLEDGE_BASE.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "benchmark")
+
+from fastapi import FastAPI  # noqa: E402
+from fastapi.middleware.gzip import GZipMiddleware  # noqa: E402
+
+import server  # noqa: E402
+from wssc.config import API_CACHE_COMPRESS_MIN_BYTES  # noqa: E402
+
+ENCODINGS = {"identity": "identity", "gzip": "gzip, deflate", "br": "br, gzip, deflate"}
+
+
+def dict_app(compress: bool) -> FastAPI:
+    """The endpoint as it was before ApiResponseCache: return the dict, let FastAPI encode it"""
+    application = FastAPI()
+
+    @application.get("/api/knowledge")
+    async def get_full_knowledge_base():
+        return server.WSSC_KNOWLEDGE_BASE
+
+    if compress:
+        application.add_middleware(GZipMiddleware, minimum_size=API_CACHE_COMPRESS_MIN_BYTES)
+    return application
+
+
+async def call(app, accept_encoding: str) -> tuple:
+    """One GET through the ASGI interface; returns (status, content-encoding, body bytes)"""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": "/api/knowledge", "raw_path": b"/api/knowledge", "root_path": "",
+        "query_string": b"", "server": ("bench", 80), "client": ("127.0.0.1", 1234),
+        "headers": [(b"host", b"bench"), (b"accept-encoding", accept_encoding.encode())],
+    }
+    status, encoding, size = 0, "identity", 0
+    requested = False
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # The client stays connected; Starlette cancels this wait once the response is sent
+        await asyncio.Event().wait()
+
+    async def send(message):
+        nonlocal status, encoding, size
+        if message["type"] == "http.response.start":
+            status = message["status"]
+            for name, value in message["headers"]:
+                if name == b"content-encoding":
+                    encoding = value.decode()
+        elif message["type"] == "http.response.body":
+            size += len(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return status, encoding, size
+
+
+async def measure(label: str, app, accept_encoding: str, total: int):
+    for _ in range(20):
+        await call(app, accept_encoding)
+    cpu_started, wall_started = time.process_time(), time.perf_counter()
+    for _ in range(total):
+        status, encoding, size = await call(app, accept_encoding)
+    cpu = time.process_time() - cpu_started
+    wall = time.perf_counter() - wall_started
+    assert status == 200, status
+    print(f"{label:<34} {total / wall:>9.0f} {cpu / total * 1e6:>12.1f} {size:>10} {encoding:>9}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    async def load():
+        return server.WSSC_KNOWLEDGE_BASE
+
+    entry = await server.api_cache.get("knowledge", load)
+    print(f"payload: {len(entry['body'])} bytes JSON, stored encodings: "
+          + ", ".join(f"{name} {len(data)} bytes" for name, data in entry["encoded"].items()))
+    print(f"{'path':<34} {'req/s':>9} {'CPU us/req':>12} {'bytes':>10} {'encoding':>9}")
+
+    plain, gzipped = dict_app(compress=False), dict_app(compress=True)
+    await measure("dict via FastAPI", plain, ENCODINGS["identity"], args.requests)
+    await measure("dict via FastAPI + GZipMiddleware", gzipped, ENCODINGS["gzip"], args.requests)
+    for name, header in ENCODINGS.items():
+        await measure(f"precomputed ({name} client)", server.app, header, args.requests)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
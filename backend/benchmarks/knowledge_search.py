@@ -0,0 +1,99 @@
+"""Knowledge search: per-query latency of the leaf-level BM25 index, and incremental vs full rebuilds.
+
+1. Times search_knowledge() (tokenize, BM25 scoring, phrase filter and snippets, which is
+   everything /api/knowledge/search does apart from HTTP) over a mixed query set. It
+   fails if the p99 is over --budget-us.
+2. Changes one leaf of one section, as a reseed would, and times
+   KnowledgeIndex.update() (re-tokenizes only the changed leaves) against a full build().
+
+    python benchmarks/knowledge_search.py
+    python benchmarks/knowledge_search.py --rounds 5000 --budget-us 500
+
+Needs no MongoDB: the index is the one built at import from the in-code knowledge base.
+"""
+import argparse
+import copy
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "benchmark")
+
+from wssc import retrieval  # noqa: E402
+from wssc.knowledge_base import TOP_6_FAQS  # noqa: E402
+
+QUERIES = [
+    "customer service phone",
+    "late fee",
+    '"payment plan"',
+    "leak toilet",
+    "how do I pay my bill",
+    "water main break emergency",
+    "income limit family of four",
+    '"food coloring" tank',
+    "permit office hours",
+    "why is my bill so high this quarter",
+]
+
+
+def check_latency(rounds: int, budget_us: float) -> list:
+    for query in QUERIES:
+        retrieval.search_knowledge(query)
+    samples = []
+    for n in range(rounds):
+        query = QUERIES[n % len(QUERIES)]
+        started = time.perf_counter()
+        retrieval.search_knowledge(query)
+        samples.append((time.perf_counter() - started) * 1e6)
+    samples.sort()
+
+    def pct(q):
+        return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+    index = retrieval.knowledge_search_index
+    print(f"index: {len(index.texts)} leaves, {len(index.postings)} terms")
+    print(f"query latency over {rounds} queries: p50 {pct(0.5):.0f}us, p99 {pct(0.99):.0f}us, max {samples[-1]:.0f}us")
+    if pct(0.99) > budget_us:
+        return [f"query p99 {pct(0.99):.0f}us, budget {budget_us:.0f}us"]
+    return []
+
+
+def check_rebuild() -> list:
+    sections = copy.deepcopy(retrieval._seed_sections)
+    sections["billing"]["late_payment_fee"] = "6% of unpaid balance"
+    leaves = retrieval.knowledge_leaves(sections, TOP_6_FAQS)
+
+    index = retrieval.KnowledgeIndex().build(retrieval.knowledge_leaves(retrieval._seed_sections, TOP_6_FAQS))
+    started = time.perf_counter()
+    indexed, removed = index.update(leaves)
+    incremental_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    full = retrieval.KnowledgeIndex().build(leaves)
+    full_ms = (time.perf_counter() - started) * 1000
+
+    print(f"one changed leaf: update() {incremental_ms:.2f}ms ({indexed} re-indexed, {removed} removed), "
+          f"full build() {full_ms:.2f}ms")
+    if index.postings != full.postings or index.doc_len != full.doc_len:
+        return ["incrementally updated index differs from a full rebuild"]
+    return []
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=2000, help="Queries to time")
+    parser.add_argument("--budget-us", type=float, default=500, help="Max p99 per query")
+    args = parser.parse_args()
+
+    failures = check_latency(args.rounds, args.budget_us) + check_rebuild()
+    if failures:
+        print("FAIL: " + "; ".join(failures))
+        sys.exit(1)
+    print("PASS")
+
+
+if __name__ == "__main__":
+    main()
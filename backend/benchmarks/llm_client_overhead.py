@@ -0,0 +1,119 @@
+"""Per-request client overhead: new HTTP client per call vs the pooled AnthropicLlmClient.
+
+Runs a local stub that answers like the Anthropic Messages API, so the numbers only
+reflect client setup, connection handling and JSON work - no model latency.
+
+    python benchmarks/llm_client_overhead.py --requests 500 --concurrency 8
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "benchmark")
+
+from wssc.config import LLM_CONNECT_TIMEOUT, LLM_MODEL, LLM_READ_TIMEOUT  # noqa: E402
+from wssc.knowledge_base import WSSC_BASE_PERSONA  # noqa: E402
+from wssc.llm import AnthropicLlmClient  # noqa: E402
+
+STUB_BODY = json.dumps({
+    "id": "msg_stub",
+    "type": "message",
+    "role": "assistant",
+    "content": [{"type": "text", "text": "Stub answer. Was this helpful? Need anything else? 😊"}]
+}).encode()
+
+SYSTEM = WSSC_BASE_PERSONA
+MESSAGES = [{"role": "user", "content": "Why is my bill so high?"}]
+
+
+async def handle_stub(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    """Minimal HTTP/1.1 keep-alive server returning a fixed Messages API response"""
+    try:
+        while True:
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = 0
+            for line in head.split(b"\r\n"):
+                if line.lower().startswith(b"content-length:"):
+                    length = int(line.split(b":", 1)[1])
+            if length:
+                await reader.readexactly(length)
+            writer.write(
+                b"HTTP/1.1 200 OK\r\ncontent-type: application/json\r\n"
+                + f"content-length: {len(STUB_BODY)}\r\n\r\n".encode()
+                + STUB_BODY
+            )
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionResetError):
+        pass
+    finally:
+        writer.close()
+
+
+async def per_request_client(url: str):
+    """Baseline: build (and tear down) a client for every call, like constructing LlmChat per request"""
+    async with httpx.AsyncClient(
+        timeout=httpx.Timeout(LLM_READ_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+        headers={"x-api-key": "stub", "anthropic-version": "2023-06-01"}
+    ) as http:
+        resp = await http.post(url, json={"model": LLM_MODEL, "system": SYSTEM, "messages": MESSAGES})
+        resp.raise_for_status()
+        return resp.json()["content"][0]["text"]
+
+
+async def run(label: str, call, total: int, concurrency: int):
+    latencies = []
+    gate = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with gate:
+            started = time.perf_counter()
+            await call()
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[one() for _ in range(total)])
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    print(
+        f"{label:<28} {total / elapsed:8.0f} req/s   "
+        f"p50 {statistics.median(latencies):6.2f}ms   "
+        f"p95 {latencies[int(len(latencies) * 0.95) - 1]:6.2f}ms   "
+        f"mean {statistics.fmean(latencies):6.2f}ms"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    stub = await asyncio.start_server(handle_stub, "127.0.0.1", 0)
+    url = f"http://127.0.0.1:{stub.sockets[0].getsockname()[1]}/v1/messages"
+
+    pooled = AnthropicLlmClient("stub", url)
+    await pooled.start()
+    # Warm both paths once so import and DNS costs don't land on the first sample
+    await per_request_client(url)
+    await pooled.complete("bench", SYSTEM, MESSAGES)
+
+    print(f"{args.requests} requests, concurrency {args.concurrency}, stub at {url}")
+    await run("client per request (before)", lambda: per_request_client(url), args.requests, args.concurrency)
+    await run("pooled client (after)", lambda: pooled.complete("bench", SYSTEM, MESSAGES), args.requests, args.concurrency)
+
+    await pooled.close()
+    stub.close()
+    await stub.wait_closed()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
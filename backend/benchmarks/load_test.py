@@ -0,0 +1,173 @@
+"""Load test for the chat pipeline: /api/chat, feedback, history and stats.
+
+Reports throughput, p50/p95/p99 latency per route and MongoDB commands per request
+(from the server's command counter in /api/ai/stats).
+
+Against a running server (start it with LLM_BACKEND=mock to keep it offline):
+
+    LLM_BACKEND=mock uvicorn server:app --port 8001
+    python benchmarks/load_test.py --url http://localhost:8001 --requests 2000 --concurrency 50
+
+In-process, against the Mongo in MONGO_URL or mongomock (pip install mongomock-motor;
+mongomock emits no command events, so Mongo op counts read 0):
+
+    python benchmarks/load_test.py --requests 2000 --concurrency 50 --mongomock
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+from pathlib import Path
+
+import httpx
+
+QUESTIONS = [
+    "Why is my bill so high?",
+    "How do I pay my bill?",
+    "I think I have a leak",
+    "My water tastes like dirt",
+    "I need to start service at my new house",
+    "There's a water main break on my street",
+    "What are the permit office hours on Wednesday?",
+    "How do I qualify for CAP?",
+    "What is the income limit for a family of four?",
+    "Can I pay with Western Union?",
+    "How long does a commercial permit take?",
+    "Is there a late fee?",
+    "Who do I call about a manhole cover?",
+    "How is my bill calculated?",
+    "Can I get a payment plan?",
+]
+
+# route -> weight in the traffic mix
+MIX = {"chat": 60, "feedback": 20, "history": 15, "stats": 5}
+
+
+class LoadTest:
+    def __init__(self, http: httpx.AsyncClient, sessions: int):
+        self.http = http
+        self.sessions = [str(uuid.uuid4()) for _ in range(sessions)]
+        self.latencies = {route: [] for route in MIX}
+        self.errors = {route: 0 for route in MIX}
+        self.sources = {}
+
+    async def chat(self):
+        resp = await self.http.post("/api/chat", json={
+            "message": random.choice(QUESTIONS),
+            "session_id": random.choice(self.sessions)
+        })
+        resp.raise_for_status()
+        source = resp.json().get("source", "llm")
+        self.sources[source] = self.sources.get(source, 0) + 1
+
+    async def feedback(self):
+        resp = await self.http.post("/api/chat/feedback", json={
+            "session_id": random.choice(self.sessions),
+            "message_id": str(uuid.uuid4()),
+            "helpful": random.random() < 0.8
+        })
+        resp.raise_for_status()
+
+    async def history(self):
+        resp = await self.http.get(f"/api/chat/history/{random.choice(self.sessions)}")
+        resp.raise_for_status()
+
+    async def stats(self):
+        resp = await self.http.get("/api/ai/stats")
+        resp.raise_for_status()
+
+    async def one(self, route: str):
+        started = time.perf_counter()
+        try:
+            await getattr(self, route)()
+        except Exception:
+            self.errors[route] += 1
+            return
+        self.latencies[route].append((time.perf_counter() - started) * 1000)
+
+    async def mongo_ops(self) -> int:
+        resp = await self.http.get("/api/ai/stats")
+        return sum(resp.json().get("mongo_ops", {}).values())
+
+    async def run(self, total: int, concurrency: int):
+        routes = random.choices(list(MIX), weights=list(MIX.values()), k=total)
+        gate = asyncio.Semaphore(concurrency)
+
+        async def guarded(route):
+            async with gate:
+                await self.one(route)
+
+        ops_before = await self.mongo_ops()
+        started = time.perf_counter()
+        await asyncio.gather(*[guarded(route) for route in routes])
+        elapsed = time.perf_counter() - started
+        # Let write-behind batches land so their ops are counted
+        await asyncio.sleep(1.5)
+        ops_after = await self.mongo_ops()
+        self.report(total, elapsed, ops_after - ops_before)
+
+    def report(self, total: int, elapsed: float, mongo_ops: int):
+        def pct(values, q):
+            return values[min(len(values) - 1, int(len(values) * q))] if values else 0.0
+
+        print(f"{total} requests in {elapsed:.2f}s -> {total / elapsed:.0f} req/s")
+        print(f"{'route':<10} {'count':>6} {'errors':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'mean ms':>8}")
+        for route, values in self.latencies.items():
+            values.sort()
+            print(
+                f"{route:<10} {len(values):>6} {self.errors[route]:>6} {pct(values, 0.5):>8.1f} "
+                f"{pct(values, 0.95):>8.1f} {pct(values, 0.99):>8.1f} "
+                f"{(statistics.fmean(values) if values else 0):>8.1f}"
+            )
+        print(f"chat answered by: {self.sources}")
+        print(f"MongoDB commands: {mongo_ops} total, {mongo_ops / total:.2f} per request")
+
+
+async def in_process_client(use_mongomock: bool):
+    """Import the app with the mock LLM and serve it through an ASGI transport"""
+    os.environ["LLM_BACKEND"] = "mock"
+    os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    os.environ.setdefault("DB_NAME", "load_test")
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    import server
+    from wssc import database
+
+    if use_mongomock:
+        from mongomock_motor import AsyncMongoMockClient
+        database.client = AsyncMongoMockClient()
+        database.mongo_db = database.client[os.environ["DB_NAME"]]
+    await server.startup_event()
+    transport = httpx.ASGITransport(app=server.app)
+    return server, httpx.AsyncClient(transport=transport, base_url="http://load-test", timeout=60)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="Base URL of a running server (default: run in-process)")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=25)
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--mongomock", action="store_true", help="In-process only: use mongomock instead of MONGO_URL")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    server = None
+    if args.url:
+        http = httpx.AsyncClient(base_url=args.url, timeout=60)
+    else:
+        server, http = await in_process_client(args.mongomock)
+    try:
+        await LoadTest(http, args.sessions).run(args.requests, args.concurrency)
+    finally:
+        await http.aclose()
+        if server:
+            await server.shutdown_db_client()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
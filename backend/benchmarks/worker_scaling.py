@@ -0,0 +1,189 @@
+"""Throughput scaling across uvicorn worker processes (WEB_CONCURRENCY=1, 2, 4, ...).
+
+Starts the multi-worker entry point once per worker count with the mock LLM, drives
+it from several load-generator processes (so the client isn't the bottleneck) and
+reports req/s and scaling efficiency relative to a single worker.
+
+Against the Mongo in MONGO_URL (what production runs):
+
+    python benchmarks/worker_scaling.py --workers 1,2,4 --duration 15
+
+With an in-memory mongomock per worker (pip install mongomock-motor; no shared state,
+so it measures the CPU-bound request path only):
+
+    python benchmarks/worker_scaling.py --workers 1,2,4 --mongomock
+
+Scaling can only be near-linear up to the number of physical cores on the box.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# FAQ-path and cacheable questions plus history reads: CPU and Mongo work, no model latency
+QUESTIONS = [
+    "How do I pay my bill?",
+    "I think I have a leak",
+    "There's a water main break on my street",
+    "How do I qualify for CAP?",
+    "Can I get a payment plan?",
+    "Why is my bill so high?",
+]
+
+
+def mongomock_app():
+    """uvicorn --factory target: the normal app with this worker's own mongomock database"""
+    sys.path.insert(0, str(BACKEND_DIR))
+    import server
+    from mongomock_motor import AsyncMongoMockClient
+    from wssc import database
+
+    database.client = AsyncMongoMockClient()
+    database.mongo_db = database.client[os.environ["DB_NAME"]]
+    return server.create_app()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def spool_dir(port: int) -> Path:
+    return BACKEND_DIR / "spool" / f"bench-{port}"
+
+
+def start_server(workers: int, port: int, use_mongomock: bool, verbose: bool) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "WEB_CONCURRENCY": str(workers),
+        "LLM_BACKEND": "mock",
+        "MOCK_LLM_FIRST_TOKEN_MS": "0",
+        "MOCK_LLM_TOKENS_PER_SEC": "0",
+        "INDEX_SELF_CHECK": "off",
+        "ANSWER_PROMOTION_ENABLED": "false",
+        "WRITE_BEHIND_SPOOL_DIR": str(spool_dir(port)),
+    }
+    env.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    env.setdefault("DB_NAME", "worker_scaling")
+    if use_mongomock:
+        target = ["--factory", "benchmarks.worker_scaling:mongomock_app"]
+    else:
+        target = ["server:app"]
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", *target, "--port", str(port), "--workers", str(workers),
+         "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env,
+        # The app logs every chat at INFO, which would bury the results table
+        stdout=None if verbose else subprocess.DEVNULL,
+        stderr=None if verbose else subprocess.DEVNULL
+    )
+
+
+def wait_ready(url: str, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{url}/api/", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server at {url} did not come up in {timeout:.0f}s")
+
+
+async def generate_load(url: str, duration: float, concurrency: int) -> tuple:
+    done, errors = 0, 0
+    deadline = time.monotonic() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=url, timeout=30, limits=limits) as http:
+        async def user(n: int):
+            nonlocal done, errors
+            session_id = f"bench-{os.getpid()}-{n}"
+            while time.monotonic() < deadline:
+                try:
+                    if random.random() < 0.8:
+                        resp = await http.post("/api/chat", json={
+                            "message": random.choice(QUESTIONS), "session_id": session_id
+                        })
+                    else:
+                        resp = await http.get(f"/api/chat/history/{session_id}", params={"limit": 20})
+                    resp.raise_for_status()
+                    done += 1
+                except httpx.HTTPError:
+                    errors += 1
+
+        await asyncio.gather(*[user(n) for n in range(concurrency)])
+    return done, errors
+
+
+def load_process(url: str, duration: float, concurrency: int, results):
+    results.put(asyncio.run(generate_load(url, duration, concurrency)))
+
+
+def measure(workers: int, args) -> float:
+    port = free_port()
+    url = f"http://127.0.0.1:{port}"
+    proc = start_server(workers, port, args.mongomock, args.verbose)
+    try:
+        wait_ready(url)
+        # Warm-up pass so every worker has loaded its caches
+        asyncio.run(generate_load(url, 2, args.concurrency))
+        results = multiprocessing.Queue()
+        clients = [
+            multiprocessing.Process(target=load_process, args=(url, args.duration, args.concurrency, results))
+            for _ in range(args.clients)
+        ]
+        for client in clients:
+            client.start()
+        totals = [results.get() for _ in clients]
+        for client in clients:
+            client.join()
+    finally:
+        # SIGINT takes the graceful path (lifespan shutdown flushes the write-behind queue)
+        proc.send_signal(2)
+        proc.wait(timeout=60)
+        shutil.rmtree(spool_dir(port), ignore_errors=True)
+    done = sum(d for d, _ in totals)
+    errors = sum(e for _, e in totals)
+    rps = done / args.duration
+    print(f"{workers:>7} {rps:>10.0f} {errors:>7}", end="", flush=True)
+    return rps
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", default="1,2,4", help="Comma-separated worker counts to test")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds of load per worker count")
+    parser.add_argument("--clients", type=int, default=max(2, (os.cpu_count() or 2) // 2),
+                        help="Load-generator processes")
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent users per load generator")
+    parser.add_argument("--mongomock", action="store_true", help="Give each worker an in-memory mongomock")
+    parser.add_argument("--verbose", action="store_true", help="Show the server's own log output")
+    args = parser.parse_args()
+
+    counts = [int(n) for n in args.workers.split(",")]
+    print(f"{os.cpu_count()} CPUs, {args.clients} load generators x {args.concurrency} users, {args.duration:.0f}s each")
+    print(f"{'workers':>7} {'req/s':>10} {'errors':>7} {'speedup':>8} {'efficiency':>10}")
+    baseline = None
+    for workers in counts:
+        rps = measure(workers, args)
+        baseline = baseline or rps / workers
+        speedup = rps / baseline
+        print(f" {speedup:>8.2f}x {speedup / workers * 100:>9.0f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Run a file of questions through POST /api/chat/batch and write the streamed results as NDJSON.
+
+Questions come from a text file (one per line) or a JSONL file of {"message": ..., "id": ...}
+objects. Files bigger than the server's batch limit are sent as consecutive batches.
+Results are written as they arrive, one JSON object per line, to --out or stdout.
+Progress and the per-batch summaries go to stderr.
+
+    python chat_batch.py questions.txt --dry-run > answers.ndjson
+    python chat_batch.py evals.jsonl --url http://localhost:8001 --concurrency 8 --no-cache --out answers.ndjson
+
+The endpoint is admin-only: the token comes from --admin-token or ADMIN_TOKEN.
+"""
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+
+import httpx
+
+
+def load_items(path: Path) -> list:
+    items = []
+    for n, line in enumerate(path.read_text().splitlines(), 1):
+        line = line.strip()
+        if not line:
+            continue
+        if path.suffix in (".jsonl", ".ndjson"):
+            data = json.loads(line)
+            items.append({"message": data["message"], "id": str(data.get("id", n))})
+        else:
+            items.append({"message": line, "id": str(n)})
+    return items
+
+
+def run_batch(http: httpx.Client, items: list, args, out) -> dict:
+    """Send one batch, copy its result lines to out as they arrive, return the summary"""
+    payload = {
+        "items": items,
+        "concurrency": args.concurrency,
+        "dry_run": args.dry_run,
+        "use_cache": not args.no_cache
+    }
+    with http.stream("POST", "/api/chat/batch", json=payload) as resp:
+        if resp.status_code != 200:
+            sys.exit(f"Batch rejected ({resp.status_code}): {resp.read().decode()[:500]}")
+        done = 0
+        for line in resp.iter_lines():
+            if not line:
+                continue
+            result = json.loads(line)
+            if result["type"] == "summary":
+                return result
+            out.write(line + "\n")
+            out.flush()
+            done += 1
+            if args.verbose:
+                print(f"[{done}/{len(items)}] {result['source']:<9} {result['latency_ms']:>8.1f}ms  "
+                      f"{result['message'][:60]}", file=sys.stderr)
+    sys.exit("Batch stream ended without a summary (server error or timeout)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("questions", type=Path, help="Text file (one question per line) or JSONL")
+    parser.add_argument("--url", default="http://localhost:8001", help="Backend base URL")
+    parser.add_argument("--admin-token", default=os.environ.get("ADMIN_TOKEN", ""))
+    parser.add_argument("--concurrency", type=int, default=None, help="Questions in flight (server caps it)")
+    parser.add_argument("--batch-size", type=int, default=500, help="Items per request (server's CHAT_BATCH_MAX_ITEMS)")
+    parser.add_argument("--dry-run", action="store_true", help="Persist nothing (no chat_messages, stats or cache)")
+    parser.add_argument("--no-cache", action="store_true", help="Skip the response cache so the LLM answers")
+    parser.add_argument("--out", type=Path, help="Write results here instead of stdout")
+    parser.add_argument("--verbose", action="store_true", help="Print each result's source and latency to stderr")
+    args = parser.parse_args()
+
+    items = load_items(args.questions)
+    if not items:
+        sys.exit(f"No questions in {args.questions}")
+    out = args.out.open("w") if args.out else sys.stdout
+    headers = {"X-Admin-Token": args.admin_token}
+    tokens = {"input_tokens": 0, "output_tokens": 0}
+    try:
+        with httpx.Client(base_url=args.url, headers=headers, timeout=httpx.Timeout(30, read=None)) as http:
+            for start in range(0, len(items), args.batch_size):
+                chunk = items[start:start + args.batch_size]
+                summary = run_batch(http, chunk, args, out)
+                for key in tokens:
+                    tokens[key] += summary["usage"][key]
+                latency = summary["latency_ms"]
+                print(f"batch {summary['batch_id']}: {summary['items']} items in {summary['elapsed_ms'] / 1000:.1f}s, "
+                      f"p50 {latency['p50']:.0f}ms, p95 {latency['p95']:.0f}ms, sources {summary['sources']}",
+                      file=sys.stderr)
+    finally:
+        if args.out:
+            out.close()
+    print(f"{len(items)} questions done{' (dry run)' if args.dry_run else ''}, "
+          f"{tokens['input_tokens']} input / {tokens['output_tokens']} output tokens", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,32 +1,53 @@
-from fastapi import FastAPI, APIRouter
-from dotenv import load_dotenv
+from fastapi import FastAPI, APIRouter, BackgroundTasks, Request, Response, HTTPException
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
 import os
+import sys
+import time
+import json
 import logging
-from pathlib import Path
-from pydantic import BaseModel, Field, ConfigDict
 from typing import List, Optional, Dict, Any
 import uuid
+import asyncio
+from contextlib import aclosing, asynccontextmanager
 from datetime import datetime, timezone
-from emergentintegrations.llm.chat import LlmChat, UserMessage
-
-
-ROOT_DIR = Path(__file__).parent
-load_dotenv(ROOT_DIR / '.env')
-
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
-
-# LLM API Key - Try Emergent key first, fallback to direct Anthropic
-EMERGENT_LLM_KEY = os.environ.get('EMERGENT_LLM_KEY', '')
-ANTHROPIC_API_KEY = os.environ.get('ANTHROPIC_API_KEY', '')
-LLM_API_KEY = EMERGENT_LLM_KEY if EMERGENT_LLM_KEY else ANTHROPIC_API_KEY
-
-# Create the main app without a prefix
-app = FastAPI()
+# motor/pymongo/bson, emergentintegrations and pyarrow are imported where first used - see STARTUP_MODE
+from wssc.config import (
+    ANSWER_PROMOTION_ENABLED, API_CACHE_WATCH, INDEX_SELF_CHECK, MONGO_MAX_POOL_SIZE, PAGE_SIZE_DEFAULT,
+    PROMETHEUS_MULTIPROC_DIR, RETENTION_ENABLED, SEED_LOCK_TTL, SEED_WAIT_TIMEOUT, STARTUP_MODE, WEB_CONCURRENCY
+)
+from wssc.metrics import CHAT_STAGE_LATENCY, LLM_ERRORS, REQUEST_LATENCY
+from wssc.database import acquire_lock, close_mongo, connect_mongo, db, keep_lock, release_lock, wait_for_lock
+from wssc.models import (
+    ChatBatchInput, ChatMessage, ChatResponse, FeedbackBatchInput, FeedbackInput, StatusCheck, StatusCheckCreate
+)
+from wssc.knowledge_base import TOP_6_FAQS, WSSC_KNOWLEDGE_BASE
+from wssc.faq import CHAT_BUSY_RESPONSE, CHAT_ERROR_RESPONSE, match_faq, record_chat_answer
+from wssc.emergency import emergency_classifier, match_emergency
+from wssc.retrieval import knowledge_search_index, leaf_section, search_knowledge
+from wssc.response_cache import compute_kb_version, normalize_question, response_cache
+from wssc.write_behind import write_queue
+from wssc.stats import backfill_stats, record_stats, summarize_stats_doc
+from wssc.context import context_manager
+from wssc.promotion import answer_promoter
+from wssc.indexes import ensure_indexes, verify_query_plans
+from wssc.pagination import decode_cursor, HISTORY_FIELDS, keyset_page, parse_fields, STATUS_FIELDS
+from wssc.retention import (
+    chat_archiver, ensure_ttl_indexes, rate_archived_messages, session_history_page, storage_report
+)
+from wssc.migrations import backfill_feedback_ids, migrate_timestamps
+from wssc.seeding import init_ai_config, init_knowledge_base, refresh_knowledge_index
+from wssc.messages import save_chat_message, save_emergency_exchange
+from wssc.llm import build_llm_messages, llm_admission, llm_client, LlmOverloadedError
+from wssc.worker_stats import worker_stats
+from wssc.api_cache import (
+    api_cache, load_ai_config, load_full_knowledge_base, load_top_6_faqs, section_loader, warm_api_cache,
+    watch_api_cache_sources
+)
+from wssc.export import EXPORT_KINDS, export_ndjson, export_parquet, export_query, iter_file, require_admin
+from wssc.batch import run_chat_batch
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -37,618 +58,12 @@ logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
+# httpx logs every upstream request at INFO
+logging.getLogger("httpx").setLevel(logging.WARNING)
 
 
-# ============== MODELS ==============
-
-class StatusCheck(BaseModel):
-    model_config = ConfigDict(extra="ignore")
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    client_name: str
-    timestamp: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
-
-class StatusCheckCreate(BaseModel):
-    client_name: str
-
-class ChatMessage(BaseModel):
-    message: str
-    session_id: Optional[str] = None
-
-class ChatResponse(BaseModel):
-    response: str
-    session_id: str
-
-class FeedbackInput(BaseModel):
-    session_id: str
-    message_id: str
-    helpful: bool
-    needs_more_info: Optional[bool] = False
-
-
-# ============== WSSC KNOWLEDGE BASE ==============
-
-WSSC_KNOWLEDGE_BASE = {
-    "organization": {
-        "name": "Washington Suburban Sanitary Commission (WSSC Water)",
-        "service_area": "Montgomery County and Prince George's County, Maryland",
-        "customers_served": "1.8-1.9 million residents and businesses",
-        "years_in_operation": "107+ years (founded 1918)",
-        "main_address": "14501 Sweitzer Lane, Laurel, Maryland 20707"
-    },
-    
-    "contact_info": {
-        "customer_service": {
-            "phone": "301-206-4001",
-            "email": "customerservice@wsscwater.com",
-            "hours": "Monday-Friday, 8:00 AM - 6:00 PM",
-            "toll_free": "800-828-6439",
-            "tty": "301-206-8345"
-        },
-        "emergency_24_7": {
-            "phone": "301-206-4002",
-            "purpose": "Water main breaks, sewer emergencies, outages"
-        },
-        "one_stop_shop": {
-            "hours": "Monday-Friday, 8:00 AM - 5:00 PM",
-            "location": "14501 Sweitzer Lane, Laurel, MD 20707"
-        },
-        "permit_services": {
-            "phone": "301-206-4003",
-            "hours": "Monday-Friday, 7:00 AM - 4:00 PM (except Wednesdays: 7:00 AM - 12:00 PM)"
-        }
-    },
-    
-    "billing": {
-        "cycle": "Quarterly (4 times per year) for residential",
-        "measurement": "1,000-gallon increments",
-        "average_consumption": "~70 gallons per person per day",
-        "typical_quarterly_bill": "$150-250 (varies by usage)",
-        "water_component": "~40% of total",
-        "sewer_component": "~60% of total (treatment is more expensive)",
-        "late_payment_fee": "5% of unpaid balance",
-        "flat_rate_sewer": "$166.00 per quarter (if applicable)"
-    },
-    
-    "payment_options": [
-        {"method": "Online", "url": "wsscwater.com/paymybill", "details": "Credit card (Visa, MasterCard, Discover), electronic check"},
-        {"method": "Phone", "number": "301-206-4001", "details": "Credit card, check by phone"},
-        {"method": "Mobile App", "name": "WSSC Water mobile app", "details": "Bill pay, service requests, emergency reporting"},
-        {"method": "Mail", "payable_to": "WSSC Water", "address": "14501 Sweitzer Lane, Laurel, MD 20707"},
-        {"method": "In Person", "location": "One Stop Shop, 14501 Sweitzer Lane, Laurel, MD", "hours": "Monday-Friday, 8:00 AM - 5:00 PM"},
-        {"method": "Drive-Thru", "location": "One Stop Shop location"},
-        {"method": "Automatic Payment", "details": "Bank draft - automatic withdrawal from checking/savings"},
-        {"method": "Western Union Quick Collect", "details": "Posted within 1 hour if paid before 4:30 PM"}
-    ],
-    
-    "assistance_programs": {
-        "cap": {
-            "name": "Customer Assistance Program (CAP)",
-            "eligibility": "Must apply through Maryland Office of Home Energy Programs (OHEP)",
-            "income_limits_fy26": {
-                "1_person": "$31,296/year",
-                "2_people": "$42,300/year",
-                "3_people": "$53,292/year",
-                "4_people": "$64,296/year",
-                "5_people": "$75,300/year",
-                "6_people": "$86,292/year",
-                "7_people": "$97,296/year",
-                "8_people": "$108,300/year",
-                "additional": "Add $11,004 per person over 8"
-            },
-            "benefits": [
-                "Ready-to-Serve charges waived",
-                "Bay Restoration fee exemption",
-                "Only charged for water/sewer usage",
-                "Payment plans up to 48 months",
-                "Late fees permanently waived",
-                "Free annual plumbing leak investigation",
-                "Leak repairs up to $9,000 for homeowners",
-                "High-bill adjustment: 100% of excess water/sewer removed for up to 2 billing cycles in any 3-year period"
-            ],
-            "how_to_apply": [
-                "Apply for energy assistance through OHEP",
-                "Visit dhs.maryland.gov and click Home Energy/Water icon",
-                "Call 1-800-332-6347 for paper application",
-                "Check status: myohepstatus.org",
-                "If OHEP-approved, automatically qualify for CAP"
-            ],
-            "website": "wsscwater.com/CAP"
-        },
-        "get_current": {
-            "name": "Get Current (Temporary Amnesty Program)",
-            "status": "Extended through January 31, 2026",
-            "eligibility": [
-                "Delinquent balance as of October 1, 2025",
-                "Household income below 150% of area median income, OR",
-                "Self-certified financial hardship due to recent federal government actions"
-            ],
-            "option_1": "Pay 50% of full account balance, remaining 50% forgiven. All late fees and turn-on fees waived.",
-            "option_2": "Pay 25% of full account balance, 25% forgiven.",
-            "benefits": [
-                "Balance forgiven within 24 hours of payment",
-                "100% of late payment charges waived",
-                "100% of turn-on fees waived"
-            ],
-            "website": "wsscwater.com/getcurrent"
-        },
-        "emergency_relief": {
-            "name": "Emergency Customer Relief Fund",
-            "partner": "United Way of the National Capital Area",
-            "amount": "One-time assistance up to $750",
-            "eligibility": "Customers struggling with past-due bills",
-            "remaining_funds": "~$1.7 million of $2.4 million available (as of Jan 2026)",
-            "basis": "First-come, first-served"
-        },
-        "payment_plans": {
-            "standard": "Up to 24 months",
-            "cap_customers": "Up to 48 months"
-        },
-        "county_partners": {
-            "montgomery_salvation_army": "301-515-5354",
-            "prince_georges_salvation_army": "301-277-6103"
-        }
-    },
-    
-    "billing_adjustments": {
-        "high_bill": {
-            "eligibility": "Bill shows Average Daily Consumption (ADC) at least 3x comparable or current ADC",
-            "benefit": "WSSC adjusts one high bill, excluding 50% of excess water/sewer charges",
-            "limitation": "One-time only, for one billing period"
-        },
-        "underground_leak": {
-            "eligibility": [
-                "WSSC verifies underground leak caused high usage",
-                "Leak repaired by WSSC-registered master plumber",
-                "Repair documented with receipt",
-                "Usage returned to normal"
-            ],
-            "benefit": "Adjusted bill excludes up to 6 months of excess water/sewer charges",
-            "timeline": "Repair must be completed within 30 days for water charge adjustment"
-        },
-        "cap_leak_adjustment": {
-            "benefit": "100% of excess water/sewer usage removed for up to 2 billing cycles in any 3-year period"
-        }
-    },
-    
-    "emergencies": {
-        "water_examples": ["Water main breaks", "No water service", "Very low water pressure", "Water leaks affecting public areas"],
-        "sewer_examples": ["Sewage backups", "Sanitary sewer overflows", "Manhole issues"],
-        "contact": "301-206-4002 (24/7)",
-        "response_time": "Field crews dispatched, estimated response within 30 minutes for main breaks"
-    },
-    
-    "water_quality": {
-        "safety_record": "107+ years without a drinking water quality violation",
-        "compliance": "Meets all EPA federal drinking water standards",
-        "taste_odor_cause": "Geosmin from algae in Potomac River source water",
-        "taste_odor_safety": "Water remains safe despite taste/odor changes",
-        "customer_action": "Run cold water, use pitcher in refrigerator"
-    },
-    
-    "leak_detection": {
-        "common_sources": ["Toilets (most common residential leak)", "Faucets", "Irrigation systems", "Underground service lines"],
-        "detection_steps": [
-            "Take multiple meter readings when no water is being used",
-            "Check for meter movement",
-            "Inspect for wet areas, unexplained puddles"
-        ],
-        "toilet_test": "Add food coloring to tank. Wait 15 minutes without flushing. If color appears in bowl, you have a leak.",
-        "meter_test": "Turn off all water in home. Check meter. Wait 15 minutes. Check again. If meter moved, you have a leak.",
-        "repair_requirements": {
-            "who_can_repair": "WSSC-registered master plumber",
-            "permit_required": "Yes, obtained from WSSC",
-            "inspection_required": "WSSC Regulatory Services must inspect and approve"
-        }
-    },
-    
-    "permits": {
-        "contact": "301-206-4003",
-        "portal": "wsscwater.com/epermitting",
-        "common_permits": [
-            "Water Service Application (WS-200)",
-            "Backflow Prevention Device",
-            "Fire Suppression Approval",
-            "Sewer Capacity Study",
-            "Corporation Approval",
-            "Plumbing permits for service line work"
-        ],
-        "example_project": {
-            "type": "3-story, 24-unit apartment",
-            "total_fees": "~$8,500",
-            "timeline": "6-8 weeks"
-        }
-    },
-    
-    "online_services": {
-        "customer_portal": "my.wsscwater.com",
-        "registration": "my.wsscwater.com/selfcare/views/public/profile/register-step1.faces",
-        "mobile_app": "WSSC Water",
-        "main_website": "wsscwater.com",
-        "key_pages": {
-            "bill_payment": "/paymybill",
-            "assistance": "/assistance",
-            "get_current": "/getcurrent",
-            "service": "/service",
-            "customer_service": "/customerservice",
-            "read_bill": "/readbill",
-            "rates": "/rates",
-            "cap": "/CAP",
-            "epermitting": "/epermitting"
-        }
-    },
-    
-    "faqs": [
-        {
-            "question": "Why is my bill so high?",
-            "causes": ["Leaks (especially toilets)", "Increased usage (seasonal, guests)", "Irrigation/outdoor water use", "Estimated meter reads"],
-            "resolution": ["Check meter reads and compare to history", "Conduct leak check", "Review usage patterns", "Request billing adjustment if eligible", "Contact Customer Service: 301-206-4001"]
-        },
-        {
-            "question": "Can I get help paying my bill?",
-            "programs": ["Customer Assistance Program (CAP)", "Get Current amnesty", "Emergency Relief Fund ($750)", "Payment plans (24-48 months)", "County partner assistance (Salvation Army)"],
-            "contact": "301-206-4001 or wsscwater.com/assistance"
-        },
-        {
-            "question": "How do I report a water main break?",
-            "answer": "Call 24/7 Emergency Services at 301-206-4002, use WSSC Water mobile app, or email Emergency Services Center. Crews typically dispatched within 30 minutes."
-        },
-        {
-            "question": "How do I start or stop service?",
-            "answer": "Use online forms at wsscwater.com/service or call Customer Service at 301-206-4001. Provide property address, move date, and owner/tenant status."
-        },
-        {
-            "question": "Is my water safe to drink if it tastes or smells different?",
-            "answer": "Yes. WSSC Water meets all EPA standards and has 107+ years without a quality violation. Taste/odor changes are often due to natural algae (Geosmin) in source water. Water remains safe."
-        }
-    ],
-    
-    "statistics": {
-        "call_deflection_targets": {
-            "billing_inquiries": "30-40% of total call volume",
-            "payment_questions": "15-20% of calls",
-            "leak_high_usage": "10-15% of calls",
-            "start_stop_service": "8-10% of calls",
-            "water_quality": "5-8% of calls",
-            "emergencies": "5-7% of calls (must route to 24/7 line)"
-        },
-        "cap_benefits": "Up to $112/year in fee waivers, plus usage-based savings",
-        "emergency_response_time": "30 minutes for water main breaks",
-        "permit_timeline": "6-8 weeks for standard commercial project"
-    },
-    
-    "last_updated": "February 1, 2026",
-    "prepared_for": "Encore Services LLC - WSSC Water AI Demo Project"
-}
-
-
-# ============== TOP 6 CUSTOMER FAQs (Store in MongoDB) ==============
-
-TOP_6_FAQS = {
-    "billing_disputes": {
-        "question": "Why is my bill so high?",
-        "category": "Billing questions / disputes",
-        "answer_guidance": """
-        1. First, help them understand what might cause a high bill - check meter reads, compare to past usage
-        2. Walk them through the "Resolving Billing Issues" process
-        3. Let them know they can submit a Billing Adjustment Request online if bill is larger than expected
-        4. Mention escalation paths: Refund Hearings and Dispute Resolving Board if still unresolved
-        5. Direct them to wsscwater.com for online forms or call 301-206-4001
-        """
-    },
-    "payment_assistance": {
-        "question": "I need help paying my bill",
-        "category": "Payment arrangements / assistance",
-        "answer_guidance": """
-        1. WSSC offers flexible payment plans for eligible residential customers
-        2. Mention the "Get Current" amnesty program - pay 50% and other 50% forgiven (through Jan 31, 2026)
-        3. Emergency Relief Fund through United Way - up to $750 one-time help
-        4. CAP (Customer Assistance Program) for long-term help - payment plans up to 48 months
-        5. County assistance: Montgomery Salvation Army 301-515-5354, Prince George's 301-277-6103
-        6. Direct them to wsscwater.com/assistance or call 301-206-4001
-        """
-    },
-    "leaks_high_usage": {
-        "question": "I think I have a leak",
-        "category": "Leaks / high usage detection and bill adjustments",
-        "answer_guidance": """
-        1. Help them detect leaks: Take multiple meter readings when no water is being used
-        2. Toilet test: Add food coloring to tank, wait 15 min - if color appears in bowl, there's a leak
-        3. Check common sources: toilets (most common), faucets, irrigation systems
-        4. If leak is fixed and usage returns to normal, they may qualify for partial forgiveness of excess usage
-        5. CAP customers can get 100% of excess removed for up to 2 billing cycles
-        6. Submit adjustment request after repair - need documentation showing repair was completed
-        """
-    },
-    "emergencies": {
-        "question": "I have no water or low pressure",
-        "category": "Service emergencies / outages",
-        "answer_guidance": """
-        1. This is handled 24/7 through the Emergency Services Center: 301-206-4002
-        2. Can also report via WSSC Water mobile app or email
-        3. Response time is typically within 30 minutes for water main breaks
-        4. WSSC publishes sanitary sewer overflow reports and storm/emergency updates
-        5. Check wsscwater.com for current outage information and updates
-        """
-    },
-    "start_stop_service": {
-        "question": "Start or stop my service",
-        "category": "Start / stop / transfer service",
-        "answer_guidance": """
-        1. Online Start/Stop Service forms available at wsscwater.com/service
-        2. Forms work for both owner-occupied and tenant-occupied properties
-        3. For starting: Need property address, move-in date, owner/tenant status, contact info
-        4. For stopping: Need property address, move-out date, forwarding address for final bill
-        5. No phone call required - forms feed directly into customer service/billing systems
-        6. Can also call 301-206-4001 if prefer to speak with someone
-        """
-    },
-    "water_quality": {
-        "question": "My water tastes or smells strange",
-        "category": "Water quality concerns",
-        "answer_guidance": """
-        1. Reassure them: WSSC Water meets all EPA standards - 107+ years without a quality violation
-        2. Common cause of taste/odor: Geosmin from natural algal activity in the Potomac River
-        3. The water IS SAFE to drink even if taste/odor is different
-        4. WSSC adjusts treatment processes where possible
-        5. Running cold water or using a pitcher in the refrigerator can help with taste
-        6. Flushing lines may not always resolve taste/odor issues, but water remains safe
-        7. For persistent concerns, request a water quality investigation: 301-206-4001
-        """
-    }
-}
-
-
-# ============== AI SYSTEM MESSAGE WITH KNOWLEDGE BASE REFERENCE ==============
-
-WSSC_SYSTEM_MESSAGE = """You are the WSSC Water AI Assistant - a friendly, knowledgeable customer service representative for WSSC Water, serving 1.8 million Maryland customers.
-
-YOUR GOAL: Help customers quickly with accurate information so they don't need to call. Be their friend, be helpful, be clear.
-
-IMPORTANT RULES:
-- Be FRIENDLY and conversational - you're talking to a real person who needs help
-- Keep responses SHORT but DETAILED - no walls of text
-- Break up longer answers into clear sections with line breaks
-- NO EMOJIS except for the smiley face at the end
-- Always use EXACT phone numbers, websites, and program details from the knowledge base
-- ALWAYS end with: "Was this helpful? Need anything else?" followed by a smiley face
-
-KEY CONTACT INFO (use these exactly):
-- Customer Service: 301-206-4001 (Mon-Fri, 8am-6pm)
-- 24/7 Emergency Line: 301-206-4002
-- Website: wsscwater.com
-- Customer Portal: my.wsscwater.com
-
-===========================================
-TOP 6 QUESTIONS AND HOW TO ANSWER THEM:
-===========================================
-
-1. "WHY IS MY BILL SO HIGH?" (Billing questions/disputes)
-
-Help them understand and resolve:
-- Walk them through checking their meter reads and comparing to past usage
-- Explain they can submit a Billing Adjustment Request online at wsscwater.com if the bill is larger than expected
-- If they still disagree after review, there are escalation paths: Refund Hearings and the Dispute Resolving Board
-- Common causes: leaks (especially toilets), seasonal changes, guests, irrigation
-
-2. "I NEED HELP PAYING MY BILL" (Payment assistance)
-
-WSSC has several programs:
-- Flexible payment plans available for eligible residential customers
-- "Get Current" amnesty program (through Jan 31, 2026): Pay 50% and the other 50% is forgiven! All late fees waived.
-- Emergency Relief Fund: Up to $750 one-time assistance through United Way partnership
-- CAP (Customer Assistance Program): Long-term help with payment plans up to 48 months, fees waived, late fees permanently waived
-- County assistance: Montgomery Salvation Army 301-515-5354, Prince George's Salvation Army 301-277-6103
-- Apply at wsscwater.com/assistance or call 301-206-4001
-
-3. "I THINK I HAVE A LEAK" (Leaks/high usage)
-
-Help them detect and get adjustments:
-- Take multiple meter readings when no water is being used - if meter moves, there's a leak
-- Toilet test: Add food coloring to tank, wait 15 minutes without flushing - if color appears in bowl, the toilet is leaking
-- Common leak sources: toilets (number one cause), faucets, irrigation systems, underground lines
-- If they fix the leak and usage returns to normal, they may qualify for partial forgiveness of excess charges
-- CAP customers: Can get 100% of excess removed for up to 2 billing cycles in any 3-year period
-- After repair, submit adjustment request with documentation at wsscwater.com
-
-4. "I HAVE NO WATER OR LOW PRESSURE" (Emergencies)
-
-This needs immediate attention:
-- Call the 24/7 Emergency Line right away: 301-206-4002
-- Can also report via WSSC Water mobile app
-- For water main breaks, crews are typically dispatched within 30 minutes
-- Check wsscwater.com for current outage information and updates
-- WSSC publishes sanitary sewer overflow reports and storm/emergency operations updates
-
-5. "START OR STOP MY SERVICE" (Service changes)
-
-Easy online process:
-- Online forms at wsscwater.com/service - no phone call required
-- Works for both owner-occupied and tenant-occupied properties
-- To start: Need property address, move-in date, owner/tenant status, contact info
-- To stop: Need property address, move-out date, forwarding address for final bill
-- Forms go directly into the billing system, so less back-and-forth
-- Can also call 301-206-4001 if they prefer to speak with someone
-
-6. "MY WATER TASTES OR SMELLS STRANGE" (Water quality)
-
-Reassure and explain:
-- The water IS SAFE - WSSC Water meets all EPA federal standards and has gone 107+ years without a drinking water quality violation
-- Common cause of taste/odor: Geosmin from natural algal activity in the Potomac River source water
-- This is harmless - just affects taste and smell
-- Tips: Run cold water for a minute, use a pitcher in the refrigerator
-- Flushing lines won't always fix taste/odor, but the water remains completely safe
-- WSSC adjusts treatment processes where possible
-- For persistent concerns, they can request a water quality investigation by calling 301-206-4001
-
-===========================================
-RESPONSE FORMAT:
-===========================================
-
-Start with a friendly greeting that acknowledges their concern.
-
-Give them the direct answer or solution in 2-3 short paragraphs maximum.
-
-Include specific next steps with exact links or phone numbers.
-
-ALWAYS end with:
-"Was this helpful? Need anything else?" and a smiley face
-
-Example ending: "Was this helpful? Need anything else? 😊"
-
-Remember: Every question you answer well is one less phone call to the call center. Be helpful, be accurate, be friendly!
-"""
-
-
-# ============== DATABASE INITIALIZATION ==============
-
-async def init_knowledge_base():
-    """Initialize WSSC knowledge base in MongoDB"""
-    try:
-        # Store the main knowledge base
-        existing = await db.knowledge_base.find_one({"type": "wssc_main"})
-        if not existing:
-            await db.knowledge_base.insert_one({
-                "type": "wssc_main",
-                "data": WSSC_KNOWLEDGE_BASE,
-                "created_at": datetime.now(timezone.utc).isoformat(),
-                "updated_at": datetime.now(timezone.utc).isoformat()
-            })
-            logger.info("WSSC Knowledge Base initialized in MongoDB")
-        else:
-            await db.knowledge_base.update_one(
-                {"type": "wssc_main"},
-                {"$set": {
-                    "data": WSSC_KNOWLEDGE_BASE,
-                    "updated_at": datetime.now(timezone.utc).isoformat()
-                }}
-            )
-            logger.info("WSSC Knowledge Base updated in MongoDB")
-        
-        # Store individual sections for quick lookup
-        sections = [
-            ("organization", WSSC_KNOWLEDGE_BASE["organization"]),
-            ("contact_info", WSSC_KNOWLEDGE_BASE["contact_info"]),
-            ("billing", WSSC_KNOWLEDGE_BASE["billing"]),
-            ("payment_options", WSSC_KNOWLEDGE_BASE["payment_options"]),
-            ("assistance_programs", WSSC_KNOWLEDGE_BASE["assistance_programs"]),
-            ("billing_adjustments", WSSC_KNOWLEDGE_BASE["billing_adjustments"]),
-            ("emergencies", WSSC_KNOWLEDGE_BASE["emergencies"]),
-            ("water_quality", WSSC_KNOWLEDGE_BASE["water_quality"]),
-            ("leak_detection", WSSC_KNOWLEDGE_BASE["leak_detection"]),
-            ("permits", WSSC_KNOWLEDGE_BASE["permits"]),
-            ("online_services", WSSC_KNOWLEDGE_BASE["online_services"]),
-            ("faqs", WSSC_KNOWLEDGE_BASE["faqs"]),
-            ("statistics", WSSC_KNOWLEDGE_BASE["statistics"])
-        ]
-        
-        for section_name, section_data in sections:
-            await db.knowledge_base.update_one(
-                {"type": f"wssc_{section_name}"},
-                {"$set": {
-                    "type": f"wssc_{section_name}",
-                    "data": section_data,
-                    "updated_at": datetime.now(timezone.utc).isoformat()
-                }},
-                upsert=True
-            )
-        
-        logger.info(f"Stored {len(sections)} knowledge base sections in MongoDB")
-        
-        # Store Top 6 FAQs separately for quick reference
-        await db.knowledge_base.update_one(
-            {"type": "top_6_faqs"},
-            {"$set": {
-                "type": "top_6_faqs",
-                "data": TOP_6_FAQS,
-                "updated_at": datetime.now(timezone.utc).isoformat()
-            }},
-            upsert=True
-        )
-        logger.info("Top 6 FAQs stored in MongoDB")
-        
-    except Exception as e:
-        logger.error(f"Error initializing knowledge base: {e}")
-
-
-async def init_ai_config():
-    """Initialize AI training config in MongoDB"""
-    try:
-        ai_config = {
-            "config_id": "wssc_ai_v3",
-            "name": "WSSC Water AI Assistant",
-            "version": "3.0",
-            "created_at": datetime.now(timezone.utc).isoformat(),
-            "updated_at": datetime.now(timezone.utc).isoformat(),
-            "system_message": WSSC_SYSTEM_MESSAGE,
-            
-            "personality": {
-                "tone": "friendly, warm, helpful, conversational",
-                "style": "like talking to a helpful friend",
-                "empathy_level": "high",
-                "formality": "casual but professional"
-            },
-            
-            "response_rules": {
-                "max_paragraphs": 3,
-                "use_bullets": True,
-                "use_emojis": False,
-                "only_smiley_face": True,
-                "mobile_optimized": True,
-                "always_ask_feedback": True,
-                "feedback_ending": "Was this helpful? Need anything else? 😊"
-            },
-            
-            "top_6_questions": list(TOP_6_FAQS.keys()),
-            
-            "feedback_prompts": {
-                "after_response": "Was this helpful? Need anything else? 😊",
-                "no_response_timeout": "I didn't see a response - I hopefully answered your questions. Have a great day!",
-                "positive_feedback": "Great! Is there anything else I can help with? 😊",
-                "needs_more_info": "No problem! Let me give you more details..."
-            },
-            
-            "knowledge_base_reference": "wssc_main",
-            "goal": "Reduce call center volume by providing quick, accurate, friendly answers using official WSSC data"
-        }
-        
-        await db.ai_config.update_one(
-            {"config_id": "wssc_ai_v3"},
-            {"$set": ai_config},
-            upsert=True
-        )
-        logger.info("AI config v3 with Top 6 FAQs saved to MongoDB")
-        
-    except Exception as e:
-        logger.error(f"Error initializing AI config: {e}")
-
-
-async def save_chat_message(session_id: str, role: str, content: str, message_id: str = None):
-    """Save chat message to MongoDB for history and training"""
-    try:
-        message_doc = {
-            "message_id": message_id or str(uuid.uuid4()),
-            "session_id": session_id,
-            "role": role,
-            "content": content,
-            "timestamp": datetime.now(timezone.utc).isoformat(),
-            "feedback": None,
-            "helpful": None
-        }
-        await db.chat_messages.insert_one(message_doc)
-        return message_doc["message_id"]
-    except Exception as e:
-        logger.error(f"Error saving chat message: {e}")
-        return None
-
-
-async def get_knowledge_section(section: str) -> Dict[str, Any]:
-    """Get a specific section from the knowledge base"""
-    try:
-        doc = await db.knowledge_base.find_one({"type": f"wssc_{section}"}, {"_id": 0})
-        return doc.get("data", {}) if doc else {}
-    except Exception as e:
-        logger.error(f"Error getting knowledge section: {e}")
-        return {}
+def sse_event(data: Dict[str, Any]) -> str:
+    return f"data: {json.dumps(data)}\n\n"
 
 
 # ============== ROUTES ==============
@@ -662,90 +77,345 @@ async def root():
 async def create_status_check(input: StatusCheckCreate):
     status_dict = input.model_dump()
     status_obj = StatusCheck(**status_dict)
-    doc = status_obj.model_dump()
-    doc['timestamp'] = doc['timestamp'].isoformat()
-    await db.status_checks.insert_one(doc)
+    await db.status_checks.insert_one(status_obj.model_dump())
     return status_obj
 
 
-@api_router.get("/status", response_model=List[StatusCheck])
-async def get_status_checks():
-    status_checks = await db.status_checks.find({}, {"_id": 0}).to_list(1000)
-    for check in status_checks:
-        if isinstance(check['timestamp'], str):
-            check['timestamp'] = datetime.fromisoformat(check['timestamp'])
-    return status_checks
+@api_router.get("/status")
+async def get_status_checks(
+    response: Response, cursor: Optional[str] = None, limit: int = PAGE_SIZE_DEFAULT, fields: Optional[str] = None
+):
+    """Status checks oldest first, one page at a time (next page cursor in X-Next-Cursor)"""
+    checks, next_cursor = await keyset_page(
+        db.status_checks, {}, "id", cursor, limit, parse_fields(fields, STATUS_FIELDS)
+    )
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return checks
 
 
 @api_router.post("/chat", response_model=ChatResponse)
-async def chat_with_ai(chat_input: ChatMessage):
+async def chat_with_ai(chat_input: ChatMessage, background_tasks: BackgroundTasks):
     """Handle chat messages using Anthropic Claude API with Knowledge Base"""
     try:
         session_id = chat_input.session_id or str(uuid.uuid4())
+        user_message_id = str(uuid.uuid4())
+        reply_id = str(uuid.uuid4())
+        
+        # Emergency lane: templated 24/7-line reply, no context load, admission queue or write wait
+        started = time.perf_counter()
+        emergency = match_emergency(chat_input.message)
+        if emergency:
+            background_tasks.add_task(
+                save_emergency_exchange, session_id, chat_input.message, emergency, user_message_id, reply_id
+            )
+            record_chat_answer("emergency")
+            logger.warning(
+                f"Emergency lane ({emergency['category']}: '{emergency['trigger']}') answered session {session_id} "
+                f"in {(time.perf_counter() - started) * 1000:.1f}ms"
+            )
+            return ChatResponse(
+                response=emergency["answer"], session_id=session_id, source="emergency",
+                message_id=reply_id, user_message_id=user_message_id
+            )
         
         # Save user message to MongoDB
         await save_chat_message(
             session_id=session_id,
             role="user",
-            content=chat_input.message
+            content=chat_input.message,
+            message_id=user_message_id
         )
         
-        # Initialize the chat with Claude via Emergent LLM key
-        chat = LlmChat(
-            api_key=LLM_API_KEY,
-            session_id=session_id,
-            system_message=WSSC_SYSTEM_MESSAGE
-        ).with_model("anthropic", "claude-sonnet-4-5-20250929")
+        with CHAT_STAGE_LATENCY.labels("context_load").time():
+            ctx = await context_manager.get(session_id)
+        
+        # Answer Top 6 / KB FAQs directly when the intent match is confident
+        faq = match_faq(chat_input.message)
+        if faq:
+            await save_chat_message(
+                session_id=session_id,
+                role="assistant",
+                content=faq["answer"],
+                message_id=reply_id,
+                source=faq["source"],
+                reply_to=user_message_id,
+                first_turn=ctx.is_empty
+            )
+            await context_manager.record_exchange(ctx, chat_input.message, faq["answer"])
+            record_chat_answer(faq["source"])
+            logger.info(
+                f"FAQ fast path ({faq['intent']}, score {faq['score']:.2f}) answered session {session_id} "
+                f"in {(time.perf_counter() - started) * 1000:.1f}ms"
+            )
+            return ChatResponse(
+                response=faq["answer"], session_id=session_id, source=faq["source"],
+                message_id=reply_id, user_message_id=user_message_id
+            )
         
-        # Create user message
-        user_message = UserMessage(text=chat_input.message)
+        # Reuse the answer to a near-identical earlier question (follow-ups depend on context)
+        cached = None
+        if ctx.is_empty:
+            with CHAT_STAGE_LATENCY.labels("cache_lookup").time():
+                cached = await response_cache.lookup(chat_input.message)
+        if cached:
+            await save_chat_message(
+                session_id=session_id,
+                role="assistant",
+                content=cached["response"],
+                message_id=reply_id,
+                source="cache",
+                reply_to=user_message_id,
+                first_turn=True
+            )
+            await context_manager.record_exchange(ctx, chat_input.message, cached["response"])
+            record_chat_answer("cache")
+            logger.info(f"Response cache hit (similarity {cached['score']:.2f}) for session {session_id}")
+            return ChatResponse(
+                response=cached["response"], session_id=session_id, source="cache",
+                message_id=reply_id, user_message_id=user_message_id
+            )
+        
+        async def ask_llm():
+            with CHAT_STAGE_LATENCY.labels("prompt_assembly").time():
+                system, messages = build_llm_messages(ctx, chat_input.message)
+            llm_started = time.perf_counter()
+            reply = await llm_client.complete(session_id, system, messages)
+            # Whole completions: the first token arrives with the last
+            elapsed = time.perf_counter() - llm_started
+            CHAT_STAGE_LATENCY.labels("llm_first_token").observe(elapsed)
+            CHAT_STAGE_LATENCY.labels("llm_total").observe(elapsed)
+            return reply
         
-        # Send message and get response
-        response = await chat.send_message(user_message)
+        # First-turn questions don't depend on context, so identical ones in flight can share a call
+        coalesce_key = normalize_question(chat_input.message) if ctx.is_empty else None
+        response = await llm_admission.run(session_id, ask_llm, coalesce_key=coalesce_key)
+        first_turn = ctx.is_empty
+        if first_turn:
+            await response_cache.store(chat_input.message, response)
+        await context_manager.record_exchange(ctx, chat_input.message, response)
         
         # Save assistant response to MongoDB
         await save_chat_message(
             session_id=session_id,
             role="assistant",
-            content=response
+            content=response,
+            message_id=reply_id,
+            source="llm",
+            reply_to=user_message_id,
+            first_turn=first_turn
         )
+        record_chat_answer("llm")
         
         logger.info(f"Chat response generated for session {session_id}")
         
         return ChatResponse(
             response=response,
-            session_id=session_id
+            session_id=session_id,
+            message_id=reply_id,
+            user_message_id=user_message_id
+        )
+    except LlmOverloadedError as e:
+        record_chat_answer("busy")
+        LLM_ERRORS.labels("overloaded").inc()
+        logger.warning(f"Chat request shed: {e}")
+        return ChatResponse(
+            response=CHAT_BUSY_RESPONSE,
+            session_id=chat_input.session_id or str(uuid.uuid4()),
+            source="busy"
         )
     except Exception as e:
+        record_chat_answer("error")
         logger.error(f"Error in chat endpoint: {str(e)}")
-        error_response = "I'm sorry, I'm having a little trouble right now. Please try again in a moment, or call us at 301-206-4001 for immediate help.\n\nWas this helpful? Need anything else? 😊"
         return ChatResponse(
-            response=error_response,
-            session_id=chat_input.session_id or str(uuid.uuid4())
+            response=CHAT_ERROR_RESPONSE,
+            session_id=chat_input.session_id or str(uuid.uuid4()),
+            source="error"
         )
 
 
-@api_router.post("/chat/feedback")
-async def submit_feedback(feedback: FeedbackInput):
-    """Save user feedback on AI responses"""
-    try:
-        await db.chat_messages.update_one(
-            {"session_id": feedback.session_id, "role": "assistant"},
-            {"$set": {
-                "feedback": "helpful" if feedback.helpful else "not_helpful",
-                "helpful": feedback.helpful,
-                "needs_more_info": feedback.needs_more_info,
-                "feedback_at": datetime.now(timezone.utc).isoformat()
-            }}
+@api_router.post("/chat/stream")
+async def chat_stream(chat_input: ChatMessage, request: Request):
+    """Stream the assistant's reply as Server-Sent Events"""
+    session_id = chat_input.session_id or str(uuid.uuid4())
+    user_message_id = str(uuid.uuid4())
+    reply_id = str(uuid.uuid4())
+    
+    emergency = match_emergency(chat_input.message)
+    if emergency:
+        record_chat_answer("emergency")
+        logger.warning(f"Emergency lane ({emergency['category']}: '{emergency['trigger']}') answered session {session_id}")
+        events = [
+            sse_event({"type": "token", "text": emergency["answer"]}),
+            sse_event({"type": "done", "session_id": session_id, "source": "emergency", "message_id": reply_id})
+        ]
+        return StreamingResponse(
+            iter(events),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+            background=BackgroundTask(
+                save_emergency_exchange, session_id, chat_input.message, emergency, user_message_id, reply_id
+            )
         )
+    
+    await save_chat_message(
+        session_id=session_id,
+        role="user",
+        content=chat_input.message,
+        message_id=user_message_id
+    )
+    
+    with CHAT_STAGE_LATENCY.labels("context_load").time():
+        ctx = await context_manager.get(session_id)
+    
+    async def event_stream():
+        # FAQ and cached answers are complete already - send them in one event
+        canned, source = None, None
+        faq = match_faq(chat_input.message)
+        if faq:
+            canned, source = faq["answer"], faq["source"]
+        elif ctx.is_empty:
+            with CHAT_STAGE_LATENCY.labels("cache_lookup").time():
+                cached = await response_cache.lookup(chat_input.message)
+            if cached:
+                canned, source = cached["response"], "cache"
+        if canned:
+            await save_chat_message(
+                session_id=session_id,
+                role="assistant",
+                content=canned,
+                message_id=reply_id,
+                source=source,
+                reply_to=user_message_id,
+                first_turn=ctx.is_empty
+            )
+            await context_manager.record_exchange(ctx, chat_input.message, canned)
+            record_chat_answer(source)
+            yield sse_event({"type": "token", "text": canned})
+            yield sse_event({"type": "done", "session_id": session_id, "source": source, "message_id": reply_id})
+            return
+        
+        parts = []
+        try:
+            async with llm_admission.slot(session_id):
+                with CHAT_STAGE_LATENCY.labels("prompt_assembly").time():
+                    system, messages = build_llm_messages(ctx, chat_input.message)
+                llm_started = time.perf_counter()
+                async with aclosing(llm_client.stream(session_id, system, messages)) as tokens:
+                    async for text in tokens:
+                        if await request.is_disconnected():
+                            # Leaving the block closes the upstream HTTP stream
+                            logger.info(f"Client disconnected, cancelled generation for session {session_id}")
+                            return
+                        if not parts:
+                            CHAT_STAGE_LATENCY.labels("llm_first_token").observe(time.perf_counter() - llm_started)
+                        parts.append(text)
+                        yield sse_event({"type": "token", "text": text})
+                CHAT_STAGE_LATENCY.labels("llm_total").observe(time.perf_counter() - llm_started)
+        except asyncio.CancelledError:
+            logger.info(f"Stream cancelled for session {session_id}")
+            raise
+        except LlmOverloadedError as e:
+            record_chat_answer("busy")
+            LLM_ERRORS.labels("overloaded").inc()
+            logger.warning(f"Chat stream shed: {e}")
+            yield sse_event({"type": "token", "text": CHAT_BUSY_RESPONSE})
+            yield sse_event({"type": "done", "session_id": session_id, "source": "busy"})
+            return
+        except Exception as e:
+            record_chat_answer("error")
+            logger.error(f"Error in chat stream: {str(e)}")
+            yield sse_event({"type": "token", "text": CHAT_ERROR_RESPONSE})
+            yield sse_event({"type": "done", "session_id": session_id, "source": "error"})
+            return
         
-        await db.feedback.insert_one({
-            "session_id": feedback.session_id,
-            "message_id": feedback.message_id,
+        response = "".join(parts)
+        first_turn = ctx.is_empty
+        if first_turn:
+            await response_cache.store(chat_input.message, response)
+        await context_manager.record_exchange(ctx, chat_input.message, response)
+        await save_chat_message(
+            session_id=session_id,
+            role="assistant",
+            content=response,
+            message_id=reply_id,
+            source="llm",
+            reply_to=user_message_id,
+            first_turn=first_turn
+        )
+        record_chat_answer("llm")
+        logger.info(f"Streamed chat response for session {session_id}")
+        yield sse_event({"type": "done", "session_id": session_id, "source": "llm", "message_id": reply_id})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@api_router.post("/chat/batch")
+async def chat_batch(batch: ChatBatchInput, request: Request):
+    """Answer many questions with bounded concurrency, streaming NDJSON results as they complete"""
+    require_admin(request)
+    batch_id = uuid.uuid4().hex[:12]
+    logger.info(f"Chat batch {batch_id}: {len(batch.items)} items{' (dry run)' if batch.dry_run else ''}")
+    return StreamingResponse(
+        run_chat_batch(batch, batch_id),
+        media_type="application/x-ndjson",
+        headers={"X-Batch-Id": batch_id}
+    )
+
+
+def feedback_target(feedback: FeedbackInput) -> tuple:
+    """(filter, update) for the rated assistant message, addressed by its message_id"""
+    return (
+        {"message_id": feedback.message_id, "session_id": feedback.session_id, "role": "assistant"},
+        {"$set": {
+            "feedback": "helpful" if feedback.helpful else "not_helpful",
             "helpful": feedback.helpful,
             "needs_more_info": feedback.needs_more_info,
-            "timestamp": datetime.now(timezone.utc).isoformat()
-        })
+            "feedback_at": datetime.now(timezone.utc)
+        }}
+    )
+
+
+def feedback_doc(feedback: FeedbackInput) -> Dict[str, Any]:
+    return {
+        "feedback_id": feedback.feedback_id or str(uuid.uuid4()),
+        "session_id": feedback.session_id,
+        "message_id": feedback.message_id,
+        "helpful": feedback.helpful,
+        "needs_more_info": feedback.needs_more_info,
+        "timestamp": datetime.now(timezone.utc)
+    }
+
+
+def feedback_stats(events: List[FeedbackInput]) -> Dict[str, int]:
+    inc: Dict[str, int] = {}
+    for feedback in events:
+        key = "feedback.helpful" if feedback.helpful else "feedback.not_helpful"
+        inc[key] = inc.get(key, 0) + 1
+        if feedback.needs_more_info:
+            inc["feedback.needs_more_info"] = inc.get("feedback.needs_more_info", 0) + 1
+    return inc
+
+
+@api_router.post("/chat/feedback")
+async def submit_feedback(feedback: FeedbackInput):
+    """Save user feedback on AI responses"""
+    try:
+        target, update = feedback_target(feedback)
+        # Replies ChatArchiver has moved to db.chat_archive are rated there
+        if not await rate_archived_messages(feedback.session_id, {feedback.message_id: update["$set"]}):
+            await write_queue.put(
+                "chat_messages", "update",
+                filter=target,
+                update=update,
+                key=f"feedback:{feedback.message_id}"
+            )
+        await write_queue.put("feedback", "insert", doc=feedback_doc(feedback))
+        await record_stats(feedback_stats([feedback]))
         
         return {"status": "success", "message": "Thank you for your feedback!"}
     except Exception as e:
@@ -753,57 +423,130 @@ async def submit_feedback(feedback: FeedbackInput):
         return {"status": "error", "message": str(e)}
 
 
+@api_router.post("/chat/feedback/batch")
+async def submit_feedback_batch(batch: FeedbackBatchInput):
+    """Apply many feedback events (e.g. an offline queue) with one bulk_write per collection"""
+    from pymongo import InsertOne, UpdateOne
+    from pymongo.errors import BulkWriteError
+
+    try:
+        # Rated replies may still be sitting in the write-behind buffer
+        await write_queue.flush()
+        
+        # Latest rating per message wins; every event is still logged in db.feedback
+        latest = {feedback.message_id: feedback for feedback in batch.events}
+        ratings: Dict[str, Dict[str, Any]] = {}
+        for feedback in latest.values():
+            ratings.setdefault(feedback.session_id, {})[feedback.message_id] = feedback_target(feedback)[1]["$set"]
+        archived = set()
+        for session_id, session_ratings in ratings.items():
+            archived |= await rate_archived_messages(session_id, session_ratings)
+        targets = [
+            UpdateOne(*feedback_target(feedback)) for message_id, feedback in latest.items() if message_id not in archived
+        ]
+        docs = [feedback_doc(feedback) for feedback in batch.events]
+        
+        matched = len(archived)
+        if targets:
+            matched += (await db.chat_messages.bulk_write(targets, ordered=False)).matched_count
+        duplicates = set()
+        try:
+            await db.feedback.bulk_write([InsertOne(doc) for doc in docs], ordered=False)
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            if e.details.get("writeConcernErrors") or any(err.get("code") != 11000 for err in errors):
+                raise
+            # Already-applied events resent by the client (same feedback_id)
+            duplicates = {err["index"] for err in errors}
+        
+        applied = [feedback for i, feedback in enumerate(batch.events) if i not in duplicates]
+        if applied:
+            await record_stats(feedback_stats(applied))
+        return {
+            "status": "success",
+            "received": len(batch.events),
+            "applied": len(applied),
+            "duplicates": len(duplicates),
+            "messages_matched": matched
+        }
+    except Exception as e:
+        logger.error(f"Error saving feedback batch: {e}")
+        return {"status": "error", "message": str(e)}
+
+
 @api_router.get("/chat/history/{session_id}")
-async def get_session_history(session_id: str):
-    """Get chat history for a session"""
+async def get_session_history(
+    session_id: str, cursor: Optional[str] = None, limit: int = PAGE_SIZE_DEFAULT, fields: Optional[str] = None
+):
+    """Get chat history for a session, one page at a time (pass next_cursor back as ?cursor=)"""
+    projection = parse_fields(fields, HISTORY_FIELDS)
     try:
-        messages = await db.chat_messages.find(
-            {"session_id": session_id},
-            {"_id": 0}
-        ).sort("timestamp", 1).to_list(100)
-        return {"session_id": session_id, "messages": messages}
+        messages, next_cursor = await session_history_page(session_id, cursor, limit, projection)
+        return {"session_id": session_id, "messages": messages, "next_cursor": next_cursor}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting chat history: {e}")
         return {"session_id": session_id, "messages": [], "error": str(e)}
 
 
 @api_router.get("/knowledge")
-async def get_full_knowledge_base():
+async def get_full_knowledge_base(request: Request):
     """Get the complete WSSC knowledge base from MongoDB"""
     try:
-        doc = await db.knowledge_base.find_one({"type": "wssc_main"}, {"_id": 0})
-        return doc.get("data", WSSC_KNOWLEDGE_BASE) if doc else WSSC_KNOWLEDGE_BASE
+        entry = await api_cache.get("knowledge", load_full_knowledge_base)
+        return api_cache.respond(request, entry)
     except Exception as e:
         logger.error(f"Error getting knowledge base: {e}")
         return WSSC_KNOWLEDGE_BASE
 
 
+@api_router.get("/knowledge/search")
+async def search_knowledge_api(q: str, section: Optional[str] = None, limit: int = 10):
+    """BM25-ranked knowledge snippets with their JSON paths; "quoted phrases" must match exactly"""
+    if section and not any(leaf_section(path) == section for path in knowledge_search_index.texts):
+        raise HTTPException(status_code=400, detail=f"Unknown section: {section}")
+    started = time.perf_counter()
+    results = search_knowledge(q, section, max(1, min(limit, 50)))
+    return {
+        "query": q,
+        "section": section,
+        "results": results,
+        "took_ms": round((time.perf_counter() - started) * 1000, 3)
+    }
+
+
 @api_router.get("/knowledge/{section}")
-async def get_knowledge_section_api(section: str):
+async def get_knowledge_section_api(section: str, request: Request):
     """Get a specific section of the knowledge base"""
-    data = await get_knowledge_section(section)
-    if data:
-        return {"section": section, "data": data}
+    try:
+        entry = await api_cache.get(f"knowledge:{section}", section_loader(section))
+        if entry:
+            return api_cache.respond(request, entry)
+    except Exception as e:
+        logger.error(f"Error getting knowledge section: {e}")
     return {"section": section, "data": None, "error": "Section not found"}
 
 
 @api_router.get("/ai/config")
-async def get_ai_config():
+async def get_ai_config(request: Request):
     """Get current AI configuration from MongoDB"""
     try:
-        config = await db.ai_config.find_one({"config_id": "wssc_ai_v3"}, {"_id": 0})
-        return config or {"error": "Config not found"}
+        entry = await api_cache.get("ai_config", load_ai_config)
+        if entry:
+            return api_cache.respond(request, entry)
+        return {"error": "Config not found"}
     except Exception as e:
         logger.error(f"Error getting AI config: {e}")
         return {"error": str(e)}
 
 
 @api_router.get("/ai/top6")
-async def get_top_6_faqs():
+async def get_top_6_faqs(request: Request):
     """Get the Top 6 FAQs from MongoDB"""
     try:
-        doc = await db.knowledge_base.find_one({"type": "top_6_faqs"}, {"_id": 0})
-        return doc.get("data", TOP_6_FAQS) if doc else TOP_6_FAQS
+        entry = await api_cache.get("top6", load_top_6_faqs)
+        return api_cache.respond(request, entry)
     except Exception as e:
         logger.error(f"Error getting top 6 FAQs: {e}")
         return TOP_6_FAQS
@@ -813,47 +556,292 @@ async def get_top_6_faqs():
 async def get_ai_stats():
     """Get AI usage statistics"""
     try:
-        total_messages = await db.chat_messages.count_documents({})
-        total_sessions = len(await db.chat_messages.distinct("session_id"))
-        helpful_count = await db.feedback.count_documents({"helpful": True})
-        not_helpful_count = await db.feedback.count_documents({"helpful": False})
-        kb_sections = await db.knowledge_base.count_documents({})
+        totals = await db.ai_stats.find_one({"_id": "totals"}) or {}
+        kb_sections = await db.knowledge_base.estimated_document_count()
+        workers = await worker_stats.combined()
         
         return {
-            "total_messages": total_messages,
-            "total_sessions": total_sessions,
+            **summarize_stats_doc(totals),
             "knowledge_base_sections": kb_sections,
-            "feedback": {
-                "helpful": helpful_count,
-                "not_helpful": not_helpful_count,
-                "satisfaction_rate": f"{(helpful_count / max(helpful_count + not_helpful_count, 1)) * 100:.1f}%"
-            }
+            "workers": workers["workers"],
+            "chat_paths": workers["chat_paths"],
+            "emergency_lane": emergency_classifier.snapshot(),
+            "response_cache": response_cache.snapshot(),
+            "write_behind": write_queue.snapshot(),
+            "api_cache": api_cache.snapshot(),
+            "llm_admission": workers["llm_admission"],
+            "answer_promotion": answer_promoter.snapshot(),
+            "retention": chat_archiver.snapshot(),
+            "mongo_ops": workers["mongo_ops"]
         }
     except Exception as e:
         logger.error(f"Error getting stats: {e}")
         return {"error": str(e)}
 
 
-# Include the router in the main app
-app.include_router(api_router)
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_credentials=True,
-    allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+@api_router.get("/ai/stats/rollups")
+async def get_ai_stats_rollups(granularity: str = "hour", limit: int = 24):
+    """Get hourly or daily usage rollups, newest first"""
+    if granularity not in ("hour", "day"):
+        return {"error": "granularity must be 'hour' or 'day'"}
+    try:
+        docs = await db.ai_stats.find(
+            {"_id": {"$regex": f"^{granularity}:"}}
+        ).sort("_id", -1).to_list(min(max(limit, 1), 24 * 31))
+        return {
+            "granularity": granularity,
+            "buckets": [
+                {"bucket": doc["_id"].split(":", 1)[1], **summarize_stats_doc(doc)}
+                for doc in docs
+            ]
+        }
+    except Exception as e:
+        logger.error(f"Error getting stats rollups: {e}")
+        return {"error": str(e)}
 
 
-@app.on_event("startup")
-async def startup_event():
-    """Initialize knowledge base and AI config on startup"""
+@api_router.get("/admin/export")
+async def export_transcripts(
+    request: Request,
+    kind: str = "messages",
+    format: str = "ndjson",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    cursor: Optional[str] = None
+):
+    """Stream chat messages or feedback in [start, end) as NDJSON or Parquet, resumable via ?cursor="""
+    require_admin(request)
+    if kind not in EXPORT_KINDS:
+        raise HTTPException(status_code=400, detail=f"kind must be one of: {', '.join(EXPORT_KINDS)}")
+    query = export_query(start, end)
+    if cursor:
+        decode_cursor(cursor)
+    filename = f"wssc-{kind}-{datetime.now(timezone.utc):%Y%m%dT%H%M%S}"
+    if format == "ndjson":
+        return StreamingResponse(
+            export_ndjson(kind, query, cursor),
+            media_type="application/x-ndjson",
+            headers={"Content-Disposition": f'attachment; filename="{filename}.ndjson"'}
+        )
+    if format != "parquet":
+        raise HTTPException(status_code=400, detail="format must be ndjson or parquet")
+    try:
+        out, exported, resume_from = await export_parquet(kind, query, cursor)
+    except ImportError:
+        raise HTTPException(status_code=501, detail="Parquet export needs pyarrow installed")
+    headers = {
+        "Content-Disposition": f'attachment; filename="{filename}.parquet"',
+        "X-Exported-Rows": str(exported)
+    }
+    if resume_from:
+        # Row cap reached - request the next file with ?cursor=
+        headers["X-Next-Cursor"] = resume_from
+    return StreamingResponse(iter_file(out), media_type="application/vnd.apache.parquet", headers=headers)
+
+
+@api_router.get("/admin/retention")
+async def get_retention_status(request: Request):
+    """Archiver totals, TTL settings and per-collection storage sizes"""
+    require_admin(request)
+    return {**chat_archiver.snapshot(), "storage": await storage_report()}
+
+
+@api_router.post("/admin/retention/run")
+async def run_retention(request: Request):
+    """Run one archive pass now and report what it moved and reclaimed"""
+    require_admin(request)
+    return await chat_archiver.run_once()
+
+
+async def metrics():
+    """Prometheus scrape endpoint - every worker's metrics when PROMETHEUS_MULTIPROC_DIR is set"""
+    if not PROMETHEUS_MULTIPROC_DIR:
+        return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+    from prometheus_client import CollectorRegistry, multiprocess
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return Response(content=generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+
+
+class RequestLatencyMiddleware:
+    """Time to response headers per route; plain ASGI, as BaseHTTPMiddleware adds ~0.5ms per request"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        observed = False
+
+        def observe(status: int):
+            nonlocal observed
+            observed = True
+            # Label by route template so /chat/history/{session_id} is one series
+            route = scope.get("route")
+            REQUEST_LATENCY.labels(
+                scope["method"], getattr(route, "path", "unmatched"), str(status)
+            ).observe(time.perf_counter() - started)
+
+        async def send_timed(message):
+            if message["type"] == "http.response.start" and not observed:
+                observe(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_timed)
+        finally:
+            if not observed:
+                observe(500)
+
+
+async def seed_database():
+    """Indexes, migrations, stats backfill and KB/config seeding - run by one worker per boot"""
+    await ensure_indexes()
+    await ensure_ttl_indexes()
+    await migrate_timestamps()
+    await backfill_feedback_ids()
+    await backfill_stats()
+    if INDEX_SELF_CHECK in ("warn", "strict"):
+        await verify_query_plans(strict=INDEX_SELF_CHECK == "strict")
     await init_knowledge_base()
     await init_ai_config()
-    logger.info("WSSC Water AI Assistant v2 started - Knowledge Base Loaded! 💧")
 
 
-@app.on_event("shutdown")
+async def seed_once():
+    """Run seed_database() unless another worker is already doing it; True if this one did"""
+    if await acquire_lock("startup_seed", SEED_LOCK_TTL):
+        heartbeat = asyncio.create_task(keep_lock("startup_seed", SEED_LOCK_TTL))
+        try:
+            await seed_database()
+        finally:
+            heartbeat.cancel()
+            await release_lock("startup_seed")
+        return True
+    await wait_for_lock("startup_seed", SEED_WAIT_TIMEOUT)
+    return False
+
+
+async def warm_worker():
+    """Per-process caches - every worker builds its own"""
+    await refresh_knowledge_index()
+    await response_cache.load()
+    await answer_promoter.load()
+    await warm_api_cache()
+
+
+cache_watcher: Optional[asyncio.Task] = None
+warmup_task: Optional[asyncio.Task] = None
+
+
+async def startup_event():
+    """Connect, seed (leader only) and warm this worker's in-memory state"""
+    global cache_watcher, warmup_task
+    started = time.perf_counter()
+    if STARTUP_MODE != "serve":
+        # Serve instances write through: an unstarted queue awaits each write before the response
+        await write_queue.start()
+    response_cache.kb_version = compute_kb_version()
+    worker_stats.start()
+    if STARTUP_MODE == "serve":
+        # Serve straight away from the import-time FAQ matcher and KB index; Mongo and the LLM
+        # client connect on first use and the caches fill in behind the first requests
+        warmup_task = asyncio.create_task(warm_worker())
+        if ANSWER_PROMOTION_ENABLED:
+            # The feedback job runs on full-mode workers; serve instances just follow what they publish
+            answer_promoter.start(process=False)
+        role = "serve"
+    else:
+        await llm_client.start()
+        connect_mongo()
+        role = "leader" if await seed_once() else "follower"
+        await warm_worker()
+        if ANSWER_PROMOTION_ENABLED:
+            answer_promoter.start()
+        if RETENTION_ENABLED:
+            chat_archiver.start()
+        if API_CACHE_WATCH:
+            cache_watcher = asyncio.create_task(watch_api_cache_sources())
+    logger.info(
+        f"WSSC Water AI Assistant v2 started in {(time.perf_counter() - started) * 1000:.0f}ms "
+        f"({role}, pid {os.getpid()}, Mongo pool {MONGO_MAX_POOL_SIZE}) - Knowledge Base Loaded! 💧"
+    )
+
+
 async def shutdown_db_client():
-    client.close()
+    """Drain background work and flush queued writes before the worker exits"""
+    global cache_watcher, warmup_task
+    for task in (cache_watcher, warmup_task):
+        if task and not task.done():
+            task.cancel()
+    cache_watcher = warmup_task = None
+    await answer_promoter.stop()
+    await chat_archiver.stop()
+    await worker_stats.stop()
+    await write_queue.stop()
+    await llm_client.close()
+    close_mongo()
+    if PROMETHEUS_MULTIPROC_DIR:
+        from prometheus_client import multiprocess
+        # Drops this worker's live gauges from the scrape
+        multiprocess.mark_process_dead(os.getpid())
+
+
+@asynccontextmanager
+async def lifespan(application: FastAPI):
+    await startup_event()
+    try:
+        yield
+    finally:
+        await shutdown_db_client()
+
+
+def create_app() -> FastAPI:
+    """Build the ASGI app (uvicorn server:app, or uvicorn --factory server:create_app)"""
+    application = FastAPI(lifespan=lifespan)
+    application.add_api_route("/metrics", metrics, methods=["GET"])
+    application.add_middleware(RequestLatencyMiddleware)
+    application.include_router(api_router)
+    application.add_middleware(
+        CORSMiddleware,
+        allow_credentials=True,
+        allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    return application
+
+
+app = create_app()
+
+
+async def seed_command():
+    """`python server.py seed` - the deploy-time seeding step for STARTUP_MODE=serve instances"""
+    connect_mongo()
+    try:
+        if await seed_once():
+            logger.info("Database seeded")
+        else:
+            logger.info("Another process seeded the database")
+    finally:
+        close_mongo()
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["seed"]:
+        asyncio.run(seed_command())
+    else:
+        # Multi-worker entry point: WEB_CONCURRENCY=4 python server.py
+        # (same as uvicorn server:app --workers 4 with WEB_CONCURRENCY=4 exported so pools are sized per worker)
+        import uvicorn
+        uvicorn.run(
+            "server:app",
+            host=os.environ.get("HOST", "0.0.0.0"),
+            port=int(os.environ.get("PORT", "8001")),
+            workers=WEB_CONCURRENCY,
+            # Leaves time for write-behind flushes on shutdown
+            timeout_graceful_shutdown=30
+        )
@@ -0,0 +1,27 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+# the wssc modules read these at import; nothing here talks to a real MongoDB or LLM
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "wssc_test")
+os.environ.setdefault("WRITE_BEHIND_SPOOL_DIR", tempfile.mkdtemp(prefix="wssc-test-spool-"))
+os.environ.setdefault("INDEX_SELF_CHECK", "off")
+os.environ.setdefault("LLM_BACKEND", "mock")
+
+from wssc import database  # noqa: E402
+
+
+@pytest.fixture
+def mongo(monkeypatch):
+    """An in-memory mongomock database in place of this worker's MongoDB, behind wssc.database.db"""
+    # tz_aware like connect_mongo(), so datetimes come back UTC-aware
+    client = AsyncMongoMockClient(tz_aware=True)
+    monkeypatch.setattr(database, "client", client)
+    monkeypatch.setattr(database, "mongo_db", client[os.environ["DB_NAME"]])
+    return database.mongo_db
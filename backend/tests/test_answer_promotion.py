@@ -0,0 +1,105 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+
+from wssc import faq
+from wssc.promotion import AnswerPromoter
+from wssc.response_cache import normalize_question, response_cache
+from wssc.retention import chat_archiver
+
+QUESTION = "Can I get a paper copy of my water bill mailed to me?"
+ANSWER = "Yes - call Customer Service at (301) 206-4001 to switch to paper billing."
+
+
+async def rated_exchange(mongo, n: int, helpful: bool, first_turn: bool = True, answer: str = ANSWER):
+    """One question/answer pair in chat_messages plus a vote on the answer"""
+    await mongo.chat_messages.insert_many([
+        {"message_id": f"q{n}", "session_id": f"s{n}", "role": "user", "content": QUESTION},
+        {
+            "message_id": f"a{n}", "session_id": f"s{n}", "role": "assistant", "content": answer,
+            "source": "llm", "reply_to": f"q{n}", **({"first_turn": True} if first_turn else {})
+        }
+    ])
+    await mongo.feedback.insert_one({
+        "feedback_id": f"f{n}", "session_id": f"s{n}", "message_id": f"a{n}", "helpful": helpful,
+        "needs_more_info": False, "timestamp": datetime.now(timezone.utc) - timedelta(hours=1)
+    })
+
+
+def test_promotion_reaches_other_workers(mongo, monkeypatch):
+    monkeypatch.setattr(faq, "faq_matcher", faq.build_faq_matcher())
+
+    async def run():
+        for n in range(3):
+            await rated_exchange(mongo, n, helpful=True)
+        await AnswerPromoter(60).run_once()
+        # A worker that didn't claim the window still has the old matcher
+        faq.faq_matcher = faq.build_faq_matcher()
+        follower = AnswerPromoter(60)
+        await follower.sync()
+        return follower
+
+    follower = asyncio.run(run())
+    match = faq.match_faq(QUESTION)
+    assert match and match["source"] == "promoted"
+    assert follower.version == 1 and follower.promoted_count == 1
+
+
+def test_demotion_drops_cache_entry_on_every_worker(mongo, monkeypatch):
+    monkeypatch.setattr(faq, "faq_matcher", faq.build_faq_matcher())
+    key = normalize_question(QUESTION)
+
+    async def run():
+        for n in range(3):
+            await rated_exchange(mongo, n, helpful=False)
+        follower = AnswerPromoter(60)
+        await follower.load()
+        # Only the follower's memory still has the answer
+        response_cache._put(key, QUESTION, ANSWER, time.time())
+        await AnswerPromoter(60).run_once()
+        await AnswerPromoter(60).sync()
+        assert key not in response_cache.entries
+        response_cache._put(key, QUESTION, ANSWER, time.time())
+        await follower.sync()
+
+    try:
+        asyncio.run(run())
+        assert key not in response_cache.entries
+    finally:
+        response_cache.entries.pop(key, None)
+
+
+def test_follow_up_replies_are_not_promoted(mongo, monkeypatch):
+    monkeypatch.setattr(faq, "faq_matcher", faq.build_faq_matcher())
+
+    async def run():
+        for n in range(3):
+            await rated_exchange(mongo, n, helpful=True, first_turn=False)
+        promoter = AnswerPromoter(60)
+        await promoter.run_once()
+        return promoter, await mongo.answer_quality.count_documents({})
+
+    promoter, scored = asyncio.run(run())
+    assert scored == 0
+    assert promoter.promoted_count == 0
+    match = faq.match_faq(QUESTION)
+    assert not match or match["source"] != "promoted"
+
+
+def test_archived_replies_are_still_scored(mongo, monkeypatch):
+    monkeypatch.setattr(chat_archiver, "archive_after_days", 30)
+
+    async def run():
+        for n in range(3):
+            await rated_exchange(mongo, n, helpful=True)
+        # The exchanges are old enough to be archived; the votes on them arrive now
+        await mongo.chat_messages.update_many({}, {"$set": {"timestamp": datetime.now(timezone.utc) - timedelta(days=40)}})
+        await chat_archiver.run_once()
+        hot = await mongo.chat_messages.count_documents({})
+        promoter = AnswerPromoter(60)
+        await promoter.run_once()
+        return hot, promoter
+
+    hot, promoter = asyncio.run(run())
+    assert hot == 0
+    assert promoter.stats["feedback_processed"] == 3 and promoter.stats["promoted"] == 1
@@ -0,0 +1,95 @@
+import asyncio
+
+import httpx
+
+import server
+from wssc.api_cache import api_cache, choose_encoding, compress_body
+
+
+async def fetch(path: str, **headers) -> httpx.Response:
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://wssc.test") as client:
+        return await client.get(path, headers=headers)
+
+
+def test_matching_etag_gets_a_304_without_a_body(mongo):
+    api_cache.invalidate()
+
+    async def run():
+        first = await fetch("/api/ai/top6", **{"Accept-Encoding": "identity"})
+        again = await fetch("/api/ai/top6", **{"Accept-Encoding": "identity", "If-None-Match": first.headers["etag"]})
+        # A client holding several versions lists them all
+        listed = await fetch(
+            "/api/ai/top6", **{"Accept-Encoding": "identity", "If-None-Match": f'"stale", W/{first.headers["etag"]}'}
+        )
+        stale = await fetch("/api/ai/top6", **{"Accept-Encoding": "identity", "If-None-Match": '"stale"'})
+        return first, again, listed, stale
+
+    first, again, listed, stale = asyncio.run(run())
+    assert first.status_code == 200 and first.json()
+    assert again.status_code == 304 and again.content == b""
+    assert again.headers["etag"] == first.headers["etag"]
+    assert again.headers["vary"] == "Accept-Encoding"
+    assert listed.status_code == 304
+    assert stale.status_code == 200 and stale.content == first.content
+
+
+def test_etag_changes_when_the_payload_does(mongo):
+    api_cache.invalidate()
+
+    async def run():
+        await mongo.ai_config.insert_one({"config_id": "wssc_ai_v3", "model": "a"})
+        before = await fetch("/api/ai/config")
+        await mongo.ai_config.update_one({"config_id": "wssc_ai_v3"}, {"$set": {"model": "b"}})
+        # What the change stream does when ai_config changes
+        api_cache.invalidate()
+        after = await fetch("/api/ai/config", **{"If-None-Match": before.headers["etag"]})
+        return before, after
+
+    before, after = asyncio.run(run())
+    assert before.json()["model"] == "a"
+    assert after.status_code == 200 and after.json()["model"] == "b"
+    assert after.headers["etag"] != before.headers["etag"]
+
+
+def test_choose_encoding_prefers_br_then_gzip_and_honours_q_values():
+    both = {"br", "gzip"}
+    assert choose_encoding("gzip, deflate, br", both) == "br"
+    assert choose_encoding("br;q=0, gzip", both) == "gzip"
+    assert choose_encoding("gzip;q=0.5", both) == "gzip"
+    assert choose_encoding("*", both) == "br"
+    assert choose_encoding("*;q=0, gzip", both) == "gzip"
+    assert choose_encoding("gzip;q=0, identity", both) is None
+    assert choose_encoding("", both) is None
+    # Only what was worth compressing is on offer
+    assert choose_encoding("br, gzip", {"gzip"}) == "gzip"
+
+
+def test_small_bodies_are_not_compressed():
+    assert compress_body(b'{"ok":true}') == {}
+    encoded = compress_body(b'{"answer":"' + b"call Customer Service " * 200 + b'"}')
+    assert set(encoded) == {"gzip", "br"}
+
+
+def test_knowledge_base_is_served_in_the_negotiated_encoding(mongo):
+    api_cache.invalidate()
+
+    async def run():
+        served = {
+            accept: await fetch("/api/knowledge", **{"Accept-Encoding": accept})
+            for accept in ("gzip, deflate, br", "gzip", "identity")
+        }
+        revalidated = await fetch(
+            "/api/knowledge", **{"Accept-Encoding": "gzip", "If-None-Match": served["gzip"].headers["etag"]}
+        )
+        return served, revalidated
+
+    served, revalidated = asyncio.run(run())
+    br, gzipped, identity = served.values()
+    assert br.headers["content-encoding"] == "br" and br.headers["etag"].endswith('-br"')
+    assert gzipped.headers["content-encoding"] == "gzip" and gzipped.headers["etag"].endswith('-gzip"')
+    assert "content-encoding" not in identity.headers
+    # httpx decodes each one; all three are the same document
+    assert br.json() == gzipped.json() == identity.json()
+    assert int(br.headers["content-length"]) < int(gzipped.headers["content-length"]) < len(identity.content)
+    assert revalidated.status_code == 304 and revalidated.headers["etag"] == gzipped.headers["etag"]
@@ -0,0 +1,52 @@
+import asyncio
+import json
+
+from wssc import batch
+from wssc.llm import LlmAdmissionController
+from wssc.models import ChatBatchInput
+
+
+class SlowLlm:
+    """Records how many completions run at once"""
+
+    def __init__(self):
+        self.running = 0
+        self.peak = 0
+
+    async def complete(self, session_id, system, messages, usage=None):
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        await asyncio.sleep(0.02)
+        self.running -= 1
+        return "answer"
+
+
+def test_batches_share_their_llm_slots_and_leave_the_rest_to_live_chat(monkeypatch):
+    llm = SlowLlm()
+    admission = LlmAdmissionController(max_concurrency=4, max_queue=100, queue_timeout=5)
+    monkeypatch.setattr(batch, "llm_client", llm)
+    monkeypatch.setattr(batch, "llm_admission", admission)
+    monkeypatch.setattr(batch, "CHAT_BATCH_LLM_SLOTS", 1)
+    monkeypatch.setattr(batch, "batch_llm_slots", None)
+
+    def batch_input(name):
+        items = [{"message": f"Zebra question {name} number {i} about quokkas"} for i in range(6)]
+        return ChatBatchInput(items=items, concurrency=4, dry_run=True, use_cache=False)
+
+    async def drain(name):
+        return [json.loads(line) async for line in batch.run_chat_batch(batch_input(name), name)]
+
+    async def live_call():
+        # Arrives mid-batch and must not have to queue
+        await asyncio.sleep(0.03)
+        async with admission.slot("live-session"):
+            return admission.stats["queued"]
+
+    async def run():
+        return await asyncio.gather(drain("a"), drain("b"), live_call())
+
+    first, second, queued = asyncio.run(run())
+    assert [r["source"] for r in first[:-1] + second[:-1]] == ["llm"] * 12
+    assert llm.peak == 1
+    assert queued == 0
+    assert first[-1]["llm_slots"] == 1
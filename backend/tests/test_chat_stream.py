@@ -0,0 +1,77 @@
+import asyncio
+import json
+
+import server
+from wssc.models import ChatMessage
+
+
+
+class TokenLlm:
+    """Streams the given tokens and records whether the stream was closed early"""
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.sent = 0
+        self.closed = False
+
+    async def stream(self, session_id, system, messages):
+        try:
+            for token in self.tokens:
+                self.sent += 1
+                yield token
+                await asyncio.sleep(0)
+        finally:
+            self.closed = self.sent < len(self.tokens)
+
+
+class Client:
+    """Stands in for the Starlette Request; disconnects once `after` events have been read"""
+
+    def __init__(self, after=None):
+        self.after = after
+        self.events = []
+
+    async def is_disconnected(self):
+        return self.after is not None and len(self.events) >= self.after
+
+
+async def read_stream(client: Client, session_id: str, question: str):
+    response = await server.chat_stream(ChatMessage(message=question, session_id=session_id), client)
+    async for chunk in response.body_iterator:
+        client.events.append(json.loads(chunk.removeprefix("data: ")))
+    return response
+
+
+def test_stream_sends_tokens_then_done_and_saves_the_reply(mongo, monkeypatch):
+    llm = TokenLlm(["Hello ", "from ", "WSSC."])
+    monkeypatch.setattr(server, "llm_client", llm)
+    client = Client()
+
+    async def run():
+        response = await read_stream(client, "s1", "Zebra question about quokkas")
+        return response, await mongo.chat_messages.find_one({"session_id": "s1", "role": "assistant"})
+
+    response, reply = asyncio.run(run())
+    assert response.media_type == "text/event-stream"
+    assert response.headers["cache-control"] == "no-cache"
+    assert [event["text"] for event in client.events[:-1]] == ["Hello ", "from ", "WSSC."]
+    done = client.events[-1]
+    assert done["type"] == "done" and done["source"] == "llm" and done["session_id"] == "s1"
+    assert reply["content"] == "Hello from WSSC." and reply["message_id"] == done["message_id"]
+
+
+def test_disconnect_cancels_generation_without_saving_a_partial_reply(mongo, monkeypatch):
+    llm = TokenLlm([f"token{i} " for i in range(50)])
+    monkeypatch.setattr(server, "llm_client", llm)
+    client = Client(after=2)
+
+    async def run():
+        # Not asked before, so it can't be answered from the response cache
+        await read_stream(client, "s2", "Zebra question about wombats")
+        return await mongo.chat_messages.find({"session_id": "s2"}, {"_id": 0, "role": 1}).to_list(None)
+
+    messages = asyncio.run(run())
+    assert [event["type"] for event in client.events] == ["token", "token"]
+    # The upstream stream was closed right away rather than drained
+    assert llm.closed and llm.sent == 3
+    assert [message["role"] for message in messages] == ["user"]
@@ -0,0 +1,22 @@
+import importlib.util
+from pathlib import Path
+
+import pytest
+
+spec = importlib.util.spec_from_file_location(
+    "cold_start", Path(__file__).resolve().parent.parent / "benchmarks" / "cold_start.py"
+)
+cold_start = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(cold_start)
+
+
+@pytest.mark.parametrize("backend", ["mock", "anthropic"])
+def test_serve_mode_cold_start_within_budget(monkeypatch, backend):
+    # With a real key set the LLM client must still connect on first use, not at startup
+    monkeypatch.setenv("LLM_BACKEND", backend)
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "sk-ant-test")
+    failures = cold_start.check(
+        cold_start.import_profile(), cold_start.startup_probe(),
+        cold_start.IMPORT_BUDGET_MS, cold_start.STARTUP_BUDGET_MS
+    )
+    assert not failures
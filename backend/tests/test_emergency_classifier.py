@@ -0,0 +1,37 @@
+import pytest
+
+from wssc.emergency import emergency_classifier
+from wssc.faq import match_faq
+from benchmarks.emergency_lane import EMERGENCY_MESSAGES, ROUTINE_MESSAGES
+
+
+@pytest.mark.parametrize("message", EMERGENCY_MESSAGES)
+def test_emergencies_take_the_emergency_lane(message):
+    result = emergency_classifier.classify(message)
+    assert result is not None
+    assert "301-206-4002" in result["answer"]
+
+
+@pytest.mark.parametrize("message", ROUTINE_MESSAGES)
+def test_routine_questions_do_not(message):
+    assert emergency_classifier.classify(message) is None
+
+
+@pytest.mark.parametrize("message", [
+    "How do I apply for the Emergency Relief Fund?",
+    "emergency customer relief fund",
+    "Why does my bill show no water usage this quarter?",
+    "My bill says no water used",
+])
+def test_relief_fund_and_billing_phrasings_are_not_emergencies(message):
+    assert emergency_classifier.classify(message) is None
+
+
+def test_exclusions_do_not_hide_a_real_emergency_in_the_same_message():
+    result = emergency_classifier.classify("I applied for emergency relief and now the water main broke")
+    assert result is not None and result["category"] == "water"
+
+
+def test_an_emergency_payment_plan_question_reaches_the_payment_assistance_faq():
+    assert emergency_classifier.classify("Is there an emergency payment plan?") is None
+    assert match_faq("Is there an emergency payment plan?")["intent"] == "top6:payment_assistance"
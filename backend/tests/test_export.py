@@ -0,0 +1,57 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from wssc.export import export_pages
+from wssc.migrations import backfill_feedback_ids
+
+
+def legacy_feedback(count: int) -> list:
+    """Feedback as the pre-export code saved it: no feedback_id"""
+    start = datetime(2025, 6, 1, tzinfo=timezone.utc)
+    return [
+        {
+            "session_id": f"s{i}", "message_id": f"m{i}", "helpful": i % 2 == 0,
+            "needs_more_info": False, "timestamp": start + timedelta(seconds=i // 2)
+        }
+        for i in range(count)
+    ]
+
+
+async def export_all(kind: str) -> list:
+    rows = []
+    async for docs, _, _ in export_pages(kind, {}, None):
+        rows.extend(docs)
+    return rows
+
+
+def test_feedback_export_covers_legacy_rows(mongo, monkeypatch):
+    monkeypatch.setattr("wssc.export.PAGE_SIZE_MAX", 3)
+    monkeypatch.setattr("wssc.pagination.PAGE_SIZE_MAX", 3)
+
+    async def run():
+        await mongo.feedback.insert_many(legacy_feedback(10))
+        await mongo.feedback.insert_one({**legacy_feedback(1)[0], "feedback_id": "new-1", "message_id": "m-new"})
+        await backfill_feedback_ids()
+        return await export_all("feedback")
+
+    rows = asyncio.run(run())
+    assert len(rows) == 11
+    assert len({row["feedback_id"] for row in rows}) == 11
+    assert {row["message_id"] for row in rows} == {f"m{i}" for i in range(10)} | {"m-new"}
+
+
+def test_feedback_id_backfill_is_stable(mongo):
+    async def ids():
+        return sorted([doc["feedback_id"] async for doc in mongo.feedback.find()])
+
+    async def run():
+        await mongo.feedback.insert_many(legacy_feedback(2))
+        await backfill_feedback_ids()
+        first = await ids()
+        await mongo.migrations.delete_many({})
+        await backfill_feedback_ids()
+        return first, await ids()
+
+    first, second = asyncio.run(run())
+    assert all(feedback_id.startswith("legacy-") for feedback_id in first)
+    assert first == second
@@ -0,0 +1,47 @@
+import pytest
+
+from wssc import faq
+from wssc.knowledge_base import TOP_6_FAQS
+from benchmarks.faq_threshold import NEGATIVE, POSITIVE
+
+
+@pytest.mark.parametrize("query,intent", POSITIVE)
+def test_labelled_questions_get_their_canned_answer(query, intent):
+    match = faq.match_faq(query)
+    assert match is not None and match["intent"] == intent
+
+
+@pytest.mark.parametrize("query", NEGATIVE)
+def test_unrelated_questions_go_to_the_llm(query):
+    assert faq.match_faq(query) is None
+
+
+def test_paying_a_bill_gets_payment_methods_not_assistance_programs():
+    answer = faq.match_faq("How do I pay my bill?")["answer"]
+    assert "wsscwater.com/paymybill" in answer
+    assert "Customer Assistance Program" not in answer
+
+
+@pytest.mark.parametrize("query", [
+    "How do I read my bill?",
+    "I paid my bill but it still says overdue",
+    "What is the income limit for the water main replacement program?",
+])
+def test_known_misroutes_stay_unanswered(query):
+    assert faq.match_faq(query) is None
+
+
+def test_every_canned_answer_is_customer_facing():
+    # answer_guidance is instructions for the LLM ("Help them detect leaks...") and must never be sent
+    guidance_lines = {
+        line.strip()[3:] for faq in TOP_6_FAQS.values()
+        for line in faq["answer_guidance"].strip().splitlines()
+    }
+    for intent in faq.faq_matcher.intents.values():
+        assert not any(line in intent["answer"] for line in guidance_lines)
+    assert "top6:leaks_high_usage" in faq.faq_matcher.intents
+
+
+def test_unknown_words_lower_the_score():
+    matcher = faq.faq_matcher
+    assert matcher.match("my bill")["score"] > matcher.match("read my bill")["score"]
@@ -0,0 +1,64 @@
+import asyncio
+
+import server
+from wssc.indexes import ensure_indexes
+from wssc.models import FeedbackBatchInput, FeedbackInput
+
+
+async def answered(mongo, count: int):
+    await ensure_indexes()
+    await mongo.chat_messages.insert_many([
+        {"message_id": f"a{n}", "session_id": "s1", "role": "assistant", "content": f"answer {n}", "feedback": None}
+        for n in range(count)
+    ])
+
+
+def events(*ratings) -> FeedbackBatchInput:
+    """(feedback_id, message_id, helpful) triples as one batch"""
+    return FeedbackBatchInput(events=[
+        FeedbackInput(session_id="s1", message_id=message_id, helpful=helpful, feedback_id=feedback_id)
+        for feedback_id, message_id, helpful in ratings
+    ])
+
+
+def test_batch_applies_the_latest_rating_per_message_and_logs_every_event(mongo):
+    async def run():
+        await answered(mongo, 2)
+        result = await server.submit_feedback_batch(events(("f1", "a0", True), ("f2", "a1", True), ("f3", "a0", False)))
+        messages = {doc["message_id"]: doc async for doc in mongo.chat_messages.find()}
+        totals = await mongo.ai_stats.find_one({"_id": "totals"})
+        return result, messages, await mongo.feedback.count_documents({}), totals
+
+    result, messages, logged, totals = asyncio.run(run())
+    assert result == {
+        "status": "success", "received": 3, "applied": 3, "duplicates": 0, "messages_matched": 2
+    }
+    assert messages["a0"]["feedback"] == "not_helpful" and messages["a0"]["helpful"] is False
+    assert messages["a1"]["feedback"] == "helpful"
+    assert logged == 3
+    assert totals["feedback"] == {"helpful": 2, "not_helpful": 1}
+
+
+def test_resent_events_are_not_counted_twice(mongo):
+    async def run():
+        await answered(mongo, 2)
+        await server.submit_feedback_batch(events(("f1", "a0", True)))
+        # An offline queue that didn't see the first response sends everything again
+        result = await server.submit_feedback_batch(events(("f1", "a0", True), ("f2", "a1", False)))
+        return result, await mongo.feedback.count_documents({}), await mongo.ai_stats.find_one({"_id": "totals"})
+
+    result, logged, totals = asyncio.run(run())
+    assert result["applied"] == 1 and result["duplicates"] == 1
+    assert logged == 2
+    assert totals["feedback"] == {"helpful": 1, "not_helpful": 1}
+
+
+def test_ratings_for_unknown_messages_are_still_logged(mongo):
+    async def run():
+        await answered(mongo, 1)
+        result = await server.submit_feedback_batch(events(("f1", "missing", True)))
+        return result, await mongo.feedback.find_one({"feedback_id": "f1"})
+
+    result, logged = asyncio.run(run())
+    assert result["status"] == "success" and result["messages_matched"] == 0
+    assert logged["message_id"] == "missing"
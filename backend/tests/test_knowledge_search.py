@@ -0,0 +1,56 @@
+import copy
+
+import pytest
+
+from wssc.knowledge_base import TOP_6_FAQS
+from wssc.retrieval import _seed_sections, KnowledgeIndex, knowledge_leaves, search_knowledge
+
+DOCS = {
+    "fees": "late fee late fee charged on unpaid balance",
+    "plans": "payment plan for customers who need more time",
+    "reverse": "plan your payment online",
+    "hours": "office hours monday to friday",
+}
+
+
+def test_term_frequency_and_rarity_rank_documents():
+    index = KnowledgeIndex().build(DOCS)
+    assert index.search("late fee")[0][0] == "fees"
+    assert {doc_id for doc_id, _ in index.search("payment plan")} == {"plans", "reverse"}
+    assert index.search("nothing matches this") == []
+
+
+def test_phrases_must_appear_in_order():
+    index = KnowledgeIndex().build(DOCS)
+    assert [doc_id for doc_id, _ in index.search("payment plan", phrases=[["payment", "plan"]])] == ["plans"]
+
+
+@pytest.mark.parametrize("query,path", [
+    ("customer service phone", "contact_info.customer_service.phone"),
+    ("late fee", "billing.late_payment_fee"),
+])
+def test_search_finds_the_leaf_that_answers(query, path):
+    assert path in [hit["path"] for hit in search_knowledge(query, limit=3)]
+
+
+def test_quoted_phrases_and_section_filter():
+    assert all("payment plan" in hit["snippet"].lower() or "payment_plans" in hit["path"]
+               for hit in search_knowledge('"payment plan"'))
+    hits = search_knowledge("late fee", section="billing")
+    assert hits and {hit["section"] for hit in hits} == {"billing"}
+
+
+def test_update_matches_a_full_rebuild():
+    sections = copy.deepcopy(_seed_sections)
+    sections["billing"]["late_payment_fee"] = "6% of unpaid balance"
+    del sections["billing"]["flat_rate_sewer"]
+    sections["billing"]["paperless"] = "Sign up for paperless billing in My Account"
+    leaves = knowledge_leaves(sections, TOP_6_FAQS)
+
+    index = KnowledgeIndex().build(knowledge_leaves(_seed_sections, TOP_6_FAQS))
+    indexed, removed = index.update(leaves)
+    full = KnowledgeIndex().build(leaves)
+    assert indexed >= 2 and removed >= 1
+    assert index.postings == full.postings and index.doc_len == full.doc_len
+    assert index.avg_len == pytest.approx(full.avg_len)
+    assert index.search("paperless billing") == full.search("paperless billing")
@@ -0,0 +1,58 @@
+import asyncio
+import time
+
+import pytest
+
+from wssc.llm import LlmAdmissionController, LlmOverloadedError
+
+
+async def hold(admission, session_id, seconds, entered=None):
+    async with admission.slot(session_id):
+        if entered:
+            entered.set()
+        await asyncio.sleep(seconds)
+
+
+def test_same_session_wait_is_queued_and_bounded_by_the_deadline():
+    admission = LlmAdmissionController(max_concurrency=4, max_queue=10, queue_timeout=0.05)
+
+    async def run():
+        entered = asyncio.Event()
+        first = asyncio.create_task(hold(admission, "s1", 0.3, entered))
+        await entered.wait()
+        started = time.perf_counter()
+        second = asyncio.create_task(hold(admission, "s1", 0))
+        await asyncio.sleep(0.01)
+        depth = admission.waiting
+        with pytest.raises(LlmOverloadedError):
+            await second
+        waited = time.perf_counter() - started
+        await first
+        # The session's lock was handed back after the timeout
+        await asyncio.wait_for(hold(admission, "s1", 0), 0.1)
+        return depth, waited
+
+    depth, waited = asyncio.run(run())
+    assert depth == 1
+    assert waited < 0.2
+    assert admission.stats["queued"] == 1 and admission.stats["rejected_timeout"] == 1
+    assert admission.waiting == 0 and admission.in_flight == 0
+    assert not admission._session_locks
+
+
+def test_same_session_wait_counts_toward_the_queue_limit():
+    admission = LlmAdmissionController(max_concurrency=4, max_queue=0, queue_timeout=1)
+
+    async def run():
+        entered = asyncio.Event()
+        first = asyncio.create_task(hold(admission, "s1", 0.05, entered))
+        await entered.wait()
+        with pytest.raises(LlmOverloadedError, match="queue is full"):
+            await hold(admission, "s1", 0)
+        # Other sessions still get a free slot straight away
+        await hold(admission, "s2", 0)
+        await first
+
+    asyncio.run(run())
+    assert admission.stats["rejected_queue_full"] == 1
+    assert admission.stats["admitted"] == 2
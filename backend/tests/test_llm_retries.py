@@ -0,0 +1,104 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from wssc import llm
+from wssc.llm import AnthropicLlmClient, LlmTransientError, retry_delay
+
+MESSAGES = [{"role": "user", "content": "When is my bill due?"}]
+
+
+def anthropic(responses):
+    """AnthropicLlmClient over a stub transport answering with responses in turn; returns (client, requests)"""
+    requests = []
+
+    def handle(request):
+        requests.append(request)
+        return responses[min(len(requests), len(responses)) - 1]
+
+    client = AnthropicLlmClient("test-key", "https://llm.test/v1/messages")
+    client.http = httpx.AsyncClient(transport=httpx.MockTransport(handle))
+    return client, requests
+
+
+def reply(text: str) -> httpx.Response:
+    return httpx.Response(200, json={
+        "content": [{"type": "text", "text": text}], "usage": {"input_tokens": 12, "output_tokens": 3}
+    })
+
+
+def sse(*events) -> httpx.Response:
+    body = "".join(f"event: {event['type']}\ndata: {json.dumps(event)}\n\n" for event in events)
+    return httpx.Response(200, text=body, headers={"content-type": "text/event-stream"})
+
+
+def delta(text: str) -> dict:
+    return {"type": "content_block_delta", "delta": {"type": "text_delta", "text": text}}
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(llm, "LLM_RETRY_BASE_DELAY", 0)
+    monkeypatch.setattr(llm, "LLM_MAX_RETRIES", 2)
+
+
+def test_transient_errors_are_retried_until_a_reply():
+    client, requests = anthropic([httpx.Response(529), httpx.Response(503), reply("Due in 21 days.")])
+    usage = {}
+
+    text = asyncio.run(client.complete("s1", "system", MESSAGES, usage))
+    assert text == "Due in 21 days."
+    assert len(requests) == 3
+    assert usage == {"input_tokens": 12, "output_tokens": 3}
+
+
+def test_retries_stop_after_llm_max_retries():
+    client, requests = anthropic([httpx.Response(429, text="rate limited")])
+
+    with pytest.raises(LlmTransientError, match="429"):
+        asyncio.run(client.complete("s1", "system", MESSAGES))
+    assert len(requests) == 3
+
+
+def test_client_errors_are_not_retried():
+    client, requests = anthropic([httpx.Response(400, text="bad request"), reply("unused")])
+
+    with pytest.raises(RuntimeError, match="400"):
+        asyncio.run(client.complete("s1", "system", MESSAGES))
+    assert len(requests) == 1
+
+
+def test_stream_retries_before_the_first_token_only():
+    async def read(client):
+        tokens = []
+        try:
+            async for token in client.stream("s1", "system", MESSAGES):
+                tokens.append(token)
+        except LlmTransientError as e:
+            return tokens, e
+        return tokens, None
+
+    before, before_requests = anthropic([httpx.Response(502), sse(delta("Due "), delta("soon."))])
+    after, after_requests = anthropic([
+        sse(delta("Due "), {"type": "error", "error": {"type": "overloaded_error"}}),
+        sse(delta("unused"))
+    ])
+
+    assert asyncio.run(read(before)) == (["Due ", "soon."], None)
+    assert len(before_requests) == 2
+    # Retrying after a token was sent would repeat text the customer already has
+    tokens, error = asyncio.run(read(after))
+    assert tokens == ["Due "] and "overloaded" in str(error)
+    assert len(after_requests) == 1
+
+
+def test_backoff_grows_exponentially_with_full_jitter(monkeypatch):
+    monkeypatch.setattr(llm, "LLM_RETRY_BASE_DELAY", 0.5)
+
+    delays = {attempt: [retry_delay(attempt) for _ in range(200)] for attempt in range(4)}
+    for attempt, samples in delays.items():
+        assert all(0 <= delay <= 0.5 * 2 ** attempt for delay in samples)
+    # Full jitter spreads retries over the whole window rather than bunching at its top
+    assert max(delays[3]) > 2 and min(delays[3]) < 1
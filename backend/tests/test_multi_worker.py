@@ -0,0 +1,98 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+
+import server
+from wssc.context import ConversationContextManager
+from wssc.llm import llm_admission
+from wssc.metrics import mongo_op_counter
+from wssc.response_cache import normalize_question, ResponseCache
+from wssc.worker_stats import worker_stats
+
+
+def test_stats_sum_live_workers(mongo, monkeypatch):
+    monkeypatch.setattr("wssc.worker_stats.chat_path_counts", {"faq": 2, "llm": 1})
+    monkeypatch.setattr(mongo_op_counter, "counts", {"find": 5})
+    now = datetime.now(timezone.utc)
+    other = {
+        "chat_paths": {"faq": 3, "llm": 4},
+        "llm_admission": {**llm_admission.counters(), "admitted": 7, "queued": 2, "total_wait_ms": 40.0,
+                          "max_wait_ms": 30.0, "in_flight": 1},
+        "mongo_ops": {"find": 1, "insert": 2}
+    }
+
+    async def run():
+        await mongo.worker_stats.insert_many([
+            {"_id": "other:1", **other, "updated_at": now},
+            {"_id": "gone:2", **other, "updated_at": now - timedelta(hours=1)}
+        ])
+        return await worker_stats.combined()
+
+    stats = asyncio.run(run())
+    assert stats["workers"] == 2
+    assert stats["chat_paths"] == {"faq": 5, "llm": 5}
+    assert stats["mongo_ops"] == {"find": 6, "insert": 2}
+    admission = stats["llm_admission"]
+    assert admission["admitted"] == llm_admission.stats["admitted"] + 7
+    assert admission["in_flight"] == llm_admission.in_flight + 1
+    assert admission["max_wait_ms"] >= 30.0
+    assert admission["max_concurrency"] == 2 * llm_admission.max_concurrency
+
+
+def test_response_cache_falls_back_to_shared_store(mongo):
+    cache = ResponseCache(threshold=0.9, max_entries=10, ttl_seconds=3600)
+    question = "How do I set up autopay for my water bill?"
+
+    async def run():
+        # Stored by another worker: in MongoDB, not in this worker's memory
+        await mongo.response_cache.insert_one({
+            "key": normalize_question(question), "question": question, "response": "Use My Account.",
+            "kb_version": cache.kb_version, "created_at": time.time()
+        })
+        first = await cache.lookup(question)
+        second = await cache.lookup(question)
+        stale = await cache.lookup("Is the water main on my street being replaced?")
+        return first, second, stale
+
+    first, second, stale = asyncio.run(run())
+    assert first["response"] == second["response"] == "Use My Account."
+    assert stale is None
+    assert cache.stats["shared_hits"] == 1
+    assert cache.stats["hits"] == 2 and cache.stats["misses"] == 1
+
+
+def test_seed_lease_is_renewed_while_seeding(mongo, monkeypatch):
+    monkeypatch.setattr(server, "SEED_LOCK_TTL", 0.3)
+
+    async def slow_seed():
+        await asyncio.sleep(1)
+        lock = await mongo.locks.find_one({"_id": "startup_seed"})
+        expires_at = lock["expires_at"].replace(tzinfo=timezone.utc)
+        seen.append(expires_at > datetime.now(timezone.utc))
+
+    seen = []
+    monkeypatch.setattr(server, "seed_database", slow_seed)
+    assert asyncio.run(server.seed_once())
+    # Still held after three lease lengths, and released at the end
+    assert seen == [True]
+    assert asyncio.run(mongo.locks.count_documents({})) == 0
+
+
+def test_context_keeps_turns_recorded_by_other_workers(mongo):
+    first, second = ConversationContextManager(1200, 100), ConversationContextManager(1200, 100)
+
+    async def run():
+        await first.record_exchange(await first.get("s1"), "How do I pay my bill?", "Online or by phone.")
+        await second.record_exchange(await second.get("s1"), "Is there a fee by phone?", "No fee.")
+        # first still has its own copy cached, without second's exchange
+        ctx = await first.get("s1")
+        await first.record_exchange(ctx, "Thanks", "You're welcome!")
+        return ctx, await mongo.session_context.find_one({"session_id": "s1"})
+
+    ctx, doc = asyncio.run(run())
+    contents = [turn["content"] for turn in doc["turns"]]
+    assert contents == [
+        "How do I pay my bill?", "Online or by phone.", "Is there a fee by phone?", "No fee.", "Thanks", "You're welcome!"
+    ]
+    assert doc["version"] == ctx.version == 3
+    assert "Is there a fee by phone?" in ctx.render()
@@ -0,0 +1,66 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+
+from wssc.pagination import decode_cursor, encode_cursor, keyset_page
+from wssc.retention import session_history_page
+
+START = datetime(2025, 3, 1, tzinfo=timezone.utc)
+
+
+def messages(session_id: str, n: int) -> list:
+    # Pairs share a timestamp, so the page boundary has to fall back to the tiebreak
+    return [
+        {"message_id": f"{session_id}-{i:03d}", "session_id": session_id, "role": "user", "content": f"hi {i}",
+         "timestamp": START + timedelta(seconds=i // 2)}
+        for i in range(n)
+    ]
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor(START, "m-7")) == (START, "m-7")
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", encode_cursor(START, "m")[:-3], ""])
+def test_bad_cursor_is_a_400(cursor):
+    with pytest.raises(HTTPException) as raised:
+        decode_cursor(cursor)
+    assert raised.value.status_code == 400
+
+
+def test_pages_cover_every_row_once_in_order(mongo):
+    async def run():
+        await mongo.chat_messages.insert_many(messages("s1", 11) + messages("s2", 4))
+        pages, cursor = [], None
+        while True:
+            page, cursor = await keyset_page(mongo.chat_messages, {"session_id": "s1"}, "message_id", cursor, 3, None)
+            pages.append(page)
+            if not cursor:
+                return pages
+
+    pages = asyncio.run(run())
+    assert [len(page) for page in pages] == [3, 3, 3, 2]
+    assert [doc["message_id"] for page in pages for doc in page] == [f"s1-{i:03d}" for i in range(11)]
+
+
+def test_last_full_page_has_no_next_cursor(mongo):
+    async def run():
+        await mongo.chat_messages.insert_many(messages("s1", 6))
+        first, cursor = await keyset_page(mongo.chat_messages, {}, "message_id", None, 3, None)
+        second, end = await keyset_page(mongo.chat_messages, {}, "message_id", cursor, 3, None)
+        return first, second, end
+
+    first, second, end = asyncio.run(run())
+    assert len(first) == len(second) == 3 and end is None
+
+
+def test_fields_projection_still_pages(mongo):
+    async def run():
+        await mongo.chat_messages.insert_many(messages("s1", 5))
+        return await session_history_page("s1", None, 2, {"content"})
+
+    page, cursor = asyncio.run(run())
+    assert page == [{"content": "hi 0"}, {"content": "hi 1"}]
+    assert decode_cursor(cursor) == (START, "s1-001")
@@ -0,0 +1,90 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import server
+from wssc.export import export_pages, export_query
+from wssc.models import FeedbackBatchInput, FeedbackInput
+from wssc.pagination import HISTORY_FIELDS
+from wssc.retention import chat_archiver, ensure_ttl_indexes, unpack_messages
+
+
+def test_defaults_keep_messages_feedback_and_status_checks(mongo):
+    old = datetime.now(timezone.utc) - timedelta(days=400)
+
+    async def run():
+        await mongo.chat_messages.insert_one(
+            {"message_id": "m1", "session_id": "s1", "role": "user", "content": "hi", "timestamp": old}
+        )
+        await ensure_ttl_indexes()
+        result = await chat_archiver.run_once()
+        indexes = {
+            name: await mongo[name].index_information() for name in ("feedback", "status_checks", "session_context")
+        }
+        return result, indexes, await mongo.chat_messages.count_documents({})
+
+    result, indexes, hot = asyncio.run(run())
+    assert result == {"skipped": "disabled"}
+    assert hot == 1
+    assert "timestamp_ttl" not in indexes["feedback"]
+    assert "timestamp_ttl" not in indexes["status_checks"]
+    assert any(name.endswith("_ttl") for name in indexes["session_context"])
+
+
+def archived_session(mongo, monkeypatch):
+    """Two exchanges 40 days old moved to chat_archive, plus one hot message from another session"""
+    old = datetime.now(timezone.utc).replace(hour=12) - timedelta(days=40)
+    monkeypatch.setattr(chat_archiver, "archive_after_days", 30)
+
+    async def setup():
+        await mongo.chat_messages.insert_many([
+            {
+                "message_id": f"{role[0]}{n}", "session_id": "s1", "role": role, "content": f"{role} {n}",
+                "timestamp": old + timedelta(minutes=2 * n + (role == "assistant"))
+            }
+            for n in range(2) for role in ("user", "assistant")
+        ] + [
+            {"message_id": "hot", "session_id": "s2", "role": "user", "content": "hi", "timestamp": datetime.now(timezone.utc)}
+        ])
+        return await chat_archiver.run_once()
+
+    return setup()
+
+
+def test_feedback_reaches_an_archived_reply(mongo, monkeypatch):
+    async def run():
+        await archived_session(mongo, monkeypatch)
+        single = await server.submit_feedback(FeedbackInput(session_id="s1", message_id="a0", helpful=True))
+        batch = await server.submit_feedback_batch(FeedbackBatchInput(events=[
+            FeedbackInput(session_id="s1", message_id="a1", helpful=True, needs_more_info=True),
+            FeedbackInput(session_id="s1", message_id="a1", helpful=False, feedback_id="f2")
+        ]))
+        messages = {message["message_id"]: message for message in unpack_messages(await mongo.chat_archive.find_one())}
+        return single, batch, messages, await mongo.chat_messages.count_documents({"session_id": "s1"})
+
+    single, batch, messages, hot = asyncio.run(run())
+    assert single["status"] == "success"
+    assert batch["status"] == "success" and batch["messages_matched"] == 1 and batch["applied"] == 2
+    assert messages["a0"]["feedback"] == "helpful" and messages["a0"]["helpful"] is True
+    assert messages["a1"]["feedback"] == "not_helpful" and messages["a1"]["needs_more_info"] is False
+    assert "feedback" not in messages["u0"]
+    # Nothing was written back into hot storage for the archived replies
+    assert hot == 0
+
+
+def test_export_includes_archived_messages(mongo, monkeypatch):
+    monkeypatch.setattr("wssc.export.PAGE_SIZE_MAX", 2)
+
+    async def run():
+        run = await archived_session(mongo, monkeypatch)
+        await server.submit_feedback(FeedbackInput(session_id="s1", message_id="a1", helpful=True))
+        pages = [docs async for docs, _, _ in export_pages("messages", {}, None)]
+        since = datetime.now(timezone.utc) - timedelta(days=1)
+        recent = [doc async for docs, _, _ in export_pages("messages", export_query(since, None), None) for doc in docs]
+        return run, pages, recent
+
+    run, pages, recent = asyncio.run(run())
+    assert run["messages_archived"] == 4
+    assert [[doc["message_id"] for doc in docs] for docs in pages] == [["u0", "a0"], ["u1", "a1"], ["hot"]]
+    assert pages[1][1]["feedback"] == "helpful"
+    assert set(pages[0][0]) <= HISTORY_FIELDS
+    assert [doc["message_id"] for doc in recent] == ["hot"]
@@ -0,0 +1,61 @@
+import asyncio
+
+from wssc.stats import backfill_stats, hll_estimate, hll_register, summarize_stats_doc
+
+
+def history(sessions: int, per_session: int) -> list:
+    return [
+        {"message_id": f"{s}-{n}", "session_id": f"session-{s}", "role": "user" if n % 2 == 0 else "assistant",
+         "content": "hi"}
+        for s in range(sessions) for n in range(per_session)
+    ]
+
+
+def test_backfill_runs_even_when_live_totals_exist(mongo):
+    async def run():
+        await mongo.chat_messages.insert_many(history(4, 3))
+        await mongo.feedback.insert_many([
+            {"feedback_id": "f1", "helpful": True, "needs_more_info": False},
+            {"feedback_id": "f2", "helpful": False, "needs_more_info": False}
+        ])
+        # A newer worker already counted the last exchange before the backfill ran
+        await mongo.ai_stats.insert_one(
+            {"_id": "totals", "messages": {"total": 2, "user": 1, "assistant": 1}, "sources": {"llm": 1}}
+        )
+        await backfill_stats()
+        first = await mongo.ai_stats.find_one({"_id": "totals"})
+        await mongo.chat_messages.insert_many(history(6, 1))
+        await backfill_stats()
+        second = await mongo.ai_stats.find_one({"_id": "totals"})
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first["messages"] == {"total": 12, "user": 8, "assistant": 4}
+    assert first["feedback"] == {"helpful": 1, "not_helpful": 1, "needs_more_info": 0}
+    assert first["sources"] == {"llm": 1}
+    assert summarize_stats_doc(first)["total_sessions"] == 4
+    # Recorded in db.migrations, so it doesn't run again
+    assert second == first
+
+
+def registers_for(values) -> dict:
+    registers = {}
+    for value in values:
+        index, rank = hll_register(value)
+        registers[str(index)] = max(registers.get(str(index), 0), rank)
+    return registers
+
+
+def test_hll_estimates_distinct_sessions():
+    for n in (10, 1000, 50000):
+        estimate = hll_estimate(registers_for(f"session-{i}" for i in range(n)))
+        assert abs(estimate - n) <= max(1, n * 0.05)
+
+
+def test_hll_ignores_repeats_and_merges_with_max():
+    first = registers_for(f"session-{i}" for i in range(3000))
+    assert registers_for(f"session-{i}" for i in list(range(3000)) * 3) == first
+    second = registers_for(f"session-{i}" for i in range(2000, 5000))
+    merged = {key: max(first.get(key, 0), second.get(key, 0)) for key in first.keys() | second.keys()}
+    assert merged == registers_for(f"session-{i}" for i in range(5000))
+    assert abs(hll_estimate(merged) - 5000) <= 250
@@ -0,0 +1,180 @@
+import asyncio
+from datetime import datetime, timezone
+
+from pymongo.errors import AutoReconnect, DocumentTooLarge
+
+import server
+from wssc.write_behind import write_queue, WriteBehindQueue
+
+SENT_AT = datetime(2025, 3, 1, 12, 30, tzinfo=timezone.utc)
+
+
+class FailingDb:
+    """mongomock, except bulk_write raises fail(collection, requests)'s exception when it returns one"""
+
+    def __init__(self, mongo, fail):
+        self.mongo = mongo
+        self.fail = fail
+
+    def __getitem__(self, name):
+        collection = self.mongo[name]
+        fail = self.fail
+
+        class Collection:
+            async def bulk_write(self, requests, ordered=True):
+                error = fail(name, requests)
+                if error:
+                    raise error
+                return await collection.bulk_write(requests, ordered=ordered)
+
+        return Collection()
+
+
+def queue(spool_dir, max_pending: int = 100) -> WriteBehindQueue:
+    return WriteBehindQueue(spool_dir, batch_size=100, flush_interval=600, max_pending=max_pending)
+
+
+def crash(q: WriteBehindQueue):
+    """Drop the queue the way a killed process would - no flush, spool left as it is"""
+    q._task.cancel()
+    q._spool.close()
+    q._lock_file.close()
+
+
+async def put_exchange(q: WriteBehindQueue, message_id: str):
+    await q.put("chat_messages", "insert", doc={"_id": message_id, "content": "hi", "timestamp": SENT_AT})
+    for _ in range(3):
+        await q.put("ai_stats", "update", filter={"_id": "totals"}, update={"$inc": {"messages.total": 1}},
+                    upsert=True, key="totals", merge=True)
+
+
+def test_writes_left_in_the_spool_replay_on_the_next_start(mongo, tmp_path, monkeypatch):
+    async def run():
+        monkeypatch.setattr("wssc.write_behind.db", FailingDb(mongo, lambda name, requests: AutoReconnect("down")))
+        first = queue(tmp_path)
+        await first.start()
+        await first.put("chat_messages", "insert", doc={"_id": "m2", "content": "hello", "timestamp": SENT_AT})
+        await put_exchange(first, "m1")
+        await first.stop()
+        # m1 reached MongoDB before the outage; replaying it again must not fail the batch
+        await mongo.chat_messages.insert_one({"_id": "m1", "content": "hi", "timestamp": SENT_AT})
+
+        monkeypatch.setattr("wssc.write_behind.db", mongo)
+        second = queue(tmp_path)
+        await second.start()
+        await second.stop()
+        docs = await mongo.chat_messages.find().sort("_id", 1).to_list(None)
+        return first.snapshot(), second.snapshot(), docs, await mongo.ai_stats.find_one({"_id": "totals"})
+
+    first, second, docs, totals = asyncio.run(run())
+    assert first["pending_batches"] == 1 and first["errors"] == 1
+    assert second["replayed"] == 5 and second["flushed"] == 5 and second["pending_batches"] == 0
+    assert [doc["_id"] for doc in docs] == ["m1", "m2"]
+    assert docs[1]["timestamp"] == SENT_AT
+    assert totals["messages"]["total"] == 3
+    assert not list(tmp_path.rglob("*.jsonl"))
+
+
+def test_a_dead_workers_spool_is_adopted(mongo, tmp_path):
+    orphan = tmp_path / "worker-999999"
+    orphan.mkdir()
+    (orphan / "current.jsonl").write_text(
+        queue(tmp_path).codec.dumps({"collection": "feedback", "op": "insert", "doc": {"_id": "f1", "timestamp": SENT_AT}})
+        + "\n"
+    )
+
+    async def run():
+        replaying = queue(tmp_path)
+        await replaying.start()
+        await replaying.stop()
+        return replaying.snapshot(), await mongo.feedback.find_one({"_id": "f1"})
+
+    snapshot, doc = asyncio.run(run())
+    assert snapshot["replayed"] == 1
+    assert doc["timestamp"] == SENT_AT
+    assert not orphan.exists()
+
+
+def test_a_rejected_write_is_dead_lettered_and_frees_its_slot(mongo, tmp_path, monkeypatch):
+    def too_large(name, requests):
+        if any(getattr(request, "_doc", {}).get("_id") == "huge" for request in requests):
+            return DocumentTooLarge("BSON document too large")
+
+    monkeypatch.setattr("wssc.write_behind.db", FailingDb(mongo, too_large))
+    monkeypatch.setattr("wssc.write_behind.WRITE_BEHIND_MAX_ATTEMPTS", 2)
+
+    async def run():
+        q = queue(tmp_path, max_pending=5)
+        await q.start()
+        await q.put("chat_messages", "insert", doc={"_id": "huge", "content": "x"})
+        await put_exchange(q, "m1")
+        await q.flush()
+        retrying = q.snapshot()
+        await q.flush()
+        # Every slot is back, so a full queue's worth of puts doesn't block
+        for n in range(5):
+            await asyncio.wait_for(q.put("feedback", "insert", doc={"_id": f"f{n}"}), 1)
+        await q.stop()
+        return retrying, q.snapshot(), await mongo.chat_messages.distinct("_id"), await mongo.ai_stats.find_one()
+
+    retrying, done, message_ids, totals = asyncio.run(run())
+    assert retrying["pending_batches"] == 1 and retrying["flushed"] == 4
+    assert done["dead_lettered"] == 1 and done["pending_batches"] == 0
+    assert message_ids == ["m1"]
+    assert totals["messages"]["total"] == 3
+    dead = [queue(tmp_path).codec.loads(line) for line in (tmp_path / "dead-letter.jsonl").read_text().splitlines()]
+    assert [(entry["doc"]["_id"], entry["attempts"]) for entry in dead] == [("huge", 2)]
+    assert "too large" in dead[0]["error"]
+
+
+def test_a_crash_after_a_partial_apply_counts_nothing_twice(mongo, tmp_path, monkeypatch):
+    def stats_down(name, requests):
+        return AutoReconnect("ai_stats primary stepped down") if name == "ai_stats" else None
+
+    async def run():
+        # chat_messages is acknowledged, ai_stats isn't, then the process dies
+        monkeypatch.setattr("wssc.write_behind.db", FailingDb(mongo, stats_down))
+        first = queue(tmp_path)
+        await first.start()
+        await put_exchange(first, "m1")
+        await first.flush()
+        crash(first)
+
+        # Everything is acknowledged, then the process dies before the spool file is removed
+        monkeypatch.setattr("wssc.write_behind.db", mongo)
+        second = queue(tmp_path)
+        await second.start()
+        await put_exchange(second, "m2")
+        spooled = (second.worker_dir / "current.jsonl").read_text()
+        await second.flush()
+        (second.worker_dir / "batch-1.jsonl").write_text(spooled)
+        crash(second)
+
+        third = queue(tmp_path)
+        await third.start()
+        await third.stop()
+        return third.snapshot(), await mongo.chat_messages.distinct("_id"), await mongo.ai_stats.find_one()
+
+    replay, message_ids, totals = asyncio.run(run())
+    assert replay["replayed"] == 4 and replay["pending_batches"] == 0
+    assert sorted(message_ids) == ["m1", "m2"]
+    assert totals["messages"]["total"] == 6
+
+
+def test_serve_mode_writes_through_without_a_spool(mongo, monkeypatch, tmp_path):
+    monkeypatch.setattr(server, "STARTUP_MODE", "serve")
+    monkeypatch.setattr(write_queue, "spool_dir", tmp_path)
+
+    async def run():
+        await server.startup_event()
+        try:
+            await write_queue.put("chat_messages", "insert", doc={"_id": "m1", "content": "hi"})
+            # Written before put() returned, with nothing buffered for a flush that may never come
+            return await mongo.chat_messages.find_one({"_id": "m1"}), write_queue.snapshot()
+        finally:
+            await server.shutdown_db_client()
+
+    doc, snapshot = asyncio.run(run())
+    assert doc is not None
+    assert snapshot["enqueued"] == 0 and snapshot["buffered"] == 0
+    assert not list(tmp_path.iterdir())
@@ -0,0 +1 @@
+"""The WSSC Water AI Assistant backend: the subsystems server.py wires into the FastAPI app"""
@@ -0,0 +1,187 @@
+"""Read-through cache of the knowledge base and config API payloads"""
+import logging
+from fastapi import Request, Response
+import json
+import hashlib
+import gzip
+from typing import Optional, Dict, Any
+import asyncio
+
+from .config import API_CACHE_COMPRESS_MIN_BYTES, API_CACHE_MAX_AGE
+from .metrics import CACHE_EVENTS
+from .database import db
+from .knowledge_base import TOP_6_FAQS, WSSC_KNOWLEDGE_BASE
+
+logger = logging.getLogger(__name__)
+
+
+async def get_knowledge_section(section: str) -> Dict[str, Any]:
+    """Get a specific section from the knowledge base"""
+    try:
+        doc = await db.knowledge_base.find_one({"type": f"wssc_{section}"}, {"_id": 0})
+        return doc.get("data", {}) if doc else {}
+    except Exception as e:
+        logger.error(f"Error getting knowledge section: {e}")
+        return {}
+
+
+def dump_json(data: Any) -> bytes:
+    """Compact UTF-8 JSON - orjson when installed, byte-identical stdlib output otherwise"""
+    try:
+        import orjson
+    except ImportError:
+        return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode()
+    return orjson.dumps(data)
+
+
+def compress_body(body: bytes) -> Dict[str, bytes]:
+    """Content-Encoding -> body, at maximum compression since each entry is encoded once"""
+    if len(body) < API_CACHE_COMPRESS_MIN_BYTES:
+        return {}
+    # mtime=0 keeps the gzip bytes (and so the ETag) stable across workers
+    encoded = {"gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+    try:
+        import brotli
+        encoded["br"] = brotli.compress(body, quality=11)
+    except ImportError:
+        pass
+    return {name: data for name, data in encoded.items() if len(data) < len(body)}
+
+
+def choose_encoding(accept_encoding: str, available) -> Optional[str]:
+    """Best of br/gzip the client accepts (q > 0), or None for identity"""
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                continue
+        accepted[name.strip()] = q
+    for name in ("br", "gzip"):
+        if name in available and accepted.get(name, accepted.get("*", 0)) > 0:
+            return name
+    return None
+
+
+class ApiResponseCache:
+    """Pre-serialized, pre-compressed JSON bodies for read-mostly endpoints, invalidated by a version counter"""
+
+    def __init__(self):
+        self.version = 0
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.stats = {
+            "hits": 0, "misses": 0, "not_modified": 0, "invalidations": 0,
+            "served_br": 0, "served_gzip": 0, "served_identity": 0
+        }
+
+    def invalidate(self):
+        self.version += 1
+        self.entries.clear()
+        self.stats["invalidations"] += 1
+
+    async def get(self, key: str, loader) -> Optional[Dict[str, Any]]:
+        """Return the cached entry for key, loading it on a miss; None if the loader finds nothing"""
+        entry = self.entries.get(key)
+        if entry:
+            self.stats["hits"] += 1
+            CACHE_EVENTS.labels("api", "hit").inc()
+            return entry
+        self.stats["misses"] += 1
+        CACHE_EVENTS.labels("api", "miss").inc()
+        version = self.version
+        data = await loader()
+        if data is None:
+            return None
+        body = dump_json(data)
+        entry = {"body": body, "digest": hashlib.sha1(body).hexdigest()[:20], "encoded": compress_body(body)}
+        # Don't store data loaded across an invalidation
+        if version == self.version:
+            self.entries[key] = entry
+        return entry
+
+    def respond(self, request: Request, entry: Dict[str, Any]) -> Response:
+        """Serve the stored bytes in the best encoding the client takes, or a 304 when it has this version"""
+        encoding = choose_encoding(request.headers.get("accept-encoding", ""), entry["encoded"])
+        # Each encoding is its own representation, so each gets its own strong ETag
+        etag = f'"{entry["digest"]}-{encoding}"' if encoding else f'"{entry["digest"]}"'
+        headers = {
+            "ETag": etag,
+            "Vary": "Accept-Encoding",
+            "Cache-Control": f"public, max-age={API_CACHE_MAX_AGE}" if API_CACHE_MAX_AGE > 0 else "no-cache"
+        }
+        if_none_match = request.headers.get("if-none-match", "")
+        if if_none_match and entry["digest"] in if_none_match:
+            self.stats["not_modified"] += 1
+            CACHE_EVENTS.labels("api", "not_modified").inc()
+            return Response(status_code=304, headers=headers)
+        self.stats[f"served_{encoding or 'identity'}"] += 1
+        if encoding:
+            headers["Content-Encoding"] = encoding
+            return Response(content=entry["encoded"][encoding], media_type="application/json", headers=headers)
+        return Response(content=entry["body"], media_type="application/json", headers=headers)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            **self.stats, "version": self.version, "size": len(self.entries),
+            "bytes": {
+                "identity": sum(len(entry["body"]) for entry in self.entries.values()),
+                **{
+                    name: sum(len(entry["encoded"].get(name, entry["body"])) for entry in self.entries.values())
+                    for name in ("gzip", "br")
+                }
+            }
+        }
+
+
+api_cache = ApiResponseCache()
+
+
+async def load_full_knowledge_base():
+    doc = await db.knowledge_base.find_one({"type": "wssc_main"}, {"_id": 0})
+    return doc.get("data", WSSC_KNOWLEDGE_BASE) if doc else WSSC_KNOWLEDGE_BASE
+
+
+async def load_top_6_faqs():
+    doc = await db.knowledge_base.find_one({"type": "top_6_faqs"}, {"_id": 0})
+    return doc.get("data", TOP_6_FAQS) if doc else TOP_6_FAQS
+
+
+async def load_ai_config():
+    return await db.ai_config.find_one({"config_id": "wssc_ai_v3"}, {"_id": 0})
+
+
+def section_loader(section: str):
+    async def load():
+        data = await get_knowledge_section(section)
+        return {"section": section, "data": data} if data else None
+    return load
+
+
+async def warm_api_cache():
+    """Populate every cacheable response so the first requests don't touch MongoDB"""
+    try:
+        await api_cache.get("knowledge", load_full_knowledge_base)
+        await api_cache.get("top6", load_top_6_faqs)
+        await api_cache.get("ai_config", load_ai_config)
+        for section, value in WSSC_KNOWLEDGE_BASE.items():
+            if isinstance(value, (dict, list)):
+                await api_cache.get(f"knowledge:{section}", section_loader(section))
+        logger.info(f"API response cache warmed with {len(api_cache.entries)} entries (version {api_cache.version})")
+    except Exception as e:
+        logger.error(f"Error warming API response cache: {e}")
+
+
+async def watch_api_cache_sources():
+    """Invalidate the API cache whenever knowledge_base or ai_config change in MongoDB"""
+    pipeline = [{"$match": {"ns.coll": {"$in": ["knowledge_base", "ai_config"]}}}]
+    try:
+        async with db.watch(pipeline) as stream:
+            async for _ in stream:
+                api_cache.invalidate()
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logger.error(f"API cache change stream stopped, relying on version counter only: {e}")
@@ -0,0 +1,165 @@
+"""Batch chat for offline evaluation runs"""
+import logging
+import time
+from typing import List, Optional, Dict, Any
+import uuid
+import asyncio
+from contextlib import asynccontextmanager
+
+from .config import CHAT_BATCH_CONCURRENCY, CHAT_BATCH_LLM_SLOTS, LLM_MAX_CONCURRENCY
+from .models import ChatBatchInput
+from .faq import CHAT_BUSY_RESPONSE, CHAT_ERROR_RESPONSE, match_faq
+from .emergency import match_emergency
+from .response_cache import normalize_question, response_cache
+from .context import estimate_tokens, SessionContext
+from .messages import save_chat_message
+from .llm import build_llm_messages, llm_admission, llm_client, LlmOverloadedError
+from .export import export_line
+
+logger = logging.getLogger(__name__)
+
+
+def batch_usage(system: str, messages: List[Dict[str, str]], reply: str, reported: Dict[str, int]) -> Dict[str, Any]:
+    """Token usage as the API reported it, else estimated the same way as the context budget"""
+    if reported:
+        return {**reported, "estimated": False}
+    return {
+        "input_tokens": estimate_tokens(system) + sum(estimate_tokens(m["content"]) for m in messages),
+        "output_tokens": estimate_tokens(reply),
+        "estimated": True
+    }
+
+
+batch_llm_slots: Optional[asyncio.Semaphore] = None
+
+
+@asynccontextmanager
+async def batch_llm_slot():
+    """One of the CHAT_BATCH_LLM_SLOTS shared by every running batch, taken before the admission queue"""
+    global batch_llm_slots
+    if batch_llm_slots is None:
+        batch_llm_slots = asyncio.Semaphore(CHAT_BATCH_LLM_SLOTS)
+    async with batch_llm_slots:
+        yield
+
+
+async def answer_batch_item(batch: ChatBatchInput, batch_id: str, index: int) -> Dict[str, Any]:
+    """One batch question through the emergency lane, FAQ matcher, response cache and LLM, like /api/chat.
+
+    Each item is the first turn of its own session, so context is never loaded or saved;
+    a dry run persists nothing at all.
+    """
+    item = batch.items[index]
+    session_id = f"batch-{batch_id}-{index}"
+    user_message_id, reply_id = str(uuid.uuid4()), str(uuid.uuid4())
+    usage = {"input_tokens": 0, "output_tokens": 0, "estimated": False}
+    error, coalesced = None, False
+    started = time.perf_counter()
+    try:
+        emergency = match_emergency(item.message)
+        faq = None if emergency else match_faq(item.message)
+        cached = None
+        if not emergency and not faq and batch.use_cache:
+            cached = await response_cache.lookup(item.message)
+        if emergency:
+            response, source = emergency["answer"], "emergency"
+        elif faq:
+            response, source = faq["answer"], faq["source"]
+        elif cached:
+            response, source = cached["response"], "cache"
+        else:
+            system, messages = build_llm_messages(SessionContext(session_id), item.message)
+            reported: Dict[str, int] = {}
+            called = False
+
+            async def ask_llm():
+                nonlocal called
+                called = True
+                return await llm_client.complete(session_id, system, messages, usage=reported)
+
+            async with batch_llm_slot():
+                response = await llm_admission.run(session_id, ask_llm, coalesce_key=normalize_question(item.message))
+            source = "llm"
+            # A coalesced duplicate shared another call's reply and used no tokens of its own
+            coalesced = not called
+            if called:
+                usage = batch_usage(system, messages, response, reported)
+            if not batch.dry_run:
+                await response_cache.store(item.message, response)
+    except LlmOverloadedError as e:
+        response, source, error = CHAT_BUSY_RESPONSE, "busy", str(e)
+    except Exception as e:
+        logger.error(f"Error in chat batch {batch_id}, item {index}: {e}")
+        response, source, error = CHAT_ERROR_RESPONSE, "error", str(e)
+    latency_ms = (time.perf_counter() - started) * 1000
+
+    result = {
+        "type": "result", "index": index, "id": item.id, "message": item.message,
+        "response": response, "source": source, "latency_ms": round(latency_ms, 1), "usage": usage
+    }
+    if coalesced:
+        result["coalesced"] = True
+    if error:
+        result["error"] = error
+    elif not batch.dry_run:
+        await save_chat_message(session_id=session_id, role="user", content=item.message, message_id=user_message_id)
+        await save_chat_message(
+            session_id=session_id,
+            role="assistant",
+            content=response,
+            message_id=reply_id,
+            source=source,
+            reply_to=user_message_id,
+            first_turn=True
+        )
+        result.update({"session_id": session_id, "message_id": reply_id})
+    return result
+
+
+async def run_chat_batch(batch: ChatBatchInput, batch_id: str):
+    """NDJSON result lines in completion order, then one summary line"""
+    # Items answered locally run at this concurrency; LLM calls are further held to CHAT_BATCH_LLM_SLOTS
+    concurrency = max(1, min(batch.concurrency or CHAT_BATCH_CONCURRENCY, LLM_MAX_CONCURRENCY))
+    pending = iter(range(len(batch.items)))
+    results: asyncio.Queue = asyncio.Queue()
+
+    async def worker():
+        for index in pending:
+            await results.put(await answer_batch_item(batch, batch_id, index))
+
+    started = time.perf_counter()
+    workers = [asyncio.create_task(worker()) for _ in range(min(concurrency, len(batch.items)))]
+    sources: Dict[str, int] = {}
+    latencies = []
+    tokens = {"input_tokens": 0, "output_tokens": 0}
+    try:
+        for _ in batch.items:
+            result = await results.get()
+            sources[result["source"]] = sources.get(result["source"], 0) + 1
+            latencies.append(result["latency_ms"])
+            for key in tokens:
+                tokens[key] += result["usage"][key]
+            yield export_line(result)
+    finally:
+        # The client went away mid-batch: stop taking new items
+        for task in workers:
+            task.cancel()
+    latencies.sort()
+    elapsed = time.perf_counter() - started
+    logger.info(f"Chat batch {batch_id}: {len(batch.items)} items in {elapsed:.1f}s ({sources})")
+    yield export_line({
+        "type": "summary",
+        "batch_id": batch_id,
+        "items": len(batch.items),
+        "dry_run": batch.dry_run,
+        "concurrency": concurrency,
+        "llm_slots": CHAT_BATCH_LLM_SLOTS,
+        "sources": sources,
+        "elapsed_ms": round(elapsed * 1000, 1),
+        "latency_ms": {
+            "p50": latencies[len(latencies) // 2],
+            "p95": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+            "max": latencies[-1]
+        },
+        "usage": tokens
+    })
@@ -0,0 +1,148 @@
+"""Settings, read from the environment (and backend/.env) once at import"""
+from dotenv import load_dotenv
+import os
+import socket
+import tempfile
+from pathlib import Path
+
+
+# The backend directory (.env, spool)
+ROOT_DIR = Path(__file__).parent.parent
+load_dotenv(ROOT_DIR / '.env')
+
+
+# With several workers, point PROMETHEUS_MULTIPROC_DIR at an empty directory (wiped at each deploy)
+# so /metrics reports every worker. prometheus_client reads it at import, so it has to be in the
+# process environment - setting it in .env is too late.
+PROMETHEUS_MULTIPROC_DIR = os.environ.get('PROMETHEUS_MULTIPROC_DIR', '')
+
+# Worker processes (uvicorn/gunicorn convention) - the Mongo pool budget is shared between them
+WEB_CONCURRENCY = int(os.environ.get('WEB_CONCURRENCY', '1'))
+MONGO_POOL_BUDGET = int(os.environ.get('MONGO_POOL_BUDGET', '100'))
+MONGO_MAX_POOL_SIZE = int(os.environ.get('MONGO_MAX_POOL_SIZE', str(max(10, MONGO_POOL_BUDGET // WEB_CONCURRENCY))))
+MONGO_MIN_POOL_SIZE = int(os.environ.get('MONGO_MIN_POOL_SIZE', '2'))
+
+# full: seed (leader-elected) and warm caches before serving. serve: skip seeding, connect to Mongo
+# on first use and warm caches in the background - for serverless cold starts (run `python server.py seed`
+# from the deploy step instead). serve also writes chat, feedback and stats straight to Mongo rather than
+# through the write-behind spool: a frozen or recycled instance would never replay it.
+STARTUP_MODE = os.environ.get('STARTUP_MODE', 'full').lower()
+
+# Only one worker seeds/migrates at boot. It renews its SEED_LOCK_TTL lease while it works, so
+# the lease only lapses if it dies; the others wait for it for up to SEED_WAIT_TIMEOUT
+SEED_LOCK_TTL = float(os.environ.get('SEED_LOCK_TTL', '60'))
+SEED_WAIT_TIMEOUT = float(os.environ.get('SEED_WAIT_TIMEOUT', '600'))
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+# How often each worker publishes its in-process counters for /api/ai/stats to sum
+WORKER_STATS_INTERVAL = float(os.environ.get('WORKER_STATS_INTERVAL', '15'))
+
+# LLM API Key - Try Emergent key first, fallback to direct Anthropic
+EMERGENT_LLM_KEY = os.environ.get('EMERGENT_LLM_KEY', '')
+ANTHROPIC_API_KEY = os.environ.get('ANTHROPIC_API_KEY', '')
+LLM_API_KEY = EMERGENT_LLM_KEY if EMERGENT_LLM_KEY else ANTHROPIC_API_KEY
+LLM_PROVIDER = "anthropic"
+LLM_MODEL = "claude-sonnet-4-5-20250929"
+LLM_MAX_TOKENS = 1024
+
+# Retrieval-augmented prompting - attach only the top-k relevant KB sections
+RAG_ENABLED = os.environ.get('RAG_ENABLED', 'true').lower() == 'true'
+RAG_TOP_K = int(os.environ.get('RAG_TOP_K', '3'))
+RAG_MIN_RELATIVE_SCORE = 0.5
+
+# Multi-turn context - recent turns verbatim, older turns folded into a rolling summary
+CONTEXT_TOKEN_BUDGET = int(os.environ.get('CONTEXT_TOKEN_BUDGET', '1200'))
+CONTEXT_MAX_SESSIONS = int(os.environ.get('CONTEXT_MAX_SESSIONS', '5000'))
+CONTEXT_MAX_TURNS = int(os.environ.get('CONTEXT_MAX_TURNS', '20'))
+
+# Write-behind persistence - chat/feedback writes are batched off the request path
+WRITE_BEHIND_ENABLED = os.environ.get('WRITE_BEHIND_ENABLED', 'true').lower() == 'true'
+WRITE_BEHIND_BATCH_SIZE = int(os.environ.get('WRITE_BEHIND_BATCH_SIZE', '200'))
+WRITE_BEHIND_FLUSH_INTERVAL = float(os.environ.get('WRITE_BEHIND_FLUSH_INTERVAL', '0.5'))
+WRITE_BEHIND_MAX_PENDING = int(os.environ.get('WRITE_BEHIND_MAX_PENDING', '10000'))
+# Tries before a write MongoDB keeps rejecting moves to the dead-letter file
+WRITE_BEHIND_MAX_ATTEMPTS = int(os.environ.get('WRITE_BEHIND_MAX_ATTEMPTS', '5'))
+# backend/spool, or a temp directory where the package directory is read-only
+WRITE_BEHIND_SPOOL_DIR = Path(os.environ.get('WRITE_BEHIND_SPOOL_DIR', str(
+    ROOT_DIR / 'spool' if os.access(ROOT_DIR, os.W_OK) else Path(tempfile.gettempdir()) / 'wssc-spool'
+)))
+
+# Index self-check at startup: off, warn (log COLLSCANs) or strict (refuse to start)
+INDEX_SELF_CHECK = os.environ.get('INDEX_SELF_CHECK', 'warn').lower()
+
+# Follow MongoDB change streams to invalidate API caches (needs a replica set)
+API_CACHE_WATCH = os.environ.get('API_CACHE_WATCH', 'false').lower() == 'true'
+# Browser/CDN max-age for the cached KB/config payloads (0 = no-cache, always revalidate with the ETag)
+API_CACHE_MAX_AGE = int(os.environ.get('API_CACHE_MAX_AGE', '3600'))
+# Bodies at least this big are also stored gzip- and brotli-compressed
+API_CACHE_COMPRESS_MIN_BYTES = int(os.environ.get('API_CACHE_COMPRESS_MIN_BYTES', '1024'))
+
+# LLM admission control - global concurrency cap, bounded wait queue with a deadline
+LLM_MAX_CONCURRENCY = int(os.environ.get('LLM_MAX_CONCURRENCY', '8'))
+LLM_MAX_QUEUE = int(os.environ.get('LLM_MAX_QUEUE', '100'))
+LLM_QUEUE_TIMEOUT = float(os.environ.get('LLM_QUEUE_TIMEOUT', '15'))
+
+# LLM backend: auto (Anthropic if ANTHROPIC_API_KEY is set, else Emergent), anthropic, emergent or mock
+LLM_BACKEND = os.environ.get('LLM_BACKEND', 'auto').lower()
+
+# Mock LLM (LLM_BACKEND=mock) - simulated latency, streaming rate and error rate for offline load tests
+MOCK_LLM_FIRST_TOKEN_MS = float(os.environ.get('MOCK_LLM_FIRST_TOKEN_MS', '400'))
+MOCK_LLM_TOKENS_PER_SEC = float(os.environ.get('MOCK_LLM_TOKENS_PER_SEC', '60'))
+MOCK_LLM_RESPONSE_TOKENS = int(os.environ.get('MOCK_LLM_RESPONSE_TOKENS', '120'))
+MOCK_LLM_ERROR_RATE = float(os.environ.get('MOCK_LLM_ERROR_RATE', '0'))
+
+# Long-lived LLM client - direct Anthropic Messages API when ANTHROPIC_API_KEY is set
+ANTHROPIC_API_URL = os.environ.get('ANTHROPIC_API_URL', 'https://api.anthropic.com/v1/messages')
+LLM_CONNECT_TIMEOUT = float(os.environ.get('LLM_CONNECT_TIMEOUT', '5'))
+LLM_READ_TIMEOUT = float(os.environ.get('LLM_READ_TIMEOUT', '60'))
+LLM_MAX_RETRIES = int(os.environ.get('LLM_MAX_RETRIES', '2'))
+LLM_RETRY_BASE_DELAY = float(os.environ.get('LLM_RETRY_BASE_DELAY', '0.5'))
+
+# FAQ fast path - minimum match score needed to answer without calling the LLM
+# (calibrated on labelled queries with benchmarks/faq_threshold.py - rerun it when intents change)
+FAQ_MATCH_THRESHOLD = float(os.environ.get('FAQ_MATCH_THRESHOLD', '0.5'))
+
+# Emergency lane: answer emergencies with the 24/7 line before the FAQ matcher, cache or LLM
+EMERGENCY_LANE_ENABLED = os.environ.get('EMERGENCY_LANE_ENABLED', 'true').lower() == 'true'
+
+# Semantic response cache in front of the LLM
+RESPONSE_CACHE_THRESHOLD = float(os.environ.get('RESPONSE_CACHE_THRESHOLD', '0.85'))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', '1000'))
+RESPONSE_CACHE_TTL_SECONDS = int(os.environ.get('RESPONSE_CACHE_TTL_SECONDS', '86400'))
+
+# Feedback loop - promote consistently helpful answers into the FAQ fast path, demote unhelpful ones
+ANSWER_PROMOTION_ENABLED = os.environ.get('ANSWER_PROMOTION_ENABLED', 'true').lower() == 'true'
+ANSWER_PROMOTION_INTERVAL = float(os.environ.get('ANSWER_PROMOTION_INTERVAL', '300'))
+PROMOTE_MIN_HELPFUL = int(os.environ.get('PROMOTE_MIN_HELPFUL', '3'))
+PROMOTE_MIN_RATIO = float(os.environ.get('PROMOTE_MIN_RATIO', '0.8'))
+DEMOTE_MIN_NOT_HELPFUL = int(os.environ.get('DEMOTE_MIN_NOT_HELPFUL', '2'))
+
+# Keyset pagination for chat history and status listings
+PAGE_SIZE_DEFAULT = int(os.environ.get('PAGE_SIZE_DEFAULT', '50'))
+PAGE_SIZE_MAX = int(os.environ.get('PAGE_SIZE_MAX', '500'))
+
+# Admin transcript export - disabled unless ADMIN_TOKEN is set (sent as X-Admin-Token)
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN', '')
+EXPORT_PARQUET_MAX_ROWS = int(os.environ.get('EXPORT_PARQUET_MAX_ROWS', '200000'))
+
+# Batch chat (admin) - offline evaluation runs of many questions, CHAT_BATCH_CONCURRENCY at a time by default
+CHAT_BATCH_MAX_ITEMS = int(os.environ.get('CHAT_BATCH_MAX_ITEMS', '500'))
+CHAT_BATCH_CONCURRENCY = int(os.environ.get('CHAT_BATCH_CONCURRENCY', '4'))
+# LLM calls all running batches may have in flight together - the rest of LLM_MAX_CONCURRENCY stays
+# free for live chat
+CHAT_BATCH_LLM_SLOTS = int(os.environ.get('CHAT_BATCH_LLM_SLOTS', str(max(1, LLM_MAX_CONCURRENCY // 4))))
+
+# Retention - chat_messages older than CHAT_ARCHIVE_AFTER_DAYS move to compressed per-session, per-day
+# documents in db.chat_archive (0 keeps everything hot). History, the transcript export, feedback on a
+# message and answer promotion read hot storage, then the archive.
+RETENTION_ENABLED = os.environ.get('RETENTION_ENABLED', 'true').lower() == 'true'
+RETENTION_INTERVAL = float(os.environ.get('RETENTION_INTERVAL', '3600'))
+RETENTION_BATCH_SIZE = int(os.environ.get('RETENTION_BATCH_SIZE', '2000'))
+CHAT_ARCHIVE_AFTER_DAYS = int(os.environ.get('CHAT_ARCHIVE_AFTER_DAYS', '0'))
+# TTL in days per collection, enforced by MongoDB's TTL monitor (0 = keep forever). Only the
+# session_context cache expires by default; deleting feedback or status checks is opt-in.
+RETENTION_TTL_DAYS = {
+    "session_context": int(os.environ.get('SESSION_CONTEXT_TTL_DAYS', '30')),
+    "feedback": int(os.environ.get('FEEDBACK_TTL_DAYS', '0')),
+    "status_checks": int(os.environ.get('STATUS_CHECKS_TTL_DAYS', '0')),
+    "chat_archive": int(os.environ.get('CHAT_ARCHIVE_TTL_DAYS', '0'))
+}
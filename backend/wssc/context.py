@@ -0,0 +1,140 @@
+"""Per-session conversation context (rolling summary plus recent turns)"""
+import logging
+import re
+from typing import List, Dict, Any
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from .config import CONTEXT_MAX_SESSIONS, CONTEXT_MAX_TURNS, CONTEXT_TOKEN_BUDGET
+from .database import db
+from .write_behind import write_queue
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token) - good enough for budgeting"""
+    return len(text) // 4 + 1
+
+
+def summarize_turn(role: str, content: str) -> str:
+    """One-line extractive summary of a turn that is leaving the verbatim window"""
+    first = re.split(r"(?<=[.?!])\s|\n", content.strip(), maxsplit=1)[0]
+    if len(first) > 140:
+        first = first[:137] + "..."
+    return f"{'Customer asked' if role == 'user' else 'Assistant said'}: {first}"
+
+
+def render_turns(turns: List[Dict[str, str]]) -> str:
+    lines = ["Most recent messages:"]
+    for turn in turns:
+        lines.append(f"{'Customer' if turn['role'] == 'user' else 'Assistant'}: {turn['content']}")
+    return "\n".join(lines)
+
+
+class SessionContext:
+    """Rolling summary plus recent verbatim turns for one chat session"""
+
+    def __init__(self, session_id: str, summary: List[str] = None, recent: List[Dict[str, str]] = None):
+        self.session_id = session_id
+        self.summary = summary or []
+        self.recent = recent or []
+        # Exchanges recorded for the session, across every worker (session_context.version)
+        self.version = 0
+
+    @classmethod
+    def from_doc(cls, doc: Dict[str, Any], budget: int) -> "SessionContext":
+        """Rebuild from the stored turns (after any summary/recent a pre-turns document had)"""
+        ctx = cls(doc["session_id"], list(doc.get("summary") or []))
+        for turn in (doc.get("recent") or []) + (doc.get("turns") or []):
+            ctx.add(turn["role"], turn["content"], budget)
+        ctx.version = doc.get("version", 0)
+        return ctx
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.summary and not self.recent
+
+    def add(self, role: str, content: str, budget: int):
+        self.recent.append({"role": role, "content": content})
+        recent_budget = budget * 3 // 4
+        summary_budget = budget - recent_budget
+        # Keep at least the latest exchange verbatim
+        while len(self.recent) > 2 and sum(estimate_tokens(t["content"]) for t in self.recent) > recent_budget:
+            turn = self.recent.pop(0)
+            self.summary.append(summarize_turn(turn["role"], turn["content"]))
+        while self.summary and sum(estimate_tokens(line) for line in self.summary) > summary_budget:
+            self.summary.pop(0)
+
+    def render(self, include_recent: bool = True) -> str:
+        """Conversation block for the system prompt"""
+        if self.is_empty:
+            return ""
+        lines = ["CONVERSATION SO FAR:"]
+        if self.summary:
+            lines.append("Earlier in this conversation:")
+            lines.extend(f"- {line}" for line in self.summary)
+        if include_recent and self.recent:
+            lines.append(render_turns(self.recent))
+        return "\n".join(lines) if len(lines) > 1 else ""
+
+
+class ConversationContextManager:
+    """Bounded per-session context cached in memory, with db.session_context shared by every worker
+
+    Turns are appended with $push, so workers never overwrite each other's, and a
+    cached session is reloaded when the stored version shows turns it hasn't seen.
+    """
+
+    def __init__(self, token_budget: int, max_sessions: int):
+        self.token_budget = token_budget
+        self.max_sessions = max_sessions
+        self.sessions: "OrderedDict[str, SessionContext]" = OrderedDict()
+
+    def _remember(self, ctx: SessionContext):
+        self.sessions[ctx.session_id] = ctx
+        self.sessions.move_to_end(ctx.session_id)
+        while len(self.sessions) > self.max_sessions:
+            self.sessions.popitem(last=False)
+
+    async def get(self, session_id: str) -> SessionContext:
+        ctx = self.sessions.get(session_id)
+        try:
+            if ctx:
+                # Another worker may have answered this session since it was cached here
+                stored = await db.session_context.find_one({"session_id": session_id}, {"_id": 0, "version": 1})
+                stale = stored is not None and stored.get("version", 0) > ctx.version
+            if not ctx or stale:
+                doc = await db.session_context.find_one({"session_id": session_id}, {"_id": 0})
+                if doc:
+                    ctx = SessionContext.from_doc(doc, self.token_budget)
+        except Exception as e:
+            logger.error(f"Error loading session context: {e}")
+        ctx = ctx or SessionContext(session_id)
+        self._remember(ctx)
+        return ctx
+
+    async def record_exchange(self, ctx: SessionContext, user_message: str, assistant_message: str):
+        """Add a question/answer pair and append it to the stored turns"""
+        ctx.add("user", user_message, self.token_budget)
+        ctx.add("assistant", assistant_message, self.token_budget)
+        ctx.version += 1
+        self._remember(ctx)
+        turns = [{"role": "user", "content": user_message}, {"role": "assistant", "content": assistant_message}]
+        try:
+            await write_queue.put(
+                "session_context", "update",
+                filter={"session_id": ctx.session_id},
+                update={
+                    "$push": {"turns": {"$each": turns, "$slice": -CONTEXT_MAX_TURNS}},
+                    "$inc": {"version": 1},
+                    "$set": {"updated_at": datetime.now(timezone.utc)}
+                },
+                upsert=True,
+                once=True
+            )
+        except Exception as e:
+            logger.error(f"Error saving session context: {e}")
+
+
+context_manager = ConversationContextManager(CONTEXT_TOKEN_BUDGET, CONTEXT_MAX_SESSIONS)
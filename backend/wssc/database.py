@@ -0,0 +1,111 @@
+"""This worker's MongoDB handle and the db.locks leases"""
+import logging
+import os
+import time
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from .config import MONGO_MAX_POOL_SIZE, MONGO_MIN_POOL_SIZE, WORKER_ID
+from .metrics import mongo_op_counter
+
+logger = logging.getLogger(__name__)
+
+
+class LazyDatabase:
+    """Stands in for this worker's database - each access goes through connect_mongo(), connecting on first use"""
+
+    def __getattr__(self, name):
+        return getattr(connect_mongo(), name)
+
+    def __getitem__(self, name):
+        return connect_mongo()[name]
+
+
+# MongoDB connection - created per worker by connect_mongo() (lifespan, or first use), never before a fork
+mongo_url = os.environ['MONGO_URL']
+client = None
+mongo_db = None
+db = LazyDatabase()
+
+# pymongo.ASCENDING, without importing pymongo at module load
+ASCENDING = 1
+
+
+def connect_mongo():
+    """Create this worker's Motor client - after the fork, so no pool is shared between processes"""
+    global client, mongo_db
+    if client is None:
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        client = AsyncIOMotorClient(
+            mongo_url,
+            # tz_aware so BSON datetimes come back as UTC-aware and serialize with their offset
+            tz_aware=True,
+            maxPoolSize=MONGO_MAX_POOL_SIZE,
+            minPoolSize=MONGO_MIN_POOL_SIZE,
+            event_listeners=[mongo_op_counter.listener()]
+        )
+        mongo_db = client[os.environ['DB_NAME']]
+    return mongo_db
+
+
+def close_mongo():
+    """Close this worker's Motor client; the next access through db reconnects"""
+    global client, mongo_db
+    if client:
+        client.close()
+    client = mongo_db = None
+
+
+async def acquire_lock(name: str, ttl: float) -> bool:
+    """Take a lease in db.locks; False if another live worker holds it"""
+    from pymongo.errors import DuplicateKeyError
+
+    now = datetime.now(timezone.utc)
+    try:
+        await db.locks.update_one(
+            {"_id": name, "$or": [{"expires_at": {"$lte": now}}, {"owner": WORKER_ID}]},
+            {"$set": {"owner": WORKER_ID, "expires_at": now + timedelta(seconds=ttl)}},
+            upsert=True
+        )
+        return True
+    except DuplicateKeyError:
+        return False
+
+
+async def release_lock(name: str):
+    await db.locks.delete_one({"_id": name, "owner": WORKER_ID})
+
+
+async def keep_lock(name: str, ttl: float):
+    """Renew a lease this worker holds every ttl/3 until cancelled"""
+    while True:
+        await asyncio.sleep(ttl / 3)
+        try:
+            result = await db.locks.update_one(
+                {"_id": name, "owner": WORKER_ID},
+                {"$set": {"expires_at": datetime.now(timezone.utc) + timedelta(seconds=ttl)}}
+            )
+        except Exception as e:
+            # Try again next beat - the lease has two more before it lapses
+            logger.warning(f"Error renewing lock {name}: {e}")
+            continue
+        if not result.matched_count:
+            logger.error(f"Lost lock {name} - another worker may now hold it")
+            return
+
+
+async def wait_for_lock(name: str, timeout: float):
+    """Wait until the lease is released or expires"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        lock = await db.locks.find_one({"_id": name})
+        if not lock:
+            return
+        expires_at = lock["expires_at"]
+        if expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        if expires_at <= datetime.now(timezone.utc):
+            return
+        await asyncio.sleep(0.2)
+    logger.warning(f"Gave up waiting for lock {name} after {timeout:.0f}s")
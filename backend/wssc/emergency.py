@@ -0,0 +1,114 @@
+"""Emergency lane: 24/7 emergency replies ahead of the FAQ matcher, cache and LLM"""
+import re
+from typing import List, Optional, Dict, Any
+
+from .config import EMERGENCY_LANE_ENABLED
+from .knowledge_base import WSSC_KNOWLEDGE_BASE
+from .faq import FEEDBACK_ENDING
+
+
+# Category -> regex alternatives over the WSSC_KNOWLEDGE_BASE["emergencies"] vocabulary.
+# Kept narrow: a household leak or a high bill is not an emergency, a main break or sewage backup is.
+EMERGENCY_PATTERNS = {
+    "sewer": [
+        r"sew(?:age|er)s?\s+(?:is\s+|are\s+|keeps\s+)?(?:back(?:ed|ing|s)?[\s-]?up|overflow\w*|spill\w*|leak\w*|coming\s+(?:up|out|in))",
+        r"sew(?:age|er)\s+back[\s-]?ups?",
+        r"sanitary\s+sewer\s+overflows?",
+        r"(?:toilet|drain|tub)s?\s+(?:is\s+|are\s+)?(?:back(?:ed|ing)[\s-]?up|overflowing)",
+        # A manhole needs an incident word - "who do I call about a loose manhole cover" isn't one
+        r"(?:missing|open|uncovered|broken|displaced|overflowing)\s+manholes?",
+        r"manholes?(?:\s+covers?)?(?:\s+\w+){0,4}?\s+(?:missing|gone|off|open|uncovered|broken|displaced|collaps\w*|overflow\w*|spill\w*|gushing|bubbling)",
+    ],
+    "water": [
+        r"(?:water\s+)?mains?\s+(?:break|broke|burst|bust|rupture)\w*",
+        r"(?:broken|burst|busted|ruptured)\s+(?:water\s+)?(?:main|pipe)s?",
+        # ...but "no water usage/fee/bill" is a billing question, and "without water during scheduled
+        # maintenance" asks about a planned shutoff
+        r"(?:no|without)\s+(?:running\s+)?water"
+        r"(?!\s+(?:usage|used?|bills?|fees?|charges?|rates?|meter)\b)(?!\s+during\s+(?:\w+\s+)?(?:scheduled|planned)\b)",
+        r"water\s+(?:outage|is\s+out)",
+        r"(?:very|extremely|really|super)\s+low\s+(?:water\s+)?pressure",
+        r"(?:no|zero)\s+(?:water\s+)?pressure",
+        r"(?:water|pipe)\s+(?:is\s+)?(?:gushing|spewing|shooting|bubbling)\s+(?:up|out)",
+        r"geyser",
+        r"sinkhole",
+        r"(?:street|road|sidewalk|yard)\s+(?:is\s+)?flood\w*",
+        r"flood\w*\s+(?:the\s+|my\s+|our\s+)?(?:street|road|basement)",
+    ],
+    "general": [
+        # ...but not the Emergency (Customer) Relief Fund or an "emergency payment plan" - assistance and
+        # billing nouns within a few words make it a billing question
+        r"(?<!financial\s)emergenc(?:y|ies)"
+        r"(?!\s+(?:\w+\s+){0,3}?(?:relief|payments?|plans?|assistance|financial|funds?|programs?|bills?|fees?|charges?|loans?|grants?)\b)",
+    ],
+}
+
+# Literal stems every pattern above contains: a cheap first pass so ordinary traffic skips the full regex
+EMERGENCY_KEYWORDS = [
+    "sew", "manhole", "toilet", "drain", "tub", "main", "water", "pressure", "pipe", "geyser", "sinkhole",
+    "flood", "emergenc"
+]
+
+_emergency_contact = WSSC_KNOWLEDGE_BASE["emergencies"]["contact"].split(" ")[0]
+EMERGENCY_RESPONSES = {
+    "water": (
+        f"This sounds like an emergency - please call our 24/7 Emergency Services Center right away at "
+        f"{_emergency_contact}. {WSSC_KNOWLEDGE_BASE['emergencies']['response_time']}. Please stay clear of "
+        f"flooding or damaged pavement until crews arrive. You can also report it in the WSSC Water mobile app."
+    ),
+    "sewer": (
+        f"This sounds like a sewer emergency - please call our 24/7 Emergency Services Center right away at "
+        f"{_emergency_contact}. Until it's checked, avoid contact with the sewage, keep children and pets away, "
+        f"and hold off on running sinks, toilets and washing machines."
+    ),
+    "general": (
+        f"For emergencies like a water main break, no water, very low pressure or a sewage backup, call our "
+        f"24/7 Emergency Services Center at {_emergency_contact}. For anything else, Customer Service is at "
+        f"301-206-4001 (Mon-Fri, 8am-6pm)."
+    ),
+}
+
+
+class EmergencyClassifier:
+    """Keyword screen, then one regex with a named group per category - runs before any FAQ, cache or LLM work"""
+
+    def __init__(self, patterns: Dict[str, List[str]], keywords: List[str]):
+        self.categories = list(patterns)
+        self.screen = re.compile("|".join(re.escape(keyword) for keyword in keywords))
+        self.pattern = re.compile(
+            "|".join(rf"(?P<{category}>\b(?:{'|'.join(alts)})\b)" for category, alts in patterns.items())
+        )
+        self.stats = {"checked": 0, "screened": 0, "matched": 0, **{category: 0 for category in self.categories}}
+
+    def classify(self, message: str) -> Optional[Dict[str, Any]]:
+        """Return the emergency category, the phrase that triggered it and the templated reply, or None"""
+        self.stats["checked"] += 1
+        text = message.lower()
+        if not self.screen.search(text):
+            return None
+        self.stats["screened"] += 1
+        found = self.pattern.search(text)
+        if not found:
+            return None
+        category = found.lastgroup
+        self.stats["matched"] += 1
+        self.stats[category] += 1
+        return {
+            "category": category,
+            "trigger": found.group(0),
+            "answer": f"{EMERGENCY_RESPONSES[category]}\n\n{FEEDBACK_ENDING}"
+        }
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"enabled": EMERGENCY_LANE_ENABLED, **self.stats}
+
+
+emergency_classifier = EmergencyClassifier(EMERGENCY_PATTERNS, EMERGENCY_KEYWORDS)
+
+
+def match_emergency(message: str) -> Optional[Dict[str, Any]]:
+    """Classify the message for the emergency lane (None when the lane is off or nothing matches)"""
+    # Not timed into CHAT_STAGE_LATENCY: the histogram would cost more than the classifier itself
+    if not EMERGENCY_LANE_ENABLED:
+        return None
+    return emergency_classifier.classify(message)
@@ -0,0 +1,114 @@
+"""Admin transcript export"""
+from fastapi import Request, HTTPException
+import json
+import tempfile
+from typing import Optional, Dict, Any
+from datetime import datetime, timezone
+
+from .config import ADMIN_TOKEN, EXPORT_PARQUET_MAX_ROWS, PAGE_SIZE_MAX
+from .database import db
+from .pagination import encode_cursor, HISTORY_FIELDS, keyset_page
+from .retention import messages_page
+
+
+# kind -> (collection, keyset tiebreak, exported fields)
+EXPORT_KINDS = {
+    "messages": ("chat_messages", "message_id", HISTORY_FIELDS),
+    "feedback": ("feedback", "feedback_id", {
+        "feedback_id", "session_id", "message_id", "helpful", "needs_more_info", "timestamp"
+    })
+}
+
+
+def require_admin(request: Request):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled (ADMIN_TOKEN not set)")
+    if request.headers.get("X-Admin-Token") != ADMIN_TOKEN:
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+def export_query(start: Optional[datetime], end: Optional[datetime]) -> Dict[str, Any]:
+    bounds = {}
+    if start:
+        bounds["$gte"] = start if start.tzinfo else start.replace(tzinfo=timezone.utc)
+    if end:
+        bounds["$lt"] = end if end.tzinfo else end.replace(tzinfo=timezone.utc)
+    return {"timestamp": bounds} if bounds else {}
+
+
+async def export_pages(kind: str, query: Dict[str, Any], cursor: Optional[str], max_rows: Optional[int] = None):
+    """Yield (docs, cursor after them, more to come) in keyset order, one page in memory at a time"""
+    collection, tiebreak, fields = EXPORT_KINDS[kind]
+    remaining = max_rows
+    while True:
+        limit = PAGE_SIZE_MAX if remaining is None else min(PAGE_SIZE_MAX, remaining)
+        if kind == "messages":
+            # Includes the days ChatArchiver has moved to db.chat_archive
+            docs, next_cursor = await messages_page(query, cursor, limit, fields)
+        else:
+            docs, next_cursor = await keyset_page(db[collection], query, tiebreak, cursor, limit, fields)
+        if not docs:
+            return
+        cursor = next_cursor or encode_cursor(docs[-1]["timestamp"], docs[-1][tiebreak])
+        if remaining is not None:
+            remaining -= len(docs)
+        yield docs, cursor, bool(next_cursor)
+        if not next_cursor or remaining == 0:
+            return
+
+
+def export_line(data: Dict[str, Any]) -> str:
+    return json.dumps(data, ensure_ascii=False, default=lambda value: value.isoformat()) + "\n"
+
+
+async def export_ndjson(kind: str, query: Dict[str, Any], cursor: Optional[str]):
+    """NDJSON records, each page followed by a {"checkpoint": ...} line to resume from"""
+    exported = 0
+    async for docs, checkpoint, _ in export_pages(kind, query, cursor):
+        for doc in docs:
+            yield export_line(doc)
+        exported += len(docs)
+        yield export_line({"checkpoint": checkpoint, "exported": exported})
+    yield export_line({"done": True, "exported": exported})
+
+
+def parquet_schema(kind: str):
+    import pyarrow as pa
+    timestamp = pa.timestamp("ms", tz="UTC")
+    if kind == "feedback":
+        return pa.schema([
+            ("feedback_id", pa.string()), ("session_id", pa.string()), ("message_id", pa.string()),
+            ("helpful", pa.bool_()), ("needs_more_info", pa.bool_()), ("timestamp", timestamp)
+        ])
+    return pa.schema([
+        ("message_id", pa.string()), ("session_id", pa.string()), ("role", pa.string()),
+        ("content", pa.string()), ("source", pa.string()), ("timestamp", timestamp),
+        ("feedback", pa.string()), ("helpful", pa.bool_()), ("needs_more_info", pa.bool_()),
+        ("feedback_at", timestamp)
+    ])
+
+
+async def export_parquet(kind: str, query: Dict[str, Any], cursor: Optional[str]) -> tuple:
+    """Write up to EXPORT_PARQUET_MAX_ROWS rows page by page into a spooled temp file"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = parquet_schema(kind)
+    out = tempfile.SpooledTemporaryFile(max_size=16 * 1024 * 1024)
+    exported, resume_from = 0, None
+    with pq.ParquetWriter(out, schema, compression="zstd") as writer:
+        async for docs, checkpoint, more in export_pages(kind, query, cursor, EXPORT_PARQUET_MAX_ROWS):
+            # Each page becomes one row group
+            writer.write_table(pa.Table.from_pylist(docs, schema=schema))
+            exported += len(docs)
+            resume_from = checkpoint if more else None
+    out.seek(0)
+    return out, exported, resume_from
+
+
+def iter_file(f, chunk_size: int = 64 * 1024):
+    try:
+        while chunk := f.read(chunk_size):
+            yield chunk
+    finally:
+        f.close()
@@ -0,0 +1,236 @@
+"""FAQ fast path: canned answers for the common questions without an LLM call"""
+import re
+import math
+from typing import List, Optional, Dict, Any
+
+from .config import FAQ_MATCH_THRESHOLD
+from .metrics import CACHE_EVENTS, CHAT_ANSWERS, CHAT_STAGE_LATENCY
+from .knowledge_base import TOP_6_FAQS, WSSC_KNOWLEDGE_BASE
+
+
+FEEDBACK_ENDING = "Was this helpful? Need anything else? 😊"
+CHAT_BUSY_RESPONSE = f"We're getting a lot of questions right now, so I couldn't get to yours in time. Please try again in a minute, or call Customer Service at 301-206-4001. For emergencies like a main break or sewage backup, call our 24/7 line at 301-206-4002.\n\n{FEEDBACK_ENDING}"
+CHAT_ERROR_RESPONSE = f"I'm sorry, I'm having a little trouble right now. Please try again in a moment, or call us at 301-206-4001 for immediate help.\n\n{FEEDBACK_ENDING}"
+
+STOPWORDS = {
+    "a", "an", "the", "i", "me", "my", "we", "our", "you", "your", "is", "are", "was", "be",
+    "do", "does", "did", "to", "of", "in", "on", "at", "for", "with", "and", "or", "it",
+    "this", "that", "so", "can", "how", "what", "why", "there", "have", "has", "am", "get",
+    "please", "hi", "hello", "just", "about", "from", "if", "im", "much", "will", "would",
+    "could", "should", "want", "some", "any"
+}
+
+
+def stem_token(token: str) -> str:
+    """Very light suffix stripping so 'paying', 'pays' and 'paid' land close together"""
+    for suffix in ("ing", "ed", "es", "s"):
+        if len(token) > len(suffix) + 2 and token.endswith(suffix):
+            return token[:-len(suffix)]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase, strip punctuation, drop stopwords and stem"""
+    words = re.findall(r"[a-z0-9]+", text.lower().replace("'", ""))
+    return [stem_token(w) for w in words if w not in STOPWORDS]
+
+
+def _render_kb_faq(faq: Dict[str, Any]) -> str:
+    """Turn a WSSC_KNOWLEDGE_BASE faq entry into a customer-facing answer"""
+    if "answer" in faq:
+        return faq["answer"]
+    parts = []
+    for key, value in faq.items():
+        if key == "question":
+            continue
+        label = key.replace("_", " ").capitalize()
+        if isinstance(value, list):
+            parts.append(f"{label}:\n" + "\n".join(f"- {item}" for item in value))
+        else:
+            parts.append(f"{label}: {value}")
+    return "\n\n".join(parts)
+
+
+def render_guidance(guidance: str) -> str:
+    """Turn TOP_6_FAQS answer_guidance steps into bullet points (for the LLM prompt only)"""
+    lines = [re.sub(r"^\d+\.\s*", "", line.strip()) for line in guidance.strip().splitlines()]
+    return "\n".join(f"- {line}" for line in lines if line)
+
+
+def _kb_customer_faqs() -> Dict[str, Dict[str, Any]]:
+    """Customer-facing entries (shaped like WSSC_KNOWLEDGE_BASE["faqs"]) for intents the KB FAQs don't cover"""
+    kb = WSSC_KNOWLEDGE_BASE
+    leaks, adjustments = kb["leak_detection"], kb["billing_adjustments"]
+    return {
+        "leaks_high_usage": {
+            "question": "How do I check for a leak?",
+            "detection_steps": leaks["detection_steps"],
+            "toilet_test": leaks["toilet_test"],
+            "meter_test": leaks["meter_test"],
+            "common_sources": leaks["common_sources"],
+            "leak_adjustment": adjustments["underground_leak"]["benefit"],
+            "to_qualify": adjustments["underground_leak"]["eligibility"],
+            "customer_assistance_program": adjustments["cap_leak_adjustment"]["benefit"],
+            "contact": f"{kb['contact_info']['customer_service']['phone']} or wsscwater.com"
+        },
+        "payment_methods": {
+            "question": "How do I pay my bill?",
+            "ways_to_pay": [
+                f"{option['method']}: " + ", ".join(v for k, v in option.items() if k != "method")
+                if len(option) > 1 else option["method"]
+                for option in kb["payment_options"]
+            ]
+        }
+    }
+
+
+# Top 6 FAQ key -> the matching customer-facing entry: an index into WSSC_KNOWLEDGE_BASE["faqs"]
+# or a key of _kb_customer_faqs(). answer_guidance is written for the LLM and is never sent as-is,
+# so a Top 6 FAQ without an entry here is left to the LLM.
+FAQ_KB_LINKS = {
+    "billing_disputes": 0,
+    "payment_assistance": 1,
+    "leaks_high_usage": "leaks_high_usage",
+    "emergencies": 2,
+    "start_stop_service": 3,
+    "water_quality": 4
+}
+
+# More ways customers phrase each intent (top6 keys and _kb_customer_faqs() keys)
+FAQ_EXAMPLES = {
+    "billing_disputes": [
+        "My bill is much higher than usual", "Why did my water bill go up", "I want to dispute my bill",
+        "My bill doubled this quarter"
+    ],
+    "payment_assistance": [
+        "I can't afford my water bill", "Is there financial assistance for my water bill",
+        "Can I get a payment plan", "Help with past due water bill"
+    ],
+    "leaks_high_usage": [
+        "How do I check for a leak", "How do I check my toilet for a leak", "My meter keeps moving",
+        "Can I get a leak adjustment on my bill"
+    ],
+    "emergencies": [
+        "My water is off", "No water coming out of my faucets", "My water pressure is very low"
+    ],
+    "start_stop_service": [
+        "I'm moving and need to stop my water service", "Start water service at my new house",
+        "Transfer service to my name"
+    ],
+    "water_quality": [
+        "My water tastes like dirt", "My water smells musty", "Is my tap water safe to drink"
+    ],
+    "payment_methods": [
+        "Where can I pay my water bill", "Can I pay my bill online", "What payment methods do you accept",
+        "Can I pay by phone", "How do I set up autopay"
+    ]
+}
+
+
+class FaqMatcher:
+    """TF-IDF intent matcher over the Top 6 FAQs and knowledge base FAQs"""
+
+    def __init__(self):
+        self.intents: Dict[str, Dict[str, Any]] = {}
+        self.idf: Dict[str, float] = {}
+        # Weight of a query word no example uses - as rare as a word can be
+        self.unknown_idf = 1.0
+
+    def add_intent(self, intent_id: str, examples: List[str], answer: str):
+        self.intents[intent_id] = {"examples": [tokenize(e) for e in examples], "answer": answer}
+
+    def build(self):
+        """Compute IDF weights and example vectors once all intents are added"""
+        docs = [set(ex) for intent in self.intents.values() for ex in intent["examples"]]
+        total = len(docs) or 1
+        df: Dict[str, int] = {}
+        for doc in docs:
+            for token in doc:
+                df[token] = df.get(token, 0) + 1
+        self.idf = {t: math.log((1 + total) / (1 + n)) + 1 for t, n in df.items()}
+        self.unknown_idf = math.log(1 + total) + 1
+        for intent in self.intents.values():
+            intent["vectors"] = [self._vector(ex) for ex in intent["examples"]]
+        return self
+
+    def _vector(self, tokens: List[str], keep_unknown: bool = False) -> Dict[str, float]:
+        vec: Dict[str, float] = {}
+        for token in tokens:
+            if token in self.idf:
+                vec[token] = vec.get(token, 0.0) + self.idf[token]
+            elif keep_unknown:
+                vec[token] = vec.get(token, 0.0) + self.unknown_idf
+        norm = math.sqrt(sum(v * v for v in vec.values())) or 1.0
+        return {t: v / norm for t, v in vec.items()}
+
+    def match(self, message: str) -> Optional[Dict[str, Any]]:
+        """Return the best intent and its score, or None if nothing overlaps"""
+        # Words the FAQs never use still count against the match ("read my bill" is not "my bill")
+        query = self._vector(tokenize(message), keep_unknown=True)
+        if not query:
+            return None
+        best_id, best_score = None, 0.0
+        for intent_id, intent in self.intents.items():
+            for vec in intent["vectors"]:
+                score = sum(w * vec.get(t, 0.0) for t, w in query.items())
+                if score > best_score:
+                    best_id, best_score = intent_id, score
+        if best_id is None:
+            return None
+        return {"intent": best_id, "score": best_score, "answer": self.intents[best_id]["answer"]}
+
+
+def build_faq_matcher(promoted: List[Dict[str, Any]] = ()) -> FaqMatcher:
+    """Build the FAQ matcher from TOP_6_FAQS, WSSC_KNOWLEDGE_BASE["faqs"] and promoted answers"""
+    matcher = FaqMatcher()
+    kb_faqs = WSSC_KNOWLEDGE_BASE["faqs"]
+    customer_faqs = _kb_customer_faqs()
+    used = set()
+    for key, faq in TOP_6_FAQS.items():
+        link = FAQ_KB_LINKS.get(key)
+        if isinstance(link, int) and link < len(kb_faqs):
+            entry = kb_faqs[link]
+        elif link in customer_faqs:
+            entry = customer_faqs[link]
+        else:
+            continue
+        used.add(link)
+        examples = [faq["question"], faq["category"], entry["question"]] + FAQ_EXAMPLES.get(key, [])
+        answer = f"Happy to help with that!\n\n{_render_kb_faq(entry)}\n\n{FEEDBACK_ENDING}"
+        matcher.add_intent(f"top6:{key}", examples, answer)
+    for i, faq in enumerate(kb_faqs):
+        if i in used:
+            continue
+        answer = f"Happy to help with that!\n\n{_render_kb_faq(faq)}\n\n{FEEDBACK_ENDING}"
+        matcher.add_intent(f"kb_faq:{i}", [faq["question"]], answer)
+    for key, faq in customer_faqs.items():
+        if key in used:
+            continue
+        answer = f"Happy to help with that!\n\n{_render_kb_faq(faq)}\n\n{FEEDBACK_ENDING}"
+        matcher.add_intent(f"kb_faq:{key}", [faq["question"]] + FAQ_EXAMPLES.get(key, []), answer)
+    for doc in promoted:
+        matcher.add_intent(f"promoted:{doc['key']}", doc["examples"], doc["promoted_answer"])
+    return matcher.build()
+
+
+faq_matcher = build_faq_matcher()
+
+# Which path answered each chat request (emergency / faq / promoted / cache / llm / busy / error)
+chat_path_counts: Dict[str, int] = {"emergency": 0, "faq": 0, "promoted": 0, "cache": 0, "llm": 0, "busy": 0, "error": 0}
+
+
+def record_chat_answer(source: str):
+    chat_path_counts[source] += 1
+    CHAT_ANSWERS.labels(source).inc()
+
+
+def match_faq(message: str) -> Optional[Dict[str, Any]]:
+    """Return a canned FAQ answer when the match score clears FAQ_MATCH_THRESHOLD"""
+    with CHAT_STAGE_LATENCY.labels("faq_match").time():
+        match = faq_matcher.match(message)
+    if match and match["score"] >= FAQ_MATCH_THRESHOLD:
+        CACHE_EVENTS.labels("faq", "hit").inc()
+        match["source"] = "promoted" if match["intent"].startswith("promoted:") else "faq"
+        return match
+    CACHE_EVENTS.labels("faq", "miss").inc()
+    return None
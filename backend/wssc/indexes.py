@@ -0,0 +1,136 @@
+"""Index definitions and the startup query-plan self-check"""
+import logging
+from typing import List, Dict, Any
+from datetime import datetime, timezone
+
+from .database import ASCENDING, db
+
+logger = logging.getLogger(__name__)
+
+
+def index_specs() -> Dict[str, list]:
+    """collection -> indexes backing every query the API makes"""
+    from pymongo import IndexModel
+
+    return {
+        "chat_messages": [
+            IndexModel(
+                [("session_id", ASCENDING), ("timestamp", ASCENDING), ("message_id", ASCENDING)],
+                name="session_timestamp_message"
+            ),
+            IndexModel([("session_id", ASCENDING), ("role", ASCENDING)], name="session_role"),
+            IndexModel([("message_id", ASCENDING)], name="message_id_unique", unique=True),
+            IndexModel([("timestamp", ASCENDING), ("message_id", ASCENDING)], name="timestamp_message")
+        ],
+        "feedback": [
+            IndexModel(
+                [("feedback_id", ASCENDING)], name="feedback_id_unique", unique=True,
+                partialFilterExpression={"feedback_id": {"$exists": True}}
+            ),
+            IndexModel([("helpful", ASCENDING)], name="helpful"),
+            IndexModel([("timestamp", ASCENDING), ("feedback_id", ASCENDING)], name="timestamp_feedback")
+        ],
+        "knowledge_base": [
+            IndexModel([("type", ASCENDING)], name="type_unique", unique=True)
+        ],
+        "ai_config": [
+            IndexModel([("config_id", ASCENDING)], name="config_id_unique", unique=True)
+        ],
+        "session_context": [
+            IndexModel([("session_id", ASCENDING)], name="session_id_unique", unique=True)
+        ],
+        "status_checks": [
+            IndexModel([("timestamp", ASCENDING), ("id", ASCENDING)], name="timestamp_id")
+        ],
+        "answer_quality": [
+            IndexModel([("key", ASCENDING)], name="key_unique", unique=True),
+            IndexModel([("status", ASCENDING), ("kb_version", ASCENDING)], name="status_kb_version")
+        ],
+        "response_cache": [
+            IndexModel([("key", ASCENDING)], name="key_unique", unique=True),
+            IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0)
+        ],
+        "chat_archive": [
+            IndexModel([("session_id", ASCENDING), ("last_timestamp", ASCENDING)], name="session_last_timestamp")
+        ],
+        "worker_stats": [
+            IndexModel([("updated_at", ASCENDING)], name="updated_at_ttl", expireAfterSeconds=3600)
+        ]
+    }
+
+
+# (name, collection, filter, sort) for each canonical query - verified with explain()
+CANONICAL_QUERIES = [
+    ("session_history", "chat_messages", {"session_id": "self-check"}, [("timestamp", 1), ("message_id", 1)]),
+    ("feedback_target", "chat_messages", {"message_id": "self-check", "session_id": "self-check", "role": "assistant"}, None),
+    ("message_lookup", "chat_messages", {"message_id": "self-check"}, None),
+    ("archived_history", "chat_archive",
+     {"session_id": "self-check", "last_timestamp": {"$gte": datetime(2024, 1, 1, tzinfo=timezone.utc)}},
+     [("last_timestamp", 1)]),
+    ("feedback_counts", "feedback", {"helpful": True}, None),
+    ("knowledge_section", "knowledge_base", {"type": "wssc_billing"}, None),
+    ("top_6_faqs", "knowledge_base", {"type": "top_6_faqs"}, None),
+    ("ai_config", "ai_config", {"config_id": "wssc_ai_v3"}, None),
+    ("session_context", "session_context", {"session_id": "self-check"}, None),
+    ("status_checks", "status_checks", {}, [("timestamp", 1), ("id", 1)]),
+    ("export_messages", "chat_messages", {"timestamp": {"$gte": datetime(2024, 1, 1, tzinfo=timezone.utc)}},
+     [("timestamp", 1), ("message_id", 1)])
+]
+
+
+async def ensure_indexes():
+    """Create the indexes from index_specs() (no-op for ones that already exist)"""
+    specs = index_specs()
+    for collection, indexes in specs.items():
+        try:
+            await db[collection].create_indexes(indexes)
+        except Exception as e:
+            # One bad index (e.g. duplicates in old data) shouldn't block the others
+            logger.error(f"Error creating indexes on {collection}: {e}")
+            for index in indexes:
+                try:
+                    await db[collection].create_indexes([index])
+                except Exception as index_error:
+                    logger.error(f"Index {index.document['name']} on {collection} not created: {index_error}")
+    logger.info(f"Ensured indexes on {len(specs)} collections")
+
+
+def _plan_stages(plan: Any) -> List[str]:
+    """Collect every stage name in an explain() plan tree"""
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        for value in plan.values():
+            stages.extend(_plan_stages(value))
+    elif isinstance(plan, list):
+        for item in plan:
+            stages.extend(_plan_stages(item))
+    return stages
+
+
+async def verify_query_plans(strict: bool = False) -> Dict[str, List[str]]:
+    """explain() each canonical query and report any that fall back to a COLLSCAN"""
+    plans = {}
+    collscans = []
+    for name, collection, query, sort in CANONICAL_QUERIES:
+        cursor = db[collection].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        try:
+            explained = await cursor.explain()
+        except Exception as e:
+            logger.error(f"Error explaining {name} query: {e}")
+            continue
+        stages = _plan_stages(explained.get("queryPlanner", {}).get("winningPlan", {}))
+        plans[name] = stages
+        if "COLLSCAN" in stages:
+            collscans.append(name)
+    if collscans:
+        message = f"Queries doing a COLLSCAN: {', '.join(collscans)}"
+        if strict:
+            raise RuntimeError(message)
+        logger.warning(message)
+    else:
+        logger.info(f"Query plan self-check passed for {len(plans)} queries")
+    return plans
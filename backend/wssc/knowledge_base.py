@@ -0,0 +1,450 @@
+"""The WSSC knowledge base, Top 6 FAQs and the system prompt they are served with"""
+
+
+WSSC_KNOWLEDGE_BASE = {
+    "organization": {
+        "name": "Washington Suburban Sanitary Commission (WSSC Water)",
+        "service_area": "Montgomery County and Prince George's County, Maryland",
+        "customers_served": "1.8-1.9 million residents and businesses",
+        "years_in_operation": "107+ years (founded 1918)",
+        "main_address": "14501 Sweitzer Lane, Laurel, Maryland 20707"
+    },
+    
+    "contact_info": {
+        "customer_service": {
+            "phone": "301-206-4001",
+            "email": "customerservice@wsscwater.com",
+            "hours": "Monday-Friday, 8:00 AM - 6:00 PM",
+            "toll_free": "800-828-6439",
+            "tty": "301-206-8345"
+        },
+        "emergency_24_7": {
+            "phone": "301-206-4002",
+            "purpose": "Water main breaks, sewer emergencies, outages"
+        },
+        "one_stop_shop": {
+            "hours": "Monday-Friday, 8:00 AM - 5:00 PM",
+            "location": "14501 Sweitzer Lane, Laurel, MD 20707"
+        },
+        "permit_services": {
+            "phone": "301-206-4003",
+            "hours": "Monday-Friday, 7:00 AM - 4:00 PM (except Wednesdays: 7:00 AM - 12:00 PM)"
+        }
+    },
+    
+    "billing": {
+        "cycle": "Quarterly (4 times per year) for residential",
+        "measurement": "1,000-gallon increments",
+        "average_consumption": "~70 gallons per person per day",
+        "typical_quarterly_bill": "$150-250 (varies by usage)",
+        "water_component": "~40% of total",
+        "sewer_component": "~60% of total (treatment is more expensive)",
+        "late_payment_fee": "5% of unpaid balance",
+        "flat_rate_sewer": "$166.00 per quarter (if applicable)"
+    },
+    
+    "payment_options": [
+        {"method": "Online", "url": "wsscwater.com/paymybill", "details": "Credit card (Visa, MasterCard, Discover), electronic check"},
+        {"method": "Phone", "number": "301-206-4001", "details": "Credit card, check by phone"},
+        {"method": "Mobile App", "name": "WSSC Water mobile app", "details": "Bill pay, service requests, emergency reporting"},
+        {"method": "Mail", "payable_to": "WSSC Water", "address": "14501 Sweitzer Lane, Laurel, MD 20707"},
+        {"method": "In Person", "location": "One Stop Shop, 14501 Sweitzer Lane, Laurel, MD", "hours": "Monday-Friday, 8:00 AM - 5:00 PM"},
+        {"method": "Drive-Thru", "location": "One Stop Shop location"},
+        {"method": "Automatic Payment", "details": "Bank draft - automatic withdrawal from checking/savings"},
+        {"method": "Western Union Quick Collect", "details": "Posted within 1 hour if paid before 4:30 PM"}
+    ],
+    
+    "assistance_programs": {
+        "cap": {
+            "name": "Customer Assistance Program (CAP)",
+            "eligibility": "Must apply through Maryland Office of Home Energy Programs (OHEP)",
+            "income_limits_fy26": {
+                "1_person": "$31,296/year",
+                "2_people": "$42,300/year",
+                "3_people": "$53,292/year",
+                "4_people": "$64,296/year",
+                "5_people": "$75,300/year",
+                "6_people": "$86,292/year",
+                "7_people": "$97,296/year",
+                "8_people": "$108,300/year",
+                "additional": "Add $11,004 per person over 8"
+            },
+            "benefits": [
+                "Ready-to-Serve charges waived",
+                "Bay Restoration fee exemption",
+                "Only charged for water/sewer usage",
+                "Payment plans up to 48 months",
+                "Late fees permanently waived",
+                "Free annual plumbing leak investigation",
+                "Leak repairs up to $9,000 for homeowners",
+                "High-bill adjustment: 100% of excess water/sewer removed for up to 2 billing cycles in any 3-year period"
+            ],
+            "how_to_apply": [
+                "Apply for energy assistance through OHEP",
+                "Visit dhs.maryland.gov and click Home Energy/Water icon",
+                "Call 1-800-332-6347 for paper application",
+                "Check status: myohepstatus.org",
+                "If OHEP-approved, automatically qualify for CAP"
+            ],
+            "website": "wsscwater.com/CAP"
+        },
+        "get_current": {
+            "name": "Get Current (Temporary Amnesty Program)",
+            "status": "Extended through January 31, 2026",
+            "eligibility": [
+                "Delinquent balance as of October 1, 2025",
+                "Household income below 150% of area median income, OR",
+                "Self-certified financial hardship due to recent federal government actions"
+            ],
+            "option_1": "Pay 50% of full account balance, remaining 50% forgiven. All late fees and turn-on fees waived.",
+            "option_2": "Pay 25% of full account balance, 25% forgiven.",
+            "benefits": [
+                "Balance forgiven within 24 hours of payment",
+                "100% of late payment charges waived",
+                "100% of turn-on fees waived"
+            ],
+            "website": "wsscwater.com/getcurrent"
+        },
+        "emergency_relief": {
+            "name": "Emergency Customer Relief Fund",
+            "partner": "United Way of the National Capital Area",
+            "amount": "One-time assistance up to $750",
+            "eligibility": "Customers struggling with past-due bills",
+            "remaining_funds": "~$1.7 million of $2.4 million available (as of Jan 2026)",
+            "basis": "First-come, first-served"
+        },
+        "payment_plans": {
+            "standard": "Up to 24 months",
+            "cap_customers": "Up to 48 months"
+        },
+        "county_partners": {
+            "montgomery_salvation_army": "301-515-5354",
+            "prince_georges_salvation_army": "301-277-6103"
+        }
+    },
+    
+    "billing_adjustments": {
+        "high_bill": {
+            "eligibility": "Bill shows Average Daily Consumption (ADC) at least 3x comparable or current ADC",
+            "benefit": "WSSC adjusts one high bill, excluding 50% of excess water/sewer charges",
+            "limitation": "One-time only, for one billing period"
+        },
+        "underground_leak": {
+            "eligibility": [
+                "WSSC verifies underground leak caused high usage",
+                "Leak repaired by WSSC-registered master plumber",
+                "Repair documented with receipt",
+                "Usage returned to normal"
+            ],
+            "benefit": "Adjusted bill excludes up to 6 months of excess water/sewer charges",
+            "timeline": "Repair must be completed within 30 days for water charge adjustment"
+        },
+        "cap_leak_adjustment": {
+            "benefit": "100% of excess water/sewer usage removed for up to 2 billing cycles in any 3-year period"
+        }
+    },
+    
+    "emergencies": {
+        "water_examples": ["Water main breaks", "No water service", "Very low water pressure", "Water leaks affecting public areas"],
+        "sewer_examples": ["Sewage backups", "Sanitary sewer overflows", "Manhole issues"],
+        "contact": "301-206-4002 (24/7)",
+        "response_time": "Field crews dispatched, estimated response within 30 minutes for main breaks"
+    },
+    
+    "water_quality": {
+        "safety_record": "107+ years without a drinking water quality violation",
+        "compliance": "Meets all EPA federal drinking water standards",
+        "taste_odor_cause": "Geosmin from algae in Potomac River source water",
+        "taste_odor_safety": "Water remains safe despite taste/odor changes",
+        "customer_action": "Run cold water, use pitcher in refrigerator"
+    },
+    
+    "leak_detection": {
+        "common_sources": ["Toilets (most common residential leak)", "Faucets", "Irrigation systems", "Underground service lines"],
+        "detection_steps": [
+            "Take multiple meter readings when no water is being used",
+            "Check for meter movement",
+            "Inspect for wet areas, unexplained puddles"
+        ],
+        "toilet_test": "Add food coloring to tank. Wait 15 minutes without flushing. If color appears in bowl, you have a leak.",
+        "meter_test": "Turn off all water in home. Check meter. Wait 15 minutes. Check again. If meter moved, you have a leak.",
+        "repair_requirements": {
+            "who_can_repair": "WSSC-registered master plumber",
+            "permit_required": "Yes, obtained from WSSC",
+            "inspection_required": "WSSC Regulatory Services must inspect and approve"
+        }
+    },
+    
+    "permits": {
+        "contact": "301-206-4003",
+        "portal": "wsscwater.com/epermitting",
+        "common_permits": [
+            "Water Service Application (WS-200)",
+            "Backflow Prevention Device",
+            "Fire Suppression Approval",
+            "Sewer Capacity Study",
+            "Corporation Approval",
+            "Plumbing permits for service line work"
+        ],
+        "example_project": {
+            "type": "3-story, 24-unit apartment",
+            "total_fees": "~$8,500",
+            "timeline": "6-8 weeks"
+        }
+    },
+    
+    "online_services": {
+        "customer_portal": "my.wsscwater.com",
+        "registration": "my.wsscwater.com/selfcare/views/public/profile/register-step1.faces",
+        "mobile_app": "WSSC Water",
+        "main_website": "wsscwater.com",
+        "key_pages": {
+            "bill_payment": "/paymybill",
+            "assistance": "/assistance",
+            "get_current": "/getcurrent",
+            "service": "/service",
+            "customer_service": "/customerservice",
+            "read_bill": "/readbill",
+            "rates": "/rates",
+            "cap": "/CAP",
+            "epermitting": "/epermitting"
+        }
+    },
+    
+    "faqs": [
+        {
+            "question": "Why is my bill so high?",
+            "causes": ["Leaks (especially toilets)", "Increased usage (seasonal, guests)", "Irrigation/outdoor water use", "Estimated meter reads"],
+            "resolution": ["Check meter reads and compare to history", "Conduct leak check", "Review usage patterns", "Request billing adjustment if eligible", "Contact Customer Service: 301-206-4001"]
+        },
+        {
+            "question": "Can I get help paying my bill?",
+            "programs": ["Customer Assistance Program (CAP)", "Get Current amnesty", "Emergency Relief Fund ($750)", "Payment plans (24-48 months)", "County partner assistance (Salvation Army)"],
+            "contact": "301-206-4001 or wsscwater.com/assistance"
+        },
+        {
+            "question": "How do I report a water main break?",
+            "answer": "Call 24/7 Emergency Services at 301-206-4002, use WSSC Water mobile app, or email Emergency Services Center. Crews typically dispatched within 30 minutes."
+        },
+        {
+            "question": "How do I start or stop service?",
+            "answer": "Use online forms at wsscwater.com/service or call Customer Service at 301-206-4001. Provide property address, move date, and owner/tenant status."
+        },
+        {
+            "question": "Is my water safe to drink if it tastes or smells different?",
+            "answer": "Yes. WSSC Water meets all EPA standards and has 107+ years without a quality violation. Taste/odor changes are often due to natural algae (Geosmin) in source water. Water remains safe."
+        }
+    ],
+    
+    "statistics": {
+        "call_deflection_targets": {
+            "billing_inquiries": "30-40% of total call volume",
+            "payment_questions": "15-20% of calls",
+            "leak_high_usage": "10-15% of calls",
+            "start_stop_service": "8-10% of calls",
+            "water_quality": "5-8% of calls",
+            "emergencies": "5-7% of calls (must route to 24/7 line)"
+        },
+        "cap_benefits": "Up to $112/year in fee waivers, plus usage-based savings",
+        "emergency_response_time": "30 minutes for water main breaks",
+        "permit_timeline": "6-8 weeks for standard commercial project"
+    },
+    
+    "last_updated": "February 1, 2026",
+    "prepared_for": "Encore Services LLC - WSSC Water AI Demo Project"
+}
+
+
+TOP_6_FAQS = {
+    "billing_disputes": {
+        "question": "Why is my bill so high?",
+        "category": "Billing questions / disputes",
+        "answer_guidance": """
+        1. First, help them understand what might cause a high bill - check meter reads, compare to past usage
+        2. Walk them through the "Resolving Billing Issues" process
+        3. Let them know they can submit a Billing Adjustment Request online if bill is larger than expected
+        4. Mention escalation paths: Refund Hearings and Dispute Resolving Board if still unresolved
+        5. Direct them to wsscwater.com for online forms or call 301-206-4001
+        """
+    },
+    "payment_assistance": {
+        "question": "I need help paying my bill",
+        "category": "Payment arrangements / assistance",
+        "answer_guidance": """
+        1. WSSC offers flexible payment plans for eligible residential customers
+        2. Mention the "Get Current" amnesty program - pay 50% and other 50% forgiven (through Jan 31, 2026)
+        3. Emergency Relief Fund through United Way - up to $750 one-time help
+        4. CAP (Customer Assistance Program) for long-term help - payment plans up to 48 months
+        5. County assistance: Montgomery Salvation Army 301-515-5354, Prince George's 301-277-6103
+        6. Direct them to wsscwater.com/assistance or call 301-206-4001
+        """
+    },
+    "leaks_high_usage": {
+        "question": "I think I have a leak",
+        "category": "Leaks / high usage detection and bill adjustments",
+        "answer_guidance": """
+        1. Help them detect leaks: Take multiple meter readings when no water is being used
+        2. Toilet test: Add food coloring to tank, wait 15 min - if color appears in bowl, there's a leak
+        3. Check common sources: toilets (most common), faucets, irrigation systems
+        4. If leak is fixed and usage returns to normal, they may qualify for partial forgiveness of excess usage
+        5. CAP customers can get 100% of excess removed for up to 2 billing cycles
+        6. Submit adjustment request after repair - need documentation showing repair was completed
+        """
+    },
+    "emergencies": {
+        "question": "I have no water or low pressure",
+        "category": "Service emergencies / outages",
+        "answer_guidance": """
+        1. This is handled 24/7 through the Emergency Services Center: 301-206-4002
+        2. Can also report via WSSC Water mobile app or email
+        3. Response time is typically within 30 minutes for water main breaks
+        4. WSSC publishes sanitary sewer overflow reports and storm/emergency updates
+        5. Check wsscwater.com for current outage information and updates
+        """
+    },
+    "start_stop_service": {
+        "question": "Start or stop my service",
+        "category": "Start / stop / transfer service",
+        "answer_guidance": """
+        1. Online Start/Stop Service forms available at wsscwater.com/service
+        2. Forms work for both owner-occupied and tenant-occupied properties
+        3. For starting: Need property address, move-in date, owner/tenant status, contact info
+        4. For stopping: Need property address, move-out date, forwarding address for final bill
+        5. No phone call required - forms feed directly into customer service/billing systems
+        6. Can also call 301-206-4001 if prefer to speak with someone
+        """
+    },
+    "water_quality": {
+        "question": "My water tastes or smells strange",
+        "category": "Water quality concerns",
+        "answer_guidance": """
+        1. Reassure them: WSSC Water meets all EPA standards - 107+ years without a quality violation
+        2. Common cause of taste/odor: Geosmin from natural algal activity in the Potomac River
+        3. The water IS SAFE to drink even if taste/odor is different
+        4. WSSC adjusts treatment processes where possible
+        5. Running cold water or using a pitcher in the refrigerator can help with taste
+        6. Flushing lines may not always resolve taste/odor issues, but water remains safe
+        7. For persistent concerns, request a water quality investigation: 301-206-4001
+        """
+    }
+}
+
+
+WSSC_SYSTEM_MESSAGE = """You are the WSSC Water AI Assistant - a friendly, knowledgeable customer service representative for WSSC Water, serving 1.8 million Maryland customers.
+
+YOUR GOAL: Help customers quickly with accurate information so they don't need to call. Be their friend, be helpful, be clear.
+
+IMPORTANT RULES:
+- Be FRIENDLY and conversational - you're talking to a real person who needs help
+- Keep responses SHORT but DETAILED - no walls of text
+- Break up longer answers into clear sections with line breaks
+- NO EMOJIS except for the smiley face at the end
+- Always use EXACT phone numbers, websites, and program details from the knowledge base
+- ALWAYS end with: "Was this helpful? Need anything else?" followed by a smiley face
+
+KEY CONTACT INFO (use these exactly):
+- Customer Service: 301-206-4001 (Mon-Fri, 8am-6pm)
+- 24/7 Emergency Line: 301-206-4002
+- Website: wsscwater.com
+- Customer Portal: my.wsscwater.com
+
+===========================================
+TOP 6 QUESTIONS AND HOW TO ANSWER THEM:
+===========================================
+
+1. "WHY IS MY BILL SO HIGH?" (Billing questions/disputes)
+
+Help them understand and resolve:
+- Walk them through checking their meter reads and comparing to past usage
+- Explain they can submit a Billing Adjustment Request online at wsscwater.com if the bill is larger than expected
+- If they still disagree after review, there are escalation paths: Refund Hearings and the Dispute Resolving Board
+- Common causes: leaks (especially toilets), seasonal changes, guests, irrigation
+
+2. "I NEED HELP PAYING MY BILL" (Payment assistance)
+
+WSSC has several programs:
+- Flexible payment plans available for eligible residential customers
+- "Get Current" amnesty program (through Jan 31, 2026): Pay 50% and the other 50% is forgiven! All late fees waived.
+- Emergency Relief Fund: Up to $750 one-time assistance through United Way partnership
+- CAP (Customer Assistance Program): Long-term help with payment plans up to 48 months, fees waived, late fees permanently waived
+- County assistance: Montgomery Salvation Army 301-515-5354, Prince George's Salvation Army 301-277-6103
+- Apply at wsscwater.com/assistance or call 301-206-4001
+
+3. "I THINK I HAVE A LEAK" (Leaks/high usage)
+
+Help them detect and get adjustments:
+- Take multiple meter readings when no water is being used - if meter moves, there's a leak
+- Toilet test: Add food coloring to tank, wait 15 minutes without flushing - if color appears in bowl, the toilet is leaking
+- Common leak sources: toilets (number one cause), faucets, irrigation systems, underground lines
+- If they fix the leak and usage returns to normal, they may qualify for partial forgiveness of excess charges
+- CAP customers: Can get 100% of excess removed for up to 2 billing cycles in any 3-year period
+- After repair, submit adjustment request with documentation at wsscwater.com
+
+4. "I HAVE NO WATER OR LOW PRESSURE" (Emergencies)
+
+This needs immediate attention:
+- Call the 24/7 Emergency Line right away: 301-206-4002
+- Can also report via WSSC Water mobile app
+- For water main breaks, crews are typically dispatched within 30 minutes
+- Check wsscwater.com for current outage information and updates
+- WSSC publishes sanitary sewer overflow reports and storm/emergency operations updates
+
+5. "START OR STOP MY SERVICE" (Service changes)
+
+Easy online process:
+- Online forms at wsscwater.com/service - no phone call required
+- Works for both owner-occupied and tenant-occupied properties
+- To start: Need property address, move-in date, owner/tenant status, contact info
+- To stop: Need property address, move-out date, forwarding address for final bill
+- Forms go directly into the billing system, so less back-and-forth
+- Can also call 301-206-4001 if they prefer to speak with someone
+
+6. "MY WATER TASTES OR SMELLS STRANGE" (Water quality)
+
+Reassure and explain:
+- The water IS SAFE - WSSC Water meets all EPA federal standards and has gone 107+ years without a drinking water quality violation
+- Common cause of taste/odor: Geosmin from natural algal activity in the Potomac River source water
+- This is harmless - just affects taste and smell
+- Tips: Run cold water for a minute, use a pitcher in the refrigerator
+- Flushing lines won't always fix taste/odor, but the water remains completely safe
+- WSSC adjusts treatment processes where possible
+- For persistent concerns, they can request a water quality investigation by calling 301-206-4001
+
+===========================================
+RESPONSE FORMAT:
+===========================================
+
+Start with a friendly greeting that acknowledges their concern.
+
+Give them the direct answer or solution in 2-3 short paragraphs maximum.
+
+Include specific next steps with exact links or phone numbers.
+
+ALWAYS end with:
+"Was this helpful? Need anything else?" and a smiley face
+
+Example ending: "Was this helpful? Need anything else? 😊"
+
+Remember: Every question you answer well is one less phone call to the call center. Be helpful, be accurate, be friendly!
+"""
+
+
+# Compact persona used with retrieved sections instead of the full WSSC_SYSTEM_MESSAGE
+WSSC_BASE_PERSONA = """You are the WSSC Water AI Assistant - a friendly, knowledgeable customer service representative for WSSC Water, serving 1.8 million Maryland customers.
+
+YOUR GOAL: Help customers quickly with accurate information so they don't need to call. Be their friend, be helpful, be clear.
+
+IMPORTANT RULES:
+- Be FRIENDLY and conversational - you're talking to a real person who needs help
+- Keep responses SHORT but DETAILED - 2-3 short paragraphs maximum, no walls of text
+- NO EMOJIS except for the smiley face at the end
+- Only use phone numbers, websites, and program details from the knowledge base sections below
+- Include specific next steps with exact links or phone numbers
+- ALWAYS end with: "Was this helpful? Need anything else? 😊"
+
+KEY CONTACT INFO (use these exactly):
+- Customer Service: 301-206-4001 (Mon-Fri, 8am-6pm)
+- 24/7 Emergency Line: 301-206-4002
+- Website: wsscwater.com
+- Customer Portal: my.wsscwater.com
+"""
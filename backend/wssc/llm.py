@@ -0,0 +1,362 @@
+"""LLM clients and admission control"""
+import logging
+import time
+import json
+from typing import List, Optional, Dict, Any
+import random
+import asyncio
+import httpx
+from contextlib import asynccontextmanager
+
+from .config import (
+    ANTHROPIC_API_KEY, ANTHROPIC_API_URL, LLM_API_KEY, LLM_BACKEND, LLM_CONNECT_TIMEOUT, LLM_MAX_CONCURRENCY,
+    LLM_MAX_QUEUE, LLM_MAX_RETRIES, LLM_MAX_TOKENS, LLM_MODEL, LLM_PROVIDER, LLM_QUEUE_TIMEOUT, LLM_READ_TIMEOUT,
+    LLM_RETRY_BASE_DELAY, MOCK_LLM_ERROR_RATE, MOCK_LLM_FIRST_TOKEN_MS, MOCK_LLM_RESPONSE_TOKENS,
+    MOCK_LLM_TOKENS_PER_SEC
+)
+from .metrics import CHAT_STAGE_LATENCY, LLM_ERRORS, LLM_IN_FLIGHT, LLM_QUEUE_DEPTH, LLM_RETRIES
+from .faq import FEEDBACK_ENDING
+from .retrieval import build_system_prompt
+from .context import render_turns, SessionContext
+
+logger = logging.getLogger(__name__)
+
+
+class LlmTransientError(Exception):
+    """Upstream failure worth retrying (rate limit, overload, 5xx)"""
+
+
+TRANSIENT_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504, 529}
+
+
+def is_transient_llm_error(error: Exception) -> bool:
+    if isinstance(error, (LlmTransientError, httpx.TransportError, asyncio.TimeoutError)):
+        return True
+    # emergentintegrations surfaces the provider SDK's exception types
+    name = type(error).__name__
+    return any(marker in name for marker in ("RateLimit", "Timeout", "Connection", "ServiceUnavailable", "InternalServer"))
+
+
+def retry_delay(attempt: int) -> float:
+    """Exponential backoff with full jitter"""
+    return random.uniform(0, LLM_RETRY_BASE_DELAY * (2 ** attempt))
+
+
+async def with_retries(call):
+    """Run call(), retrying transient LLM errors up to LLM_MAX_RETRIES times"""
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        try:
+            return await call()
+        except Exception as e:
+            if attempt >= LLM_MAX_RETRIES or not is_transient_llm_error(e):
+                LLM_ERRORS.labels("transient" if is_transient_llm_error(e) else "fatal").inc()
+                raise
+            delay = retry_delay(attempt)
+            LLM_RETRIES.inc()
+            logger.warning(f"Transient LLM error ({e}), retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+
+def build_llm_messages(ctx: SessionContext, message: str) -> tuple:
+    """(system prompt, messages) for a new user message in this session"""
+    # Recent turns go in as real messages; the API wants them to start with the customer
+    history = list(ctx.recent)
+    while history and history[0]["role"] != "user":
+        history.pop(0)
+    system = build_system_prompt(message, ctx.render(include_recent=False))
+    return system, history + [{"role": "user", "content": message}]
+
+
+class AnthropicLlmClient:
+    """Pooled keep-alive client for the Anthropic Messages API, created once per process"""
+
+    def __init__(self, api_key: str, url: str):
+        self.api_key = api_key
+        self.url = url
+        self.http: Optional[httpx.AsyncClient] = None
+
+    async def start(self):
+        if self.http is None:
+            self.http = httpx.AsyncClient(
+                timeout=httpx.Timeout(LLM_READ_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+                limits=httpx.Limits(
+                    max_connections=LLM_MAX_CONCURRENCY * 2,
+                    max_keepalive_connections=LLM_MAX_CONCURRENCY,
+                    keepalive_expiry=120
+                ),
+                headers={
+                    "x-api-key": self.api_key,
+                    "anthropic-version": "2023-06-01",
+                    "content-type": "application/json"
+                }
+            )
+
+    async def close(self):
+        if self.http is not None:
+            await self.http.aclose()
+            self.http = None
+
+    def _payload(self, system: str, messages: List[Dict[str, str]], stream: bool) -> Dict[str, Any]:
+        return {
+            "model": LLM_MODEL,
+            "max_tokens": LLM_MAX_TOKENS,
+            "system": system,
+            "messages": messages,
+            "stream": stream
+        }
+
+    @staticmethod
+    def _raise_for_status(status_code: int, body: bytes):
+        if status_code in TRANSIENT_STATUS_CODES:
+            raise LlmTransientError(f"Anthropic API error {status_code}: {body[:200]!r}")
+        raise RuntimeError(f"Anthropic API error {status_code}: {body[:200]!r}")
+
+    async def complete(
+        self, session_id: str, system: str, messages: List[Dict[str, str]], usage: Optional[Dict[str, int]] = None
+    ) -> str:
+        """Whole reply text; fills usage with the API's input/output token counts when given"""
+        await self.start()
+
+        async def call():
+            resp = await self.http.post(self.url, json=self._payload(system, messages, stream=False))
+            if resp.status_code != 200:
+                self._raise_for_status(resp.status_code, resp.content)
+            data = resp.json()
+            if usage is not None:
+                usage.update({k: data.get("usage", {}).get(k, 0) for k in ("input_tokens", "output_tokens")})
+            return "".join(block.get("text", "") for block in data.get("content", []) if block.get("type") == "text")
+
+        return await with_retries(call)
+
+    async def stream(self, session_id: str, system: str, messages: List[Dict[str, str]]):
+        """Yield text deltas; retries only happen before the first token is sent"""
+        await self.start()
+        payload = self._payload(system, messages, stream=True)
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            started = False
+            try:
+                async with self.http.stream("POST", self.url, json=payload) as resp:
+                    if resp.status_code != 200:
+                        self._raise_for_status(resp.status_code, await resp.aread())
+                    async for line in resp.aiter_lines():
+                        if not line.startswith("data:"):
+                            continue
+                        event = json.loads(line[5:])
+                        if event.get("type") == "content_block_delta" and event["delta"].get("type") == "text_delta":
+                            started = True
+                            yield event["delta"]["text"]
+                        elif event.get("type") == "error":
+                            raise LlmTransientError(f"Anthropic stream error: {event.get('error')}")
+                return
+            except Exception as e:
+                if started or attempt >= LLM_MAX_RETRIES or not is_transient_llm_error(e):
+                    LLM_ERRORS.labels("transient" if is_transient_llm_error(e) else "fatal").inc()
+                    raise
+                delay = retry_delay(attempt)
+                LLM_RETRIES.inc()
+                logger.warning(f"Transient LLM stream error ({e}), retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+
+class EmergentLlmClient:
+    """emergentintegrations LlmChat (Emergent key) - whole completions only"""
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def complete(
+        self, session_id: str, system: str, messages: List[Dict[str, str]], usage: Optional[Dict[str, int]] = None
+    ) -> str:
+        history = messages[:-1]
+        if history:
+            system = f"{system}\n{render_turns(history)}\n"
+
+        # Pulls in the whole emergentintegrations/litellm stack - only when this backend is used
+        from emergentintegrations.llm.chat import LlmChat, UserMessage
+
+        async def call():
+            chat = LlmChat(
+                api_key=LLM_API_KEY,
+                session_id=session_id,
+                system_message=system
+            ).with_model(LLM_PROVIDER, LLM_MODEL)
+            return await chat.send_message(UserMessage(text=messages[-1]["content"]))
+
+        return await with_retries(call)
+
+    async def stream(self, session_id: str, system: str, messages: List[Dict[str, str]]):
+        # No token streaming through LlmChat - send the whole reply as one chunk
+        yield await self.complete(session_id, system, messages)
+
+
+class MockLlmClient:
+    """Local stand-in for Claude with configurable first-token latency, token rate and error rate"""
+
+    def __init__(self, first_token_ms: float, tokens_per_sec: float, response_tokens: int, error_rate: float):
+        self.first_token_ms = first_token_ms
+        self.tokens_per_sec = tokens_per_sec
+        self.response_tokens = response_tokens
+        self.error_rate = error_rate
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    def _tokens(self, messages: List[Dict[str, str]]) -> List[str]:
+        topic = messages[-1]["content"][:60]
+        words = f"Thanks for asking about {topic}. Here is what you need to know:".split()
+        filler = "You can find details at wsscwater.com or call Customer Service at 301-206-4001.".split()
+        while len(words) < self.response_tokens:
+            words.extend(filler)
+        return [w + " " for w in words[:self.response_tokens]] + [FEEDBACK_ENDING]
+
+    async def stream(self, session_id: str, system: str, messages: List[Dict[str, str]]):
+        await asyncio.sleep(self.first_token_ms / 1000)
+        if random.random() < self.error_rate:
+            raise LlmTransientError("Mock LLM injected error")
+        delay = 1 / self.tokens_per_sec if self.tokens_per_sec > 0 else 0
+        for i, token in enumerate(self._tokens(messages)):
+            if i and delay:
+                await asyncio.sleep(delay)
+            yield token
+
+    async def complete(
+        self, session_id: str, system: str, messages: List[Dict[str, str]], usage: Optional[Dict[str, int]] = None
+    ) -> str:
+        async def call():
+            return "".join([token async for token in self.stream(session_id, system, messages)])
+
+        return await with_retries(call)
+
+
+def create_llm_client():
+    """Pick the LLM backend from LLM_BACKEND"""
+    if LLM_BACKEND == "mock":
+        logger.warning("Using the mock LLM backend - responses are simulated")
+        return MockLlmClient(MOCK_LLM_FIRST_TOKEN_MS, MOCK_LLM_TOKENS_PER_SEC, MOCK_LLM_RESPONSE_TOKENS, MOCK_LLM_ERROR_RATE)
+    if LLM_BACKEND == "anthropic" or (LLM_BACKEND == "auto" and ANTHROPIC_API_KEY):
+        return AnthropicLlmClient(ANTHROPIC_API_KEY, ANTHROPIC_API_URL)
+    return EmergentLlmClient()
+
+
+llm_client = create_llm_client()
+
+
+class LlmOverloadedError(Exception):
+    """Raised when an LLM call can't be admitted before its deadline"""
+
+
+class LlmAdmissionController:
+    """Caps concurrent LLM calls, serializes each session and coalesces duplicate questions"""
+
+    def __init__(self, max_concurrency: int, max_queue: int, queue_timeout: float):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.waiting = 0
+        self.in_flight = 0
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._session_locks: Dict[str, List[Any]] = {}
+        self._coalesced: Dict[str, asyncio.Future] = {}
+        self.stats = {
+            "admitted": 0, "queued": 0, "rejected_queue_full": 0, "rejected_timeout": 0, "coalesced": 0,
+            "total_wait_ms": 0.0, "max_wait_ms": 0.0
+        }
+
+    async def _acquire(self, session_lock: asyncio.Lock):
+        """This session's turn, then a global slot - both or neither"""
+        await session_lock.acquire()
+        try:
+            await self._semaphore.acquire()
+        except BaseException:
+            session_lock.release()
+            raise
+
+    @asynccontextmanager
+    async def slot(self, session_id: str):
+        """Hold one of the global LLM slots (one per session at a time) for the block"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        entry = self._session_locks.setdefault(session_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        session_lock = entry[0]
+        try:
+            if not session_lock.locked() and not self._semaphore.locked():
+                # A slot is free and the session has nothing in flight - take it without queueing
+                await self._acquire(session_lock)
+            else:
+                # Waiting behind the same session's earlier call counts as queueing too, under the same deadline
+                if self.waiting >= self.max_queue:
+                    self.stats["rejected_queue_full"] += 1
+                    raise LlmOverloadedError("LLM wait queue is full")
+                self.waiting += 1
+                LLM_QUEUE_DEPTH.set(self.waiting)
+                self.stats["queued"] += 1
+                started = time.perf_counter()
+                try:
+                    await asyncio.wait_for(self._acquire(session_lock), self.queue_timeout)
+                except asyncio.TimeoutError:
+                    self.stats["rejected_timeout"] += 1
+                    raise LlmOverloadedError(f"No LLM slot within {self.queue_timeout}s")
+                finally:
+                    self.waiting -= 1
+                    LLM_QUEUE_DEPTH.set(self.waiting)
+                    CHAT_STAGE_LATENCY.labels("admission_wait").observe(time.perf_counter() - started)
+                    waited = (time.perf_counter() - started) * 1000
+                    self.stats["total_wait_ms"] += waited
+                    self.stats["max_wait_ms"] = max(self.stats["max_wait_ms"], waited)
+            self.stats["admitted"] += 1
+            self.in_flight += 1
+            LLM_IN_FLIGHT.set(self.in_flight)
+            try:
+                yield
+            finally:
+                self.in_flight -= 1
+                LLM_IN_FLIGHT.set(self.in_flight)
+                self._semaphore.release()
+                session_lock.release()
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                self._session_locks.pop(session_id, None)
+
+    async def run(self, session_id: str, call, coalesce_key: Optional[str] = None):
+        """Run call() in a slot; concurrent calls with the same coalesce_key share one result"""
+        if coalesce_key and coalesce_key in self._coalesced:
+            self.stats["coalesced"] += 1
+            return await asyncio.shield(self._coalesced[coalesce_key])
+
+        async def admitted():
+            async with self.slot(session_id):
+                return await call()
+
+        if not coalesce_key:
+            return await admitted()
+        # Shielded so one caller disconnecting doesn't cancel the answer others are waiting on
+        task = asyncio.ensure_future(admitted())
+        self._coalesced[coalesce_key] = task
+        task.add_done_callback(lambda _: self._coalesced.pop(coalesce_key, None))
+        return await asyncio.shield(task)
+
+    def counters(self) -> Dict[str, Any]:
+        """Raw stats and gauges - what WorkerStats adds up across workers"""
+        return {**self.stats, "queue_depth": self.waiting, "in_flight": self.in_flight, "max_concurrency": self.max_concurrency}
+
+    @staticmethod
+    def summarize(counters: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            **{k: v for k, v in counters.items() if k != "total_wait_ms"},
+            "max_wait_ms": round(counters["max_wait_ms"], 1),
+            "avg_wait_ms": round(counters["total_wait_ms"] / max(counters["queued"], 1), 1)
+        }
+
+    def snapshot(self) -> Dict[str, Any]:
+        return self.summarize(self.counters())
+
+
+llm_admission = LlmAdmissionController(LLM_MAX_CONCURRENCY, LLM_MAX_QUEUE, LLM_QUEUE_TIMEOUT)
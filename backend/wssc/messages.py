@@ -0,0 +1,84 @@
+"""Chat message persistence"""
+import logging
+import time
+from typing import Dict, Any
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from .metrics import CHAT_STAGE_LATENCY
+from .write_behind import write_queue
+from .stats import record_stats
+from .context import context_manager
+
+logger = logging.getLogger(__name__)
+
+
+_last_message_time = datetime.min.replace(tzinfo=timezone.utc)
+
+
+def message_timestamp() -> datetime:
+    """Now at BSON (millisecond) precision, strictly increasing so history keeps write order"""
+    global _last_message_time
+    now = datetime.now(timezone.utc)
+    now = now.replace(microsecond=now.microsecond // 1000 * 1000)
+    if now <= _last_message_time:
+        now = _last_message_time + timedelta(milliseconds=1)
+    _last_message_time = now
+    return now
+
+
+async def save_chat_message(
+    session_id: str, role: str, content: str, message_id: str = None, source: str = None, reply_to: str = None,
+    first_turn: bool = False
+):
+    """Save chat message to MongoDB for history and training"""
+    started = time.perf_counter()
+    try:
+        message_doc = {
+            "message_id": message_id or str(uuid.uuid4()),
+            "session_id": session_id,
+            "role": role,
+            "content": content,
+            "timestamp": message_timestamp(),
+            "feedback": None,
+            "helpful": None
+        }
+        if source:
+            message_doc["source"] = source
+        if reply_to:
+            # The question this reply answers, for feedback aggregation
+            message_doc["reply_to"] = reply_to
+        if first_turn:
+            # Answered without conversation context, so it can be reused for the same question elsewhere
+            message_doc["first_turn"] = True
+        await write_queue.put("chat_messages", "insert", doc=message_doc)
+        inc = {"messages.total": 1, f"messages.{role}": 1}
+        if source:
+            inc[f"sources.{source}"] = 1
+        await record_stats(inc, session_id=session_id if role == "user" else None)
+        # Handing the writes to write_queue; the MongoDB write itself is WRITE_BEHIND_FLUSH_LATENCY
+        CHAT_STAGE_LATENCY.labels("write_enqueue").observe(time.perf_counter() - started)
+        return message_doc["message_id"]
+    except Exception as e:
+        logger.error(f"Error saving chat message: {e}")
+        return None
+
+
+async def save_emergency_exchange(
+    session_id: str, message: str, emergency: Dict[str, Any], user_message_id: str, reply_id: str
+):
+    """Persist an emergency-lane exchange after the reply is sent, so write backpressure can't delay it"""
+    await save_chat_message(session_id=session_id, role="user", content=message, message_id=user_message_id)
+    await save_chat_message(
+        session_id=session_id,
+        role="assistant",
+        content=emergency["answer"],
+        message_id=reply_id,
+        source="emergency",
+        reply_to=user_message_id
+    )
+    try:
+        ctx = await context_manager.get(session_id)
+        await context_manager.record_exchange(ctx, message, emergency["answer"])
+    except Exception as e:
+        logger.error(f"Error recording emergency exchange: {e}")
@@ -0,0 +1,73 @@
+"""Prometheus metrics and the MongoDB command counter"""
+from prometheus_client import Counter, Gauge, Histogram
+from typing import Dict
+
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+REQUEST_LATENCY = Histogram(
+    "wssc_http_request_duration_seconds", "Request latency by route", ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS
+)
+CHAT_STAGE_LATENCY = Histogram(
+    "wssc_chat_stage_duration_seconds", "Time spent in each stage of a chat request", ["stage"],
+    buckets=LATENCY_BUCKETS
+)
+CHAT_ANSWERS = Counter("wssc_chat_answers_total", "Chat replies by the path that produced them", ["source"])
+LLM_ERRORS = Counter("wssc_llm_errors_total", "LLM calls that failed after retries", ["kind"])
+LLM_RETRIES = Counter("wssc_llm_retries_total", "LLM calls retried after a transient error")
+CACHE_EVENTS = Counter("wssc_cache_events_total", "Cache lookups by cache and result", ["cache", "result"])
+MONGO_COMMAND_LATENCY = Histogram(
+    "wssc_mongo_command_duration_seconds", "MongoDB command latency", ["command", "outcome"],
+    buckets=LATENCY_BUCKETS
+)
+WRITE_BEHIND_FLUSH_LATENCY = Histogram(
+    "wssc_write_behind_flush_duration_seconds", "Time to flush one write-behind batch", buckets=LATENCY_BUCKETS
+)
+# Set explicitly (not set_function) so the values reach the multiprocess files; summed over live workers
+LLM_QUEUE_DEPTH = Gauge("wssc_llm_queue_depth", "Requests waiting for an LLM slot", multiprocess_mode="livesum")
+LLM_IN_FLIGHT = Gauge("wssc_llm_in_flight", "LLM calls in progress", multiprocess_mode="livesum")
+WRITE_BEHIND_BUFFERED = Gauge(
+    "wssc_write_behind_buffered", "Writes waiting for the next flush", multiprocess_mode="livesum"
+)
+ARCHIVED_MESSAGES = Counter("wssc_archived_messages_total", "Chat messages moved from hot storage to the archive")
+ARCHIVE_BYTES_RECLAIMED = Counter(
+    "wssc_archive_bytes_reclaimed_total", "BSON bytes removed from hot storage minus archive bytes added"
+)
+
+
+class MongoOpCounter:
+    """Counts and times MongoDB commands by name (command monitoring events from the driver)"""
+
+    def __init__(self):
+        self.counts: Dict[str, int] = {}
+
+    def started(self, event):
+        self.counts[event.command_name] = self.counts.get(event.command_name, 0) + 1
+
+    def succeeded(self, event):
+        MONGO_COMMAND_LATENCY.labels(event.command_name, "ok").observe(event.duration_micros / 1e6)
+
+    def failed(self, event):
+        MONGO_COMMAND_LATENCY.labels(event.command_name, "error").observe(event.duration_micros / 1e6)
+
+    def listener(self):
+        """pymongo CommandListener forwarding to this counter (built on connect, pymongo loads lazily)"""
+        from pymongo import monitoring
+
+        counter = self
+
+        class Listener(monitoring.CommandListener):
+            def started(self, event):
+                counter.started(event)
+
+            def succeeded(self, event):
+                counter.succeeded(event)
+
+            def failed(self, event):
+                counter.failed(event)
+
+        return Listener()
+
+
+mongo_op_counter = MongoOpCounter()
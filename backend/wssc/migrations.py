@@ -0,0 +1,97 @@
+"""One-off data migrations, recorded in db.migrations"""
+import logging
+import time
+from datetime import datetime, timezone
+
+from .database import db
+from .write_behind import write_queue
+
+logger = logging.getLogger(__name__)
+
+
+# Fields older versions stored as ISO strings
+DATETIME_FIELDS = {
+    "chat_messages": ["timestamp", "feedback_at"],
+    "feedback": ["timestamp"],
+    "status_checks": ["timestamp"],
+    "session_context": ["updated_at"]
+}
+MIGRATION_BATCH_SIZE = 500
+
+
+async def migrate_timestamps():
+    """One-off migration of ISO-string timestamps to BSON datetimes, recorded in db.migrations"""
+    from pymongo import UpdateOne
+
+    try:
+        if await db.migrations.find_one({"_id": "native_timestamps"}):
+            return
+        started = time.perf_counter()
+        # Spool files replayed from an older version still carry strings
+        await write_queue.flush()
+        converted = 0
+        for collection, fields in DATETIME_FIELDS.items():
+            for field in fields:
+                batch = []
+                async for doc in db[collection].find({field: {"$type": "string"}}, {field: 1}):
+                    try:
+                        value = datetime.fromisoformat(doc[field])
+                    except ValueError:
+                        logger.warning(f"Unparseable {collection}.{field} on {doc['_id']}: {doc[field]!r}")
+                        continue
+                    if value.tzinfo is None:
+                        value = value.replace(tzinfo=timezone.utc)
+                    batch.append(UpdateOne({"_id": doc["_id"]}, {"$set": {field: value}}))
+                    if len(batch) >= MIGRATION_BATCH_SIZE:
+                        await db[collection].bulk_write(batch, ordered=False)
+                        converted += len(batch)
+                        batch = []
+                if batch:
+                    await db[collection].bulk_write(batch, ordered=False)
+                    converted += len(batch)
+        try:
+            # Superseded by session_timestamp_message
+            await db.chat_messages.drop_index("session_timestamp")
+        except Exception:
+            pass
+        await db.migrations.update_one(
+            {"_id": "native_timestamps"},
+            {"$set": {"converted": converted, "completed_at": datetime.now(timezone.utc)}},
+            upsert=True
+        )
+        elapsed = (time.perf_counter() - started) * 1000
+        logger.info(f"Migrated {converted} ISO-string timestamps to BSON datetimes in {elapsed:.0f}ms")
+    except Exception as e:
+        # Not marked done, so the next start picks up where this one stopped
+        logger.error(f"Error migrating timestamps: {e}")
+
+
+async def backfill_feedback_ids():
+    """One-off migration giving feedback saved before feedback_id existed a stable one (its keyset tiebreak)"""
+    from pymongo import UpdateOne
+
+    try:
+        if await db.migrations.find_one({"_id": "feedback_ids"}):
+            return
+        # Spool files replayed from an older version can still hold feedback without an id
+        await write_queue.flush()
+        backfilled = 0
+        batch = []
+        async for doc in db.feedback.find({"feedback_id": {"$exists": False}}, {"_id": 1}):
+            batch.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"feedback_id": f"legacy-{doc['_id']}"}}))
+            if len(batch) >= MIGRATION_BATCH_SIZE:
+                await db.feedback.bulk_write(batch, ordered=False)
+                backfilled += len(batch)
+                batch = []
+        if batch:
+            await db.feedback.bulk_write(batch, ordered=False)
+            backfilled += len(batch)
+        await db.migrations.update_one(
+            {"_id": "feedback_ids"},
+            {"$set": {"backfilled": backfilled, "completed_at": datetime.now(timezone.utc)}},
+            upsert=True
+        )
+        if backfilled:
+            logger.info(f"Backfilled feedback_id on {backfilled} legacy feedback documents")
+    except Exception as e:
+        logger.error(f"Error backfilling feedback ids: {e}")
@@ -0,0 +1,53 @@
+"""Request and response models"""
+from pydantic import BaseModel, Field, ConfigDict
+from typing import List, Optional
+import uuid
+from datetime import datetime, timezone
+
+from .config import CHAT_BATCH_MAX_ITEMS
+
+
+class StatusCheck(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    client_name: str
+    timestamp: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+class StatusCheckCreate(BaseModel):
+    client_name: str
+
+class ChatMessage(BaseModel):
+    message: str
+    session_id: Optional[str] = None
+
+class ChatResponse(BaseModel):
+    response: str
+    session_id: str
+    source: str = "llm"
+    # Send message_id back with /chat/feedback to rate this reply
+    message_id: Optional[str] = None
+    user_message_id: Optional[str] = None
+
+class FeedbackInput(BaseModel):
+    session_id: str
+    message_id: str
+    helpful: bool
+    needs_more_info: Optional[bool] = False
+    # Client-generated id makes retried submissions (e.g. an offline queue) idempotent
+    feedback_id: Optional[str] = None
+
+class FeedbackBatchInput(BaseModel):
+    events: List[FeedbackInput] = Field(..., min_length=1, max_length=500)
+
+class ChatBatchItem(BaseModel):
+    message: str
+    # Caller's own key (e.g. an eval case id), echoed back on the result
+    id: Optional[str] = None
+
+class ChatBatchInput(BaseModel):
+    items: List[ChatBatchItem] = Field(..., min_length=1, max_length=CHAT_BATCH_MAX_ITEMS)
+    concurrency: Optional[int] = None
+    # Dry runs write nothing: no chat_messages, stats or response cache entries
+    dry_run: bool = False
+    # False skips the semantic response cache, e.g. to see fresh answers after a prompt edit
+    use_cache: bool = True
@@ -0,0 +1,69 @@
+"""Keyset pagination cursors"""
+from fastapi import HTTPException
+import base64
+import json
+from typing import Optional, Dict, Any
+from datetime import datetime
+
+from .config import PAGE_SIZE_MAX
+from .database import ASCENDING
+
+
+HISTORY_FIELDS = {
+    "message_id", "session_id", "role", "content", "timestamp", "source",
+    "feedback", "helpful", "needs_more_info", "feedback_at"
+}
+STATUS_FIELDS = {"id", "client_name", "timestamp"}
+
+
+def encode_cursor(timestamp: datetime, tiebreak: str) -> str:
+    """Opaque cursor for the (timestamp, id) of the last row on a page"""
+    raw = json.dumps([timestamp.isoformat(), tiebreak]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        timestamp, tiebreak = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return datetime.fromisoformat(timestamp), str(tiebreak)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def parse_fields(fields: Optional[str], allowed: set) -> Optional[set]:
+    """Validate a comma-separated ?fields= projection (None means every field)"""
+    if not fields:
+        return None
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - allowed
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return requested
+
+
+async def keyset_page(
+    collection, query: Dict[str, Any], tiebreak: str, cursor: Optional[str], limit: int, fields: Optional[set]
+) -> tuple:
+    """One page of query in (timestamp, tiebreak) order and the cursor for the next page"""
+    limit = max(1, min(limit, PAGE_SIZE_MAX))
+    if cursor:
+        after, after_id = decode_cursor(cursor)
+        query = {**query, "$or": [
+            {"timestamp": {"$gt": after}},
+            {"timestamp": after, tiebreak: {"$gt": after_id}}
+        ]}
+    projection = {"_id": 0}
+    if fields:
+        # The sort keys are always fetched so the next cursor can be built
+        projection.update({name: 1 for name in fields | {"timestamp", tiebreak}})
+    # One extra row tells us whether there is a next page without a count()
+    docs = await collection.find(query, projection).sort(
+        [("timestamp", ASCENDING), (tiebreak, ASCENDING)]
+    ).limit(limit + 1).to_list(limit + 1)
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_cursor(docs[-1]["timestamp"], docs[-1][tiebreak])
+    if fields:
+        docs = [{name: value for name, value in doc.items() if name in fields} for doc in docs]
+    return docs, next_cursor
@@ -0,0 +1,299 @@
+"""Feedback loop that promotes helpful answers into the FAQ fast path"""
+import logging
+import hashlib
+from typing import List, Optional, Dict, Any
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from .config import (
+    ANSWER_PROMOTION_INTERVAL, DEMOTE_MIN_NOT_HELPFUL, PROMOTE_MIN_HELPFUL, PROMOTE_MIN_RATIO,
+    WRITE_BEHIND_FLUSH_INTERVAL
+)
+from .database import db
+from . import faq
+from .faq import build_faq_matcher
+from .response_cache import compute_kb_version, normalize_question, response_cache
+from .retention import archived_messages
+
+logger = logging.getLogger(__name__)
+
+
+def answer_hash(answer: str) -> str:
+    return hashlib.sha1(answer.encode()).hexdigest()[:16]
+
+
+def answer_verdict(counts: Dict[str, Any]) -> str:
+    """promote / demote / hold for one answer's feedback counts"""
+    # A helpful vote that still needed more info counts for neither side
+    positive = counts.get("helpful", 0) - counts.get("helpful_needs_more_info", 0)
+    negative = counts.get("not_helpful", 0)
+    votes = positive + negative
+    if positive >= PROMOTE_MIN_HELPFUL and positive / votes >= PROMOTE_MIN_RATIO:
+        return "promote"
+    if negative >= DEMOTE_MIN_NOT_HELPFUL and negative / votes >= 1 - PROMOTE_MIN_RATIO:
+        return "demote"
+    return "hold"
+
+
+class AnswerPromoter:
+    """Folds new feedback into per-question answer scores (db.answer_quality) on a watermark.
+
+    Each run claims the window (watermark, now - lag] with a compare-and-set on
+    db.job_state, so only one worker processes it. Answers that clear the bar are
+    served from the FAQ matcher; answers that keep getting rated unhelpful are
+    dropped from it and from the response cache. Only first-turn replies count, since
+    a follow-up answer depends on context it would be served without.
+
+    The worker that makes a change bumps a published version (with the cache keys to
+    drop), and every worker checks it on each tick, so they all serve the same set.
+    """
+
+    JOB_ID = "answer_promotion"
+    SYNC_ID = "answer_promotion:published"
+    # Cache discards kept in the published doc - far more than workers fall behind by
+    MAX_DISCARDS = 1000
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.stats = {"runs": 0, "feedback_processed": 0, "promoted": 0, "demoted": 0, "errors": 0, "reloads": 0}
+        self.promoted_count = 0
+        # Published version this worker's FAQ matcher and response cache reflect
+        self.version = 0
+        self.process = True
+        self._task = None
+
+    @property
+    def lag(self) -> timedelta:
+        # Feedback and the messages it rates arrive through the write-behind queue
+        return timedelta(seconds=max(5.0, WRITE_BEHIND_FLUSH_INTERVAL * 4))
+
+    def start(self, process: bool = True):
+        """Tick every interval; process=False only follows what other workers publish"""
+        self.process = process
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            if self.process:
+                await self.run_once()
+            await self.sync()
+
+    async def _claim_window(self) -> Optional[tuple]:
+        state = await db.job_state.find_one({"_id": self.JOB_ID}) or {}
+        since = state.get("watermark")
+        until = datetime.now(timezone.utc) - self.lag
+        if since and since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        if since and since >= until:
+            return None
+        result = await db.job_state.update_one(
+            {"_id": self.JOB_ID, "watermark": state.get("watermark")},
+            {"$set": {"watermark": until}},
+            upsert=not state
+        )
+        if not (result.modified_count or result.upserted_id):
+            return None
+        return since, until
+
+    async def run_once(self):
+        """Process the feedback that arrived since the last watermark"""
+        try:
+            window = await self._claim_window()
+        except Exception as e:
+            # Another worker upserted the job state first
+            logger.debug(f"Answer promotion window not claimed: {e}")
+            return
+        if not window:
+            return
+        since, until = window
+        try:
+            processed, changed, discarded = await self._process(since, until)
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.error(f"Error running answer promotion: {e}")
+            # Hand the window back so the next run retries it
+            await db.job_state.update_one({"_id": self.JOB_ID, "watermark": until}, {"$set": {"watermark": since}})
+            return
+        self.stats["runs"] += 1
+        self.stats["feedback_processed"] += processed
+        if changed or discarded:
+            await self._publish(discarded)
+        if processed:
+            logger.info(f"Answer promotion: {processed} feedback events, {changed} answers changed status")
+
+    async def _process(self, since: Optional[datetime], until: datetime) -> tuple:
+        from pymongo import UpdateOne
+
+        window = {"$lte": until}
+        if since:
+            window["$gt"] = since
+        # Replies (or questions) ChatArchiver has moved out of chat_messages come back unmatched
+        pipeline = [
+            {"$match": {"timestamp": window}},
+            {"$lookup": {"from": "chat_messages", "localField": "message_id", "foreignField": "message_id", "as": "reply"}},
+            {"$unwind": {"path": "$reply", "preserveNullAndEmptyArrays": True}},
+            {"$lookup": {"from": "chat_messages", "localField": "reply.reply_to", "foreignField": "message_id", "as": "question"}},
+            {"$unwind": {"path": "$question", "preserveNullAndEmptyArrays": True}},
+            {"$project": {
+                "_id": 0, "session_id": 1, "message_id": 1, "helpful": 1, "needs_more_info": 1,
+                "reply.source": 1, "reply.reply_to": 1, "reply.first_turn": 1, "reply.content": 1,
+                "question": "$question.content"
+            }}
+        ]
+        archived: Dict[str, Dict[str, Dict[str, Any]]] = {}
+
+        async def archived_message(session_id: Optional[str], message_id: Optional[str]) -> Dict[str, Any]:
+            if session_id not in archived:
+                archived[session_id] = await archived_messages(session_id)
+            return archived[session_id].get(message_id) or {}
+
+        # key -> {"question", "examples", "answers": {hash: counts}}
+        clusters: Dict[str, Dict[str, Any]] = {}
+        processed = 0
+        async for event in db.feedback.aggregate(pipeline):
+            reply = event.get("reply") or await archived_message(event.get("session_id"), event["message_id"])
+            if not (
+                reply.get("source") in ("llm", "cache", "promoted")
+                and reply.get("reply_to") is not None
+                and reply.get("first_turn") is True
+            ):
+                continue
+            event["answer"] = reply["content"]
+            if event.get("question") is None:
+                event["question"] = (await archived_message(event.get("session_id"), reply["reply_to"])).get("content")
+                if event["question"] is None:
+                    continue
+            key = normalize_question(event["question"])
+            if not key:
+                continue
+            processed += 1
+            cluster = clusters.setdefault(key, {"question": event["question"], "examples": set(), "answers": {}})
+            cluster["examples"].add(event["question"])
+            counts = cluster["answers"].setdefault(answer_hash(event["answer"]), {"answer": event["answer"]})
+            field = "helpful" if event["helpful"] else "not_helpful"
+            counts[field] = counts.get(field, 0) + 1
+            if event["helpful"] and event.get("needs_more_info"):
+                counts["helpful_needs_more_info"] = counts.get("helpful_needs_more_info", 0) + 1
+        if not clusters:
+            return processed, 0, []
+        
+        now = datetime.now(timezone.utc)
+        updates = []
+        for key, cluster in clusters.items():
+            inc, fields = {}, {"updated_at": now}
+            for digest, counts in cluster["answers"].items():
+                fields[f"answers.{digest}.answer"] = counts.pop("answer")
+                for name, value in counts.items():
+                    inc[f"answers.{digest}.{name}"] = value
+            updates.append(UpdateOne(
+                {"key": key},
+                {
+                    "$inc": inc,
+                    "$set": fields,
+                    "$addToSet": {"examples": {"$each": sorted(cluster["examples"])[:5]}},
+                    "$setOnInsert": {"question": cluster["question"], "status": "candidate"}
+                },
+                upsert=True
+            ))
+        await db.answer_quality.bulk_write(updates, ordered=False)
+        
+        kb_version = compute_kb_version()
+        changed, verdicts, discarded = 0, [], []
+        async for doc in db.answer_quality.find({"key": {"$in": list(clusters)}}):
+            answers = doc.get("answers", {})
+            for counts in answers.values():
+                if answer_verdict(counts) == "demote":
+                    # Stop serving it from the semantic cache too (other workers drop it on sync)
+                    await response_cache.discard(doc["key"])
+                    discarded.append(doc["key"])
+                    break
+            best = max(answers.values(), key=lambda c: c.get("helpful", 0) - c.get("not_helpful", 0))
+            promote = answer_verdict(best) == "promote"
+            if promote and (doc.get("status") != "promoted" or doc.get("promoted_answer") != best["answer"]):
+                verdicts.append(UpdateOne({"_id": doc["_id"]}, {"$set": {
+                    "status": "promoted", "promoted_answer": best["answer"],
+                    "kb_version": kb_version, "promoted_at": now
+                }}))
+                self.stats["promoted"] += 1
+            elif not promote and doc.get("status") == "promoted":
+                verdicts.append(UpdateOne({"_id": doc["_id"]}, {
+                    "$set": {"status": "demoted", "demoted_at": now},
+                    "$unset": {"promoted_answer": ""}
+                }))
+                self.stats["demoted"] += 1
+        if verdicts:
+            await db.answer_quality.bulk_write(verdicts, ordered=False)
+            changed = len(verdicts)
+        return processed, changed, discarded
+
+    async def _publish(self, discarded: List[str]):
+        """Bump the published version, with the cache keys to drop, compare-and-set against other publishers"""
+        for _ in range(5):
+            try:
+                state = await db.job_state.find_one({"_id": self.SYNC_ID}) or {}
+                version = state.get("version", 0) + 1
+                entries = [{"key": key, "version": version} for key in discarded]
+                result = await db.job_state.update_one(
+                    {"_id": self.SYNC_ID, "version": state.get("version")},
+                    {
+                        "$set": {"version": version, "published_at": datetime.now(timezone.utc)},
+                        "$push": {"discarded": {"$each": entries, "$slice": -self.MAX_DISCARDS}}
+                    },
+                    upsert=not state
+                )
+                if result.modified_count or result.upserted_id:
+                    return
+            except Exception as e:
+                # Lost an upsert race - reread and retry
+                logger.debug(f"Answer promotion publish retry: {e}")
+        logger.error("Could not publish answer promotion changes; workers pick them up on restart")
+
+    async def sync(self):
+        """Reload if another worker (or this one) published promotions, demotions or cache discards"""
+        try:
+            state = await db.job_state.find_one({"_id": self.SYNC_ID}, {"version": 1, "discarded": 1})
+        except Exception as e:
+            logger.error(f"Error checking answer promotion version: {e}")
+            return
+        if not state or state.get("version", 0) == self.version:
+            return
+        for entry in state.get("discarded", []):
+            if entry["version"] > self.version:
+                response_cache.forget(entry["key"])
+        if await self.load():
+            self.stats["reloads"] += 1
+
+    async def load(self) -> bool:
+        """Rebuild the FAQ matcher with the answers promoted for the current knowledge base"""
+        try:
+            # Read before the answers, so a change published in between is picked up next tick
+            state = await db.job_state.find_one({"_id": self.SYNC_ID}, {"version": 1}) or {}
+            promoted = await db.answer_quality.find(
+                {"status": "promoted", "kb_version": compute_kb_version()},
+                {"_id": 0, "key": 1, "examples": 1, "promoted_answer": 1}
+            ).to_list(None)
+            faq.faq_matcher = build_faq_matcher(promoted)
+            self.promoted_count = len(promoted)
+            self.version = state.get("version", 0)
+            if promoted:
+                logger.info(f"FAQ fast path serving {len(promoted)} promoted answers")
+            return True
+        except Exception as e:
+            logger.error(f"Error loading promoted answers: {e}")
+            return False
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {**self.stats, "serving": self.promoted_count, "version": self.version}
+
+
+answer_promoter = AnswerPromoter(ANSWER_PROMOTION_INTERVAL)
@@ -0,0 +1,203 @@
+"""Semantic cache of LLM answers"""
+import logging
+import math
+import time
+import json
+import hashlib
+from typing import Optional, Dict, Any
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from .config import RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_THRESHOLD, RESPONSE_CACHE_TTL_SECONDS
+from .metrics import CACHE_EVENTS
+from .database import db
+from .knowledge_base import TOP_6_FAQS, WSSC_KNOWLEDGE_BASE, WSSC_SYSTEM_MESSAGE
+from .faq import tokenize
+
+logger = logging.getLogger(__name__)
+
+
+EMBEDDING_DIMS = 1024
+
+
+def _hash_feature(feature: str) -> int:
+    """Stable hash (unlike hash()) so vectors match across restarts and workers"""
+    return int.from_bytes(hashlib.md5(feature.encode()).digest()[:4], "little") % EMBEDDING_DIMS
+
+
+def embed_text(text: str) -> Dict[int, float]:
+    """Hashing-vectorizer embedding over unigrams and bigrams, L2 normalized"""
+    tokens = tokenize(text)
+    features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    vec: Dict[int, float] = {}
+    for feature in features:
+        idx = _hash_feature(feature)
+        vec[idx] = vec.get(idx, 0.0) + 1.0
+    norm = math.sqrt(sum(v * v for v in vec.values())) or 1.0
+    return {i: v / norm for i, v in vec.items()}
+
+
+def cosine_similarity(a: Dict[int, float], b: Dict[int, float]) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(w * b.get(i, 0.0) for i, w in a.items())
+
+
+def normalize_question(text: str) -> str:
+    return " ".join(tokenize(text))
+
+
+def compute_kb_version() -> str:
+    """Content hash of everything the assistant answers from"""
+    payload = json.dumps([WSSC_KNOWLEDGE_BASE, TOP_6_FAQS, WSSC_SYSTEM_MESSAGE], sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+class ResponseCache:
+    """LRU + TTL cache of LLM answers matched by embedding similarity, backed by db.response_cache"""
+
+    def __init__(self, threshold: float, max_entries: int, ttl_seconds: int):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.kb_version = compute_kb_version()
+        self.entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.stats = {"hits": 0, "shared_hits": 0, "misses": 0, "evictions": 0, "invalidations": 0, "discarded": 0}
+
+    def _expired(self, entry: Dict[str, Any], now: float) -> bool:
+        return now - entry["created_at"] > self.ttl_seconds
+
+    def _put(self, key: str, question: str, response: str, created_at: float):
+        self.entries[key] = {
+            "question": question,
+            "vector": embed_text(question),
+            "response": response,
+            "created_at": created_at
+        }
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    async def lookup(self, question: str) -> Optional[Dict[str, Any]]:
+        """Return the cached answer for the closest stored question above the threshold"""
+        now = time.time()
+        key = normalize_question(question)
+        best_key, best_score = None, 0.0
+        if key in self.entries and not self._expired(self.entries[key], now):
+            best_key, best_score = key, 1.0
+        else:
+            vector = embed_text(question)
+            expired = []
+            for entry_key, entry in self.entries.items():
+                if self._expired(entry, now):
+                    expired.append(entry_key)
+                    continue
+                score = cosine_similarity(vector, entry["vector"])
+                if score > best_score:
+                    best_key, best_score = entry_key, score
+            for entry_key in expired:
+                del self.entries[entry_key]
+        if (best_key is None or best_score < self.threshold) and await self._load_shared(key, question, now):
+            best_key, best_score = key, 1.0
+        if best_key is None or best_score < self.threshold:
+            self.stats["misses"] += 1
+            CACHE_EVENTS.labels("response", "miss").inc()
+            return None
+        self.entries.move_to_end(best_key)
+        self.stats["hits"] += 1
+        CACHE_EVENTS.labels("response", "hit").inc()
+        return {"response": self.entries[best_key]["response"], "score": best_score}
+
+    async def _load_shared(self, key: str, question: str, now: float) -> bool:
+        """Pull an exact repeat another worker answered from db.response_cache into memory"""
+        if not key:
+            return False
+        # Similarity matching stays in memory; the shared store is checked by normalized key only
+        try:
+            doc = await db.response_cache.find_one(
+                {"key": key, "kb_version": self.kb_version, "created_at": {"$gt": now - self.ttl_seconds}},
+                {"_id": 0, "response": 1, "created_at": 1}
+            )
+        except Exception as e:
+            logger.error(f"Error reading shared response cache: {e}")
+            return False
+        if not doc:
+            return False
+        self._put(key, question, doc["response"], doc["created_at"])
+        self.stats["shared_hits"] += 1
+        return True
+
+    async def store(self, question: str, response: str):
+        key = normalize_question(question)
+        if not key:
+            return
+        now = time.time()
+        self._put(key, question, response, now)
+        try:
+            await db.response_cache.update_one(
+                {"key": key},
+                {"$set": {
+                    "key": key,
+                    "question": question,
+                    "response": response,
+                    "kb_version": self.kb_version,
+                    "created_at": now,
+                    "expires_at": datetime.fromtimestamp(now + self.ttl_seconds, timezone.utc)
+                }},
+                upsert=True
+            )
+        except Exception as e:
+            logger.error(f"Error persisting response cache entry: {e}")
+
+    def forget(self, key: str):
+        """Drop one normalized question from this worker's memory only"""
+        if self.entries.pop(key, None) is not None:
+            self.stats["discarded"] += 1
+
+    async def discard(self, key: str):
+        """Drop one normalized question, e.g. after its answer was rated unhelpful"""
+        self.forget(key)
+        try:
+            await db.response_cache.delete_one({"key": key})
+        except Exception as e:
+            logger.error(f"Error discarding response cache entry: {e}")
+
+    async def invalidate(self, kb_version: str):
+        """Drop every entry built against a different knowledge base version"""
+        if kb_version != self.kb_version:
+            self.entries.clear()
+            self.stats["invalidations"] += 1
+        self.kb_version = kb_version
+        try:
+            result = await db.response_cache.delete_many({"kb_version": {"$ne": kb_version}})
+            if result.deleted_count:
+                logger.info(f"Invalidated {result.deleted_count} stale response cache entries")
+        except Exception as e:
+            logger.error(f"Error invalidating response cache: {e}")
+
+    async def load(self):
+        """Warm the in-memory cache from MongoDB, most recent entries first"""
+        try:
+            cutoff = time.time() - self.ttl_seconds
+            docs = await db.response_cache.find(
+                {"kb_version": self.kb_version, "created_at": {"$gt": cutoff}},
+                {"_id": 0}
+            ).sort("created_at", -1).to_list(self.max_entries)
+            for doc in reversed(docs):
+                self._put(doc["key"], doc["question"], doc["response"], doc["created_at"])
+            logger.info(f"Response cache warmed with {len(docs)} entries")
+        except Exception as e:
+            logger.error(f"Error loading response cache: {e}")
+
+    def snapshot(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "size": len(self.entries),
+            "hit_rate": f"{(self.stats['hits'] / max(lookups, 1)) * 100:.1f}%",
+            "kb_version": self.kb_version
+        }
+
+
+response_cache = ResponseCache(RESPONSE_CACHE_THRESHOLD, RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_TTL_SECONDS)
@@ -0,0 +1,345 @@
+"""Retention: TTL indexes and the chat archive"""
+import logging
+import time
+import zlib
+from typing import List, Optional, Dict, Any
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from .config import (
+    CHAT_ARCHIVE_AFTER_DAYS, PAGE_SIZE_MAX, RETENTION_BATCH_SIZE, RETENTION_INTERVAL, RETENTION_TTL_DAYS
+)
+from .metrics import ARCHIVE_BYTES_RECLAIMED, ARCHIVED_MESSAGES
+from .database import acquire_lock, ASCENDING, db, release_lock
+from .pagination import decode_cursor, encode_cursor, keyset_page
+
+logger = logging.getLogger(__name__)
+
+
+# collection -> the datetime field its TTL index expires on
+TTL_FIELDS = {
+    "session_context": "updated_at",
+    "feedback": "timestamp",
+    "status_checks": "timestamp",
+    "chat_archive": "last_timestamp"
+}
+
+
+def as_utc(value: datetime) -> datetime:
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def pack_messages(messages: List[Dict[str, Any]]) -> bytes:
+    """zlib-compressed BSON for one archived session day"""
+    import bson
+
+    return zlib.compress(bson.encode({"messages": messages}), 6)
+
+
+def unpack_messages(archive_doc: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    if not archive_doc:
+        return []
+    import bson
+    from bson.codec_options import CodecOptions
+
+    decoded = bson.decode(zlib.decompress(archive_doc["data"]), CodecOptions(tz_aware=True))
+    return decoded["messages"]
+
+
+def bson_size(doc: Optional[Dict[str, Any]]) -> int:
+    import bson
+
+    return len(bson.encode(doc)) if doc else 0
+
+
+async def ensure_ttl_indexes():
+    """Create, retune (collMod) or drop the RETENTION_TTL_DAYS indexes to match the config"""
+    for collection, days in RETENTION_TTL_DAYS.items():
+        field = TTL_FIELDS[collection]
+        name = f"{field}_ttl"
+        try:
+            current = (await db[collection].index_information()).get(name)
+            if days <= 0:
+                if current:
+                    await db[collection].drop_index(name)
+                    logger.info(f"Dropped TTL index on {collection} - keeping documents forever")
+                continue
+            seconds = days * 86400
+            if not current:
+                await db[collection].create_index([(field, ASCENDING)], name=name, expireAfterSeconds=seconds)
+            elif current.get("expireAfterSeconds") != seconds:
+                await db.command("collMod", collection, index={"name": name, "expireAfterSeconds": seconds})
+                logger.info(f"TTL on {collection}.{field} changed to {days} days")
+        except Exception as e:
+            logger.error(f"Error syncing TTL index on {collection}: {e}")
+
+
+class ChatArchiver:
+    """Moves chat_messages older than the retention window into db.chat_archive.
+
+    Each (session, UTC day) becomes one document holding the day's messages as
+    zlib-compressed BSON. Days are archived whole and merged by message_id, so a run
+    that dies between the archive write and the hot delete is repaired by the next one.
+    A db.locks lease keeps it to one worker at a time.
+    """
+
+    LOCK = "chat_archive"
+
+    def __init__(self, archive_after_days: int, interval: float, batch_size: int):
+        self.archive_after_days = archive_after_days
+        self.interval = interval
+        self.batch_size = batch_size
+        self.stats = {
+            "runs": 0, "session_days": 0, "messages_archived": 0,
+            "hot_bytes_removed": 0, "archive_bytes_added": 0, "errors": 0
+        }
+        self.last_run: Optional[Dict[str, Any]] = None
+        self._task = None
+
+    def cutoff(self, now: datetime = None) -> datetime:
+        """Start of the oldest UTC day still kept hot"""
+        now = now or datetime.now(timezone.utc)
+        day = (now - timedelta(days=self.archive_after_days)).date()
+        return datetime(day.year, day.month, day.day, tzinfo=timezone.utc)
+
+    def start(self):
+        if self.archive_after_days <= 0:
+            return
+        logger.info(f"Archiving chat messages older than {self.archive_after_days} days")
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _loop(self):
+        while True:
+            await self.run_once()
+            await asyncio.sleep(self.interval)
+
+    async def run_once(self) -> Dict[str, Any]:
+        """Archive everything older than the cutoff (bounded by the lease); returns this run's totals"""
+        if self.archive_after_days <= 0:
+            return {"skipped": "disabled"}
+        lease = max(60.0, self.interval)
+        if not await acquire_lock(self.LOCK, lease):
+            return {"skipped": "another worker is archiving"}
+        started = time.monotonic()
+        run = {"session_days": 0, "messages_archived": 0, "hot_bytes_removed": 0, "archive_bytes_added": 0}
+        try:
+            cutoff = self.cutoff()
+            # Stop well inside the lease so a second worker never overlaps this one
+            while time.monotonic() - started < lease / 2:
+                batch = await db.chat_messages.find(
+                    {"timestamp": {"$lt": cutoff}}, {"_id": 0, "session_id": 1, "timestamp": 1}
+                ).sort([("timestamp", ASCENDING), ("message_id", ASCENDING)]).limit(self.batch_size).to_list(None)
+                if not batch:
+                    break
+                days = {(doc["session_id"], as_utc(doc["timestamp"]).date()) for doc in batch}
+                for session_id, day in sorted(days):
+                    await self._archive_day(session_id, day, run)
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.error(f"Error archiving chat messages: {e}")
+        finally:
+            await release_lock(self.LOCK)
+        self.stats["runs"] += 1
+        for key, value in run.items():
+            self.stats[key] += value
+        run["bytes_reclaimed"] = run["hot_bytes_removed"] - run["archive_bytes_added"]
+        run["seconds"] = round(time.monotonic() - started, 2)
+        self.last_run = {**run, "finished_at": datetime.now(timezone.utc).isoformat()}
+        if run["messages_archived"]:
+            logger.info(
+                f"Archived {run['messages_archived']} messages from {run['session_days']} session days, "
+                f"reclaimed {run['bytes_reclaimed']} bytes of hot storage"
+            )
+        return run
+
+    async def _archive_day(self, session_id: str, day, run: Dict[str, Any]):
+        day_start = datetime(day.year, day.month, day.day, tzinfo=timezone.utc)
+        hot = await db.chat_messages.find(
+            {"session_id": session_id, "timestamp": {"$gte": day_start, "$lt": day_start + timedelta(days=1)}}
+        ).to_list(None)
+        if not hot:
+            return
+        archive_id = f"{session_id}:{day:%Y-%m-%d}"
+        existing = await db.chat_archive.find_one({"_id": archive_id})
+        merged = {message["message_id"]: message for message in unpack_messages(existing)}
+        for message in hot:
+            merged[message["message_id"]] = {
+                **{k: v for k, v in message.items() if k != "_id"}, "timestamp": as_utc(message["timestamp"])
+            }
+        messages = sorted(merged.values(), key=lambda m: (m["timestamp"], m["message_id"]))
+        archive_doc = {
+            "_id": archive_id,
+            "session_id": session_id,
+            "day": day_start,
+            "first_timestamp": messages[0]["timestamp"],
+            "last_timestamp": messages[-1]["timestamp"],
+            "count": len(messages),
+            "codec": "zlib+bson",
+            "data": pack_messages(messages),
+            "archived_at": datetime.now(timezone.utc)
+        }
+        await db.chat_archive.replace_one({"_id": archive_id}, archive_doc, upsert=True)
+        await db.chat_messages.delete_many({"_id": {"$in": [message["_id"] for message in hot]}})
+
+        hot_bytes = sum(bson_size(message) for message in hot)
+        archive_bytes = bson_size(archive_doc) - bson_size(existing)
+        run["session_days"] += 1
+        run["messages_archived"] += len(hot)
+        run["hot_bytes_removed"] += hot_bytes
+        run["archive_bytes_added"] += archive_bytes
+        ARCHIVED_MESSAGES.inc(len(hot))
+        ARCHIVE_BYTES_RECLAIMED.inc(max(0, hot_bytes - archive_bytes))
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "bytes_reclaimed": self.stats["hot_bytes_removed"] - self.stats["archive_bytes_added"],
+            "archive_after_days": self.archive_after_days,
+            "ttl_days": dict(RETENTION_TTL_DAYS),
+            "last_run": self.last_run
+        }
+
+
+chat_archiver = ChatArchiver(CHAT_ARCHIVE_AFTER_DAYS, RETENTION_INTERVAL, RETENTION_BATCH_SIZE)
+
+
+async def storage_report() -> Dict[str, Any]:
+    """Document count and on-disk size per retained collection (collStats; empty where unsupported)"""
+    report = {}
+    for collection in ["chat_messages", "chat_archive", *TTL_FIELDS]:
+        try:
+            stats = await db.command("collStats", collection)
+            report[collection] = {
+                "count": stats.get("count", 0),
+                "size_bytes": stats.get("size", 0),
+                "storage_bytes": stats.get("storageSize", 0),
+                "index_bytes": stats.get("totalIndexSize", 0)
+            }
+        except Exception as e:
+            logger.debug(f"collStats unavailable for {collection}: {e}")
+    return report
+
+
+async def archived_messages(session_id: str) -> Dict[str, Dict[str, Any]]:
+    """Every archived message of a session by message_id (empty for sessions that were never archived)"""
+    messages = {}
+    async for doc in db.chat_archive.find({"session_id": session_id}):
+        for message in unpack_messages(doc):
+            messages[message["message_id"]] = message
+    return messages
+
+
+async def rate_archived_messages(session_id: str, ratings: Dict[str, Dict[str, Any]]) -> set:
+    """Set {message_id: fields} on a session's archived assistant messages; returns the message_ids it found"""
+    found = set()
+    async for doc in db.chat_archive.find({"session_id": session_id}):
+        # Repacked against the data we read, so a concurrent archive run isn't overwritten
+        for _ in range(3):
+            messages = unpack_messages(doc)
+            hits = [m for m in messages if m["message_id"] in ratings and m.get("role") == "assistant"]
+            if not hits:
+                break
+            for message in hits:
+                message.update(ratings[message["message_id"]])
+            result = await db.chat_archive.update_one(
+                {"_id": doc["_id"], "data": doc["data"]}, {"$set": {"data": pack_messages(messages)}}
+            )
+            if result.matched_count:
+                found.update(message["message_id"] for message in hits)
+                break
+            doc = await db.chat_archive.find_one({"_id": doc["_id"]})
+            if not doc:
+                break
+    return found
+
+
+async def messages_page(query: Dict[str, Any], cursor: Optional[str], limit: int, fields: Optional[set]) -> tuple:
+    """keyset_page over chat_messages (timestamp-bounded query) merged with the archived days it covers"""
+    bounds = query.get("timestamp", {})
+    after = decode_cursor(cursor) if cursor else None
+    archive_query: Dict[str, Any] = {}
+    lower = [as_utc(value) for value in (bounds.get("$gte"), after and after[0]) if value]
+    if lower:
+        archive_query["last_timestamp"] = {"$gte": max(lower)}
+    if "$lt" in bounds:
+        archive_query["first_timestamp"] = {"$lt": bounds["$lt"]}
+    if not await db.chat_archive.find_one(archive_query, {"_id": 1}):
+        return await keyset_page(db.chat_messages, query, "message_id", cursor, limit, fields)
+
+    def in_range(message: Dict[str, Any]) -> bool:
+        if after and (message["timestamp"], message["message_id"]) <= (as_utc(after[0]), after[1]):
+            return False
+        if "$gte" in bounds and message["timestamp"] < bounds["$gte"]:
+            return False
+        return not ("$lt" in bounds and message["timestamp"] >= bounds["$lt"])
+
+    def order(message: Dict[str, Any]) -> tuple:
+        return message["timestamp"], message["message_id"]
+
+    limit = max(1, min(limit, PAGE_SIZE_MAX))
+    # The first `limit` archived messages past the cursor; days overlap across sessions, so
+    # keep reading until the next day starts after the last message kept
+    archived, more = [], False
+    async for doc in db.chat_archive.find(archive_query).sort("first_timestamp", ASCENDING):
+        if len(archived) == limit and as_utc(doc["first_timestamp"]) > archived[-1]["timestamp"]:
+            more = True
+            break
+        archived.extend(message for message in unpack_messages(doc) if in_range(message))
+        archived.sort(key=order)
+        if len(archived) > limit:
+            more = True
+            del archived[limit:]
+    hot, hot_next = await keyset_page(db.chat_messages, query, "message_id", cursor, limit, None)
+    seen = {message["message_id"] for message in archived}
+    merged = sorted(archived + [message for message in hot if message["message_id"] not in seen], key=order)
+    more = more or bool(hot_next) or len(merged) > limit
+    page = merged[:limit]
+    next_cursor = encode_cursor(page[-1]["timestamp"], page[-1]["message_id"]) if more and page else None
+    page = [{name: value for name, value in message.items() if not fields or name in fields} for message in page]
+    return page, next_cursor
+
+
+async def session_history_page(
+    session_id: str, cursor: Optional[str], limit: int, fields: Optional[set]
+) -> tuple:
+    """keyset_page over a session's hot messages, reaching into db.chat_archive only for archived days"""
+    archive_query: Dict[str, Any] = {"session_id": session_id}
+    after = decode_cursor(cursor) if cursor else None
+    if after:
+        archive_query["last_timestamp"] = {"$gte": after[0]}
+    # Sessions with nothing archived past the cursor (nearly all of them) stay on the hot path
+    if not await db.chat_archive.find_one(archive_query, {"_id": 1}):
+        return await keyset_page(db.chat_messages, {"session_id": session_id}, "message_id", cursor, limit, fields)
+
+    limit = max(1, min(limit, PAGE_SIZE_MAX))
+    archived = []
+    async for doc in db.chat_archive.find(archive_query).sort("last_timestamp", ASCENDING):
+        for message in unpack_messages(doc):
+            if after and (message["timestamp"], message["message_id"]) <= (as_utc(after[0]), after[1]):
+                continue
+            archived.append(message)
+        if len(archived) > limit:
+            break
+    if len(archived) > limit:
+        page, more = archived[:limit], True
+    else:
+        # Archived days are older than anything still hot, so the page continues into hot storage
+        hot, hot_next = await keyset_page(
+            db.chat_messages, {"session_id": session_id}, "message_id", cursor, max(1, limit - len(archived)), None
+        )
+        seen = {message["message_id"] for message in archived}
+        hot = [message for message in hot if message["message_id"] not in seen]
+        page = (archived + hot)[:limit]
+        more = bool(hot_next) or len(archived) + len(hot) > limit
+    next_cursor = encode_cursor(page[-1]["timestamp"], page[-1]["message_id"]) if more and page else None
+    page = [{name: value for name, value in message.items() if not fields or name in fields} for message in page]
+    return page, next_cursor
@@ -0,0 +1,213 @@
+"""Knowledge retrieval: section index for the LLM prompt and the BM25 search index"""
+import re
+import math
+from typing import List, Optional, Dict, Any
+
+from .config import RAG_ENABLED, RAG_MIN_RELATIVE_SCORE, RAG_TOP_K
+from .knowledge_base import TOP_6_FAQS, WSSC_BASE_PERSONA, WSSC_KNOWLEDGE_BASE, WSSC_SYSTEM_MESSAGE
+from .faq import render_guidance, tokenize
+
+
+def render_section(data: Any, indent: str = "") -> str:
+    """Render a KB section as compact indented text (fewer tokens than JSON)"""
+    lines = []
+    if isinstance(data, dict):
+        for key, value in data.items():
+            label = key.replace("_", " ")
+            if isinstance(value, (dict, list)):
+                lines.append(f"{indent}{label}:")
+                lines.append(render_section(value, indent + "  "))
+            else:
+                lines.append(f"{indent}{label}: {value}")
+    elif isinstance(data, list):
+        for item in data:
+            if isinstance(item, dict):
+                lines.append(f"{indent}- " + "; ".join(f"{k.replace('_', ' ')}: {v}" for k, v in item.items()))
+            else:
+                lines.append(f"{indent}- {item}")
+    else:
+        lines.append(f"{indent}{data}")
+    return "\n".join(lines)
+
+
+class KnowledgeIndex:
+    """In-memory BM25 index over knowledge base documents, updatable one document at a time"""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.texts: Dict[str, str] = {}
+        # Token sequence per document, for phrase matching
+        self.tokens: Dict[str, List[str]] = {}
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.doc_len: Dict[str, int] = {}
+        self.total_len = 0
+        self.avg_len = 0.0
+
+    def add(self, doc_id: str, text: str):
+        if doc_id in self.texts:
+            self.remove(doc_id)
+        tokens = tokenize(text)
+        self.texts[doc_id] = text
+        self.tokens[doc_id] = tokens
+        self.doc_len[doc_id] = len(tokens)
+        self.total_len += len(tokens)
+        for token in tokens:
+            tf = self.postings.setdefault(token, {})
+            tf[doc_id] = tf.get(doc_id, 0) + 1
+        self.avg_len = self.total_len / len(self.doc_len)
+
+    def remove(self, doc_id: str):
+        tokens = self.tokens.pop(doc_id, None)
+        if tokens is None:
+            return
+        del self.texts[doc_id]
+        self.total_len -= self.doc_len.pop(doc_id)
+        for token in set(tokens):
+            postings = self.postings[token]
+            postings.pop(doc_id, None)
+            if not postings:
+                del self.postings[token]
+        self.avg_len = self.total_len / max(len(self.doc_len), 1)
+
+    def build(self, docs: Dict[str, str]):
+        self.texts, self.tokens, self.postings, self.doc_len = {}, {}, {}, {}
+        self.total_len = 0
+        for doc_id, text in docs.items():
+            self.add(doc_id, text)
+        return self
+
+    def update(self, docs: Dict[str, str]) -> tuple:
+        """Re-index only the documents that were added, changed or dropped; returns (indexed, removed)"""
+        removed = [doc_id for doc_id in self.texts if doc_id not in docs]
+        for doc_id in removed:
+            self.remove(doc_id)
+        changed = [doc_id for doc_id, text in docs.items() if self.texts.get(doc_id) != text]
+        for doc_id in changed:
+            self.add(doc_id, docs[doc_id])
+        return len(changed), len(removed)
+
+    def has_phrase(self, doc_id: str, phrase: List[str]) -> bool:
+        tokens = self.tokens.get(doc_id, [])
+        n = len(phrase)
+        return any(tokens[i:i + n] == phrase for i in range(len(tokens) - n + 1))
+
+    def search(
+        self, query: str, k: int = 3, phrases: List[List[str]] = (), doc_filter=None
+    ) -> List[tuple]:
+        """Return up to k (doc_id, score) pairs, best first; every phrase (token list) must appear in order"""
+        total = len(self.doc_len)
+        scores: Dict[str, float] = {}
+        for token in set(tokenize(query)):
+            postings = self.postings.get(token)
+            if not postings:
+                continue
+            idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, tf in postings.items():
+                if doc_filter and not doc_filter(doc_id):
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * self.doc_len[doc_id] / self.avg_len)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        if phrases:
+            scores = {
+                doc_id: score for doc_id, score in scores.items()
+                if all(self.has_phrase(doc_id, phrase) for phrase in phrases)
+            }
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+
+def knowledge_documents(sections: Dict[str, Any], top_faqs: Dict[str, Any]) -> Dict[str, str]:
+    """Turn KB sections and Top 6 FAQ guidance into retrievable prompt snippets"""
+    docs = {}
+    for name, data in sections.items():
+        title = name.replace("_", " ").upper()
+        docs[f"kb:{name}"] = f"{title}\n{render_section(data)}"
+    for key, faq in top_faqs.items():
+        docs[f"top6:{key}"] = (
+            f"HOW TO ANSWER \"{faq['question']}\" ({faq['category']})\n{render_guidance(faq['answer_guidance'])}"
+        )
+    return docs
+
+
+def knowledge_leaves(sections: Dict[str, Any], top_faqs: Dict[str, Any]) -> Dict[str, str]:
+    """JSON path -> indexed text for every leaf value, e.g. "billing.rate_structure" or "faqs[2].answer"
+
+    The text is prefixed with the leaf's key names so "customer service phone" finds the number.
+    """
+    leaves = {}
+
+    def walk(value: Any, path: str, keys: List[str]):
+        if isinstance(value, dict):
+            for key, child in value.items():
+                walk(child, f"{path}.{key}", keys + [key])
+        elif isinstance(value, list):
+            for i, child in enumerate(value):
+                walk(child, f"{path}[{i}]", keys)
+        elif value is not None:
+            label = " ".join(key.replace("_", " ") for key in keys[-2:])
+            leaves[path] = f"{label}: {str(value).strip()}"
+
+    for name, data in sections.items():
+        walk(data, name, [name])
+    walk(top_faqs, "top_6_faqs", ["top_6_faqs"])
+    return leaves
+
+
+def leaf_section(path: str) -> str:
+    return re.split(r"[.\[]", path, 1)[0]
+
+
+def knowledge_snippet(text: str, terms: List[str], width: int = 160) -> str:
+    """The leaf value, cut to a window around the first query term"""
+    value = text.split(": ", 1)[-1]
+    if len(value) <= width:
+        return value
+    found = re.search(r"\b(?:" + "|".join(re.escape(term) for term in terms) + ")", value, re.IGNORECASE) if terms else None
+    start = max(0, (found.start() if found else 0) - width // 4)
+    end = min(len(value), start + width)
+    return ("…" if start else "") + value[start:end].strip() + ("…" if end < len(value) else "")
+
+
+def search_knowledge(query: str, section: Optional[str] = None, limit: int = 10) -> List[Dict[str, Any]]:
+    """Ranked leaf matches from knowledge_search_index; "quoted phrases" in the query must match in order"""
+    phrases = [tokenize(phrase) for phrase in re.findall(r'"([^"]+)"', query)]
+    doc_filter = (lambda path: leaf_section(path) == section) if section else None
+    hits = knowledge_search_index.search(query.replace('"', " "), limit, [p for p in phrases if p], doc_filter)
+    terms = tokenize(query)
+    return [
+        {
+            "path": path,
+            "section": leaf_section(path),
+            "score": round(score, 3),
+            "snippet": knowledge_snippet(knowledge_search_index.texts[path], terms)
+        }
+        for path, score in hits
+    ]
+
+
+_seed_sections = {k: v for k, v in WSSC_KNOWLEDGE_BASE.items() if isinstance(v, (dict, list))}
+knowledge_index = KnowledgeIndex().build(knowledge_documents(_seed_sections, TOP_6_FAQS))
+# One document per leaf value, for /api/knowledge/search
+knowledge_search_index = KnowledgeIndex().build(knowledge_leaves(_seed_sections, TOP_6_FAQS))
+
+
+def build_system_prompt(message: str, conversation: str = "") -> str:
+    """Compact persona plus the top-k knowledge sections relevant to this message"""
+    if not RAG_ENABLED:
+        prompt = WSSC_SYSTEM_MESSAGE
+    else:
+        prompt = WSSC_BASE_PERSONA
+        hits = knowledge_index.search(message, RAG_TOP_K)
+        if hits:
+            # Drop weak tail matches that would only pad the prompt
+            cutoff = hits[0][1] * RAG_MIN_RELATIVE_SCORE
+            context = "\n\n".join(knowledge_index.texts[doc_id] for doc_id, score in hits if score >= cutoff)
+            prompt += (
+                "\n===========================================\n"
+                "RELEVANT KNOWLEDGE BASE SECTIONS:\n"
+                "===========================================\n\n"
+                f"{context}\n"
+            )
+    if conversation:
+        prompt += f"\n{conversation}\n"
+    return prompt
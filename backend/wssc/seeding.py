@@ -0,0 +1,162 @@
+"""Knowledge base and AI config seeding"""
+import logging
+import time
+import json
+import hashlib
+from typing import Dict, Any
+from datetime import datetime, timezone
+
+from .database import db
+from .knowledge_base import TOP_6_FAQS, WSSC_KNOWLEDGE_BASE, WSSC_SYSTEM_MESSAGE
+from .retrieval import knowledge_documents, knowledge_index, knowledge_leaves, knowledge_search_index
+from .response_cache import compute_kb_version, response_cache
+from .api_cache import api_cache
+
+logger = logging.getLogger(__name__)
+
+
+# Sections stored individually (as wssc_<name>) for quick lookup
+KNOWLEDGE_SECTIONS = [
+    "organization", "contact_info", "billing", "payment_options", "assistance_programs",
+    "billing_adjustments", "emergencies", "water_quality", "leak_detection", "permits",
+    "online_services", "faqs", "statistics"
+]
+
+
+def content_hash(data: Any) -> str:
+    """Stable hash of JSON-able content (key order doesn't matter)"""
+    return hashlib.sha256(json.dumps(data, sort_keys=True, ensure_ascii=False).encode()).hexdigest()
+
+
+def knowledge_seed_documents() -> Dict[str, Any]:
+    """knowledge_base type -> data for everything init_knowledge_base stores"""
+    docs = {"wssc_main": WSSC_KNOWLEDGE_BASE}
+    for section in KNOWLEDGE_SECTIONS:
+        docs[f"wssc_{section}"] = WSSC_KNOWLEDGE_BASE[section]
+    docs["top_6_faqs"] = TOP_6_FAQS
+    return docs
+
+
+async def init_knowledge_base():
+    """Initialize WSSC knowledge base in MongoDB, writing only sections whose content changed"""
+    from pymongo import UpdateOne
+
+    try:
+        started = time.perf_counter()
+        seed = knowledge_seed_documents()
+        hashes = {doc_type: content_hash(data) for doc_type, data in seed.items()}
+        
+        # One round-trip to find out what is already stored
+        stored = {}
+        async for doc in db.knowledge_base.find({"type": {"$in": list(seed)}}, {"_id": 0, "type": 1, "content_hash": 1}):
+            stored[doc["type"]] = doc.get("content_hash")
+        
+        now = datetime.now(timezone.utc).isoformat()
+        changes = [
+            UpdateOne(
+                {"type": doc_type},
+                {
+                    "$set": {"type": doc_type, "data": seed[doc_type], "content_hash": hashes[doc_type], "updated_at": now},
+                    "$setOnInsert": {"created_at": now}
+                },
+                upsert=True
+            )
+            for doc_type in seed
+            if stored.get(doc_type) != hashes[doc_type]
+        ]
+        if changes:
+            await db.knowledge_base.bulk_write(changes, ordered=False)
+            api_cache.invalidate()
+        
+        elapsed = (time.perf_counter() - started) * 1000
+        logger.info(f"Knowledge base seeding: {len(changes)} of {len(seed)} documents changed in {elapsed:.1f}ms")
+        
+        # Cached answers may quote old KB content
+        await response_cache.invalidate(compute_kb_version())
+        
+    except Exception as e:
+        logger.error(f"Error initializing knowledge base: {e}")
+
+
+async def init_ai_config():
+    """Initialize AI training config in MongoDB"""
+    try:
+        ai_config = {
+            "config_id": "wssc_ai_v3",
+            "name": "WSSC Water AI Assistant",
+            "version": "3.0",
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "updated_at": datetime.now(timezone.utc).isoformat(),
+            "system_message": WSSC_SYSTEM_MESSAGE,
+            
+            "personality": {
+                "tone": "friendly, warm, helpful, conversational",
+                "style": "like talking to a helpful friend",
+                "empathy_level": "high",
+                "formality": "casual but professional"
+            },
+            
+            "response_rules": {
+                "max_paragraphs": 3,
+                "use_bullets": True,
+                "use_emojis": False,
+                "only_smiley_face": True,
+                "mobile_optimized": True,
+                "always_ask_feedback": True,
+                "feedback_ending": "Was this helpful? Need anything else? 😊"
+            },
+            
+            "top_6_questions": list(TOP_6_FAQS.keys()),
+            
+            "feedback_prompts": {
+                "after_response": "Was this helpful? Need anything else? 😊",
+                "no_response_timeout": "I didn't see a response - I hopefully answered your questions. Have a great day!",
+                "positive_feedback": "Great! Is there anything else I can help with? 😊",
+                "needs_more_info": "No problem! Let me give you more details..."
+            },
+            
+            "knowledge_base_reference": "wssc_main",
+            "goal": "Reduce call center volume by providing quick, accurate, friendly answers using official WSSC data"
+        }
+        
+        # Timestamps aside, skip the write when the stored config is identical
+        created_at = ai_config.pop("created_at")
+        ai_config["content_hash"] = content_hash({k: v for k, v in ai_config.items() if k != "updated_at"})
+        existing = await db.ai_config.find_one({"config_id": "wssc_ai_v3"}, {"_id": 0, "content_hash": 1})
+        if existing and existing.get("content_hash") == ai_config["content_hash"]:
+            logger.info("AI config v3 unchanged - skipped write")
+            return
+        
+        await db.ai_config.update_one(
+            {"config_id": "wssc_ai_v3"},
+            {"$set": ai_config, "$setOnInsert": {"created_at": created_at}},
+            upsert=True
+        )
+        logger.info("AI config v3 with Top 6 FAQs saved to MongoDB")
+        api_cache.invalidate()
+        
+    except Exception as e:
+        logger.error(f"Error initializing AI config: {e}")
+
+
+async def refresh_knowledge_index():
+    """Rebuild the retrieval index from the sections stored in MongoDB"""
+    try:
+        sections = {}
+        top_faqs = TOP_6_FAQS
+        async for doc in db.knowledge_base.find({}, {"_id": 0}):
+            doc_type = doc.get("type", "")
+            if doc_type == "top_6_faqs":
+                top_faqs = doc.get("data") or TOP_6_FAQS
+            elif doc_type.startswith("wssc_") and doc_type != "wssc_main":
+                sections[doc_type[len("wssc_"):]] = doc.get("data")
+        if sections:
+            knowledge_index.build(knowledge_documents(sections, top_faqs))
+            # Only leaves whose text changed since the last refresh are re-tokenized
+            indexed, removed = knowledge_search_index.update(knowledge_leaves(sections, top_faqs))
+            logger.info(
+                f"Knowledge retrieval index built from {len(sections)} MongoDB sections "
+                f"(search index: {indexed} leaves re-indexed, {removed} removed)"
+            )
+    except Exception as e:
+        logger.error(f"Error refreshing knowledge index: {e}")
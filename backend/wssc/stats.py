@@ -0,0 +1,115 @@
+"""Usage statistics: running totals, hourly/daily rollups and the distinct-session estimate"""
+import logging
+import math
+import hashlib
+from typing import List, Dict, Any
+from datetime import datetime, timezone
+
+from .database import db
+from .write_behind import write_queue
+
+logger = logging.getLogger(__name__)
+
+
+HLL_PRECISION = 11
+HLL_REGISTERS = 1 << HLL_PRECISION
+
+
+def hll_register(value: str) -> tuple:
+    """HyperLogLog (register index, rank) for a value"""
+    h = int.from_bytes(hashlib.md5(value.encode()).digest()[:8], "big")
+    index = h >> (64 - HLL_PRECISION)
+    rest = h & ((1 << (64 - HLL_PRECISION)) - 1)
+    rank = (64 - HLL_PRECISION) - rest.bit_length() + 1
+    return index, rank
+
+
+def hll_estimate(registers: Dict[str, int]) -> int:
+    """Approximate distinct count (~2% error) from stored registers"""
+    m = HLL_REGISTERS
+    alpha = 0.7213 / (1 + 1.079 / m)
+    zeros = m - len(registers)
+    harmonic = zeros + sum(2.0 ** -rank for rank in registers.values())
+    estimate = alpha * m * m / harmonic
+    if estimate <= 2.5 * m and zeros:
+        estimate = m * math.log(m / zeros)
+    return int(round(estimate))
+
+
+def stats_bucket_ids(now: datetime = None) -> List[str]:
+    """ai_stats documents a write counts towards: running totals plus hourly and daily rollups"""
+    now = now or datetime.now(timezone.utc)
+    return ["totals", f"hour:{now.strftime('%Y-%m-%dT%H')}", f"day:{now.strftime('%Y-%m-%d')}"]
+
+
+async def record_stats(inc: Dict[str, int], session_id: str = None):
+    """Add counter deltas (and the session to the distinct estimate) to every stats bucket"""
+    update: Dict[str, Any] = {"$inc": inc}
+    if session_id:
+        index, rank = hll_register(session_id)
+        update["$max"] = {f"hll.{index}": rank}
+    for bucket_id in stats_bucket_ids():
+        await write_queue.put(
+            "ai_stats", "update",
+            filter={"_id": bucket_id},
+            update=update,
+            upsert=True,
+            key=f"ai_stats:{bucket_id}",
+            merge=True
+        )
+
+
+def summarize_stats_doc(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Turn a stored ai_stats bucket into the public stats shape"""
+    messages = doc.get("messages", {})
+    feedback = doc.get("feedback", {})
+    helpful = feedback.get("helpful", 0)
+    not_helpful = feedback.get("not_helpful", 0)
+    return {
+        "total_messages": messages.get("total", 0),
+        "total_sessions": hll_estimate(doc.get("hll", {})),
+        "messages_by_source": doc.get("sources", {}),
+        "feedback": {
+            "helpful": helpful,
+            "not_helpful": not_helpful,
+            "needs_more_info": feedback.get("needs_more_info", 0),
+            "satisfaction_rate": f"{(helpful / max(helpful + not_helpful, 1)) * 100:.1f}%"
+        }
+    }
+
+
+async def backfill_stats():
+    """Fold existing collections into the totals document, once (recorded in db.migrations)"""
+    try:
+        if await db.migrations.find_one({"_id": "stats_backfill"}):
+            return
+        # So every counted message and feedback is in the collections before they are counted
+        await write_queue.flush()
+        registers: Dict[str, int] = {}
+        # Stream distinct sessions through a cursor - distinct() would hit the 16MB limit
+        async for group in db.chat_messages.aggregate([{"$group": {"_id": "$session_id"}}], allowDiskUse=True):
+            index, rank = hll_register(str(group["_id"]))
+            registers[str(index)] = max(registers.get(str(index), 0), rank)
+        counts = {
+            "messages.total": await db.chat_messages.count_documents({}),
+            "messages.user": await db.chat_messages.count_documents({"role": "user"}),
+            "messages.assistant": await db.chat_messages.count_documents({"role": "assistant"}),
+            "feedback.helpful": await db.feedback.count_documents({"helpful": True}),
+            "feedback.not_helpful": await db.feedback.count_documents({"helpful": False}),
+            "feedback.needs_more_info": await db.feedback.count_documents({"needs_more_info": True})
+        }
+        # totals may already exist with only the live increments since a newer worker started;
+        # the counts cover those messages too, and $max keeps whichever is larger
+        await db.ai_stats.update_one(
+            {"_id": "totals"},
+            {"$max": {**counts, **{f"hll.{index}": rank for index, rank in registers.items()}}},
+            upsert=True
+        )
+        await db.migrations.update_one(
+            {"_id": "stats_backfill"},
+            {"$set": {"messages": counts["messages.total"], "completed_at": datetime.now(timezone.utc)}},
+            upsert=True
+        )
+        logger.info(f"Backfilled usage statistics ({counts['messages.total']} messages)")
+    except Exception as e:
+        logger.error(f"Error backfilling stats: {e}")
@@ -0,0 +1,90 @@
+"""In-process counters summed across workers"""
+import logging
+from typing import Dict, Any
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from .config import WORKER_ID, WORKER_STATS_INTERVAL
+from .metrics import mongo_op_counter
+from .database import db
+from .faq import chat_path_counts
+from .llm import llm_admission, LlmAdmissionController
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerStats:
+    """Publishes this worker's chat path, LLM admission and Mongo op counters to db.worker_stats.
+
+    Each worker upserts its own document every interval and /api/ai/stats adds up the
+    ones refreshed within the last three intervals, so it reports every live worker
+    rather than whichever one served the request. A TTL index clears out dead workers.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.stats = {"published": 0, "errors": 0}
+        self._task = None
+
+    def local(self) -> Dict[str, Any]:
+        return {
+            "chat_paths": dict(chat_path_counts),
+            "llm_admission": llm_admission.counters(),
+            "mongo_ops": dict(mongo_op_counter.counts)
+        }
+
+    def start(self):
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            try:
+                # Its gauges (queue depth, in flight) stop counting straight away
+                await db.worker_stats.delete_one({"_id": WORKER_ID})
+            except Exception as e:
+                logger.error(f"Error removing worker stats: {e}")
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.publish()
+
+    async def publish(self):
+        try:
+            await db.worker_stats.replace_one(
+                {"_id": WORKER_ID}, {**self.local(), "updated_at": datetime.now(timezone.utc)}, upsert=True
+            )
+            self.stats["published"] += 1
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.error(f"Error publishing worker stats: {e}")
+
+    async def combined(self) -> Dict[str, Any]:
+        """Counters summed over every live worker (this one's current values, not its last publish)"""
+        views = [self.local()]
+        try:
+            cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.interval * 3)
+            views += await db.worker_stats.find(
+                {"_id": {"$ne": WORKER_ID}, "updated_at": {"$gte": cutoff}}, {"_id": 0, "updated_at": 0}
+            ).to_list(None)
+        except Exception as e:
+            logger.error(f"Error reading worker stats: {e}")
+        totals: Dict[str, Dict[str, Any]] = {"chat_paths": {}, "llm_admission": {}, "mongo_ops": {}}
+        for view in views:
+            for group, counts in totals.items():
+                for name, value in view.get(group, {}).items():
+                    if name == "max_wait_ms":
+                        counts[name] = max(counts.get(name, 0.0), value)
+                    else:
+                        counts[name] = counts.get(name, 0) + value
+        totals["llm_admission"] = LlmAdmissionController.summarize(totals["llm_admission"])
+        return {"workers": len(views), **totals}
+
+
+worker_stats = WorkerStats(WORKER_STATS_INTERVAL)
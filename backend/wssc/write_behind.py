@@ -0,0 +1,345 @@
+"""Write-behind persistence for chat, feedback and stats writes"""
+import logging
+import os
+import fcntl
+import time
+import uuid
+from pathlib import Path
+from typing import List, Optional, Dict, Any
+import asyncio
+from datetime import datetime, timezone
+
+from .config import (
+    WRITE_BEHIND_BATCH_SIZE, WRITE_BEHIND_ENABLED, WRITE_BEHIND_FLUSH_INTERVAL, WRITE_BEHIND_MAX_ATTEMPTS,
+    WRITE_BEHIND_MAX_PENDING, WRITE_BEHIND_SPOOL_DIR
+)
+from .metrics import WRITE_BEHIND_BUFFERED, WRITE_BEHIND_FLUSH_LATENCY
+from .database import db
+
+logger = logging.getLogger(__name__)
+
+# Counter documents remember this many recently applied write ids, so a replay doesn't count twice
+APPLIED_WRITES_KEPT = 50
+
+
+def merge_counter_updates(first: Dict[str, Any], second: Dict[str, Any]) -> Dict[str, Any]:
+    """Combine two {$inc, $max} update documents into one"""
+    merged = {op: dict(fields) for op, fields in first.items()}
+    for field, value in second.get("$inc", {}).items():
+        incs = merged.setdefault("$inc", {})
+        incs[field] = incs.get(field, 0) + value
+    for field, value in second.get("$max", {}).items():
+        maxes = merged.setdefault("$max", {})
+        maxes[field] = max(maxes.get(field, value), value)
+    return merged
+
+
+def coalesce(ops: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """One write per (collection, key): counter updates add up, other updates supersede earlier ones"""
+    entries: Dict[tuple, Dict[str, Any]] = {}
+    for i, entry in enumerate(ops):
+        key = (entry["collection"], entry.get("key") or i)
+        previous = entries.pop(key, None)
+        entry = {**entry, "ops": entry.get("ops", 1)}
+        if previous:
+            entry["ops"] += previous["ops"]
+            if entry.get("merge"):
+                # Keeps the first write's id, so replaying the same spool file merges to the same id
+                entry["id"] = previous.get("id", entry.get("id"))
+                entry["update"] = merge_counter_updates(previous["update"], entry["update"])
+        entries[key] = entry
+    return list(entries.values())
+
+
+def write_request(entry: Dict[str, Any]):
+    from pymongo import InsertOne, UpdateOne
+
+    if entry["op"] == "insert":
+        return InsertOne(dict(entry["doc"]))
+    query, update = entry["filter"], entry["update"]
+    if entry.get("id"):
+        # Applied at most once: once the id is recorded a replay no longer matches (and its upsert collides)
+        query = {**query, "applied_writes": {"$ne": entry["id"]}}
+        applied = {"applied_writes": {"$each": [entry["id"]], "$slice": -APPLIED_WRITES_KEPT}}
+        update = {**update, "$push": {**update.get("$push", {}), **applied}}
+    return UpdateOne(query, update, upsert=entry.get("upsert", False))
+
+
+class WriteBehindQueue:
+    """Batches MongoDB writes and flushes them with bulk_write on a size or time trigger.
+
+    Every op is appended to a local spool file before put() returns, and the spool
+    is only deleted once MongoDB acknowledged the batch, so a crash loses nothing
+    that was accepted. Each collection is acknowledged on its own and the spool is
+    cut down to what is still unwritten. Leftover spool files are replayed on
+    start(); replayed inserts that already landed are skipped as duplicate keys,
+    and counter updates carry an id the target document records. An op MongoDB
+    rejects WRITE_BEHIND_MAX_ATTEMPTS times moves to dead-letter.jsonl so the
+    writes behind it aren't held up.
+    """
+
+    def __init__(self, spool_dir: Path, batch_size: int, flush_interval: float, max_pending: int):
+        self.spool_dir = spool_dir
+        self.worker_dir = spool_dir
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.buffer: List[Dict[str, Any]] = []
+        self.pending: List[tuple] = []
+        self.stats = {"enqueued": 0, "flushed": 0, "batches": 0, "errors": 0, "replayed": 0, "dead_lettered": 0}
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._spool = None
+        self._lock_file = None
+        self._codec = None
+        self._task = None
+
+    @property
+    def _current_path(self) -> Path:
+        return self.worker_dir / "current.jsonl"
+
+    def _rotate(self) -> Path:
+        """Close the current spool file and move it aside as an immutable batch"""
+        if self._spool:
+            self._spool.close()
+        rotated = self.worker_dir / f"batch-{time.time_ns()}.jsonl"
+        if self._current_path.exists():
+            os.replace(self._current_path, rotated)
+        self._spool = open(self._current_path, "a", encoding="utf-8")
+        return rotated
+
+    def _adopt(self, directory: Path):
+        """Move a dead worker's spool files into ours so they get replayed"""
+        for path in sorted(directory.glob("batch-*.jsonl")) + [directory / "current.jsonl"]:
+            try:
+                os.replace(path, self.worker_dir / f"batch-{time.time_ns()}.jsonl")
+            except FileNotFoundError:
+                pass
+
+    def _claim_spool(self):
+        """Take a spool directory of our own (flock held while we live) and adopt orphaned ones"""
+        self.worker_dir = self.spool_dir / f"worker-{os.getpid()}"
+        self.worker_dir.mkdir(parents=True, exist_ok=True)
+        self._lock_file = open(self.worker_dir / ".lock", "w")
+        fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        # Files from before per-worker directories
+        self._adopt(self.spool_dir)
+        for directory in self.spool_dir.glob("worker-*"):
+            if directory == self.worker_dir:
+                continue
+            try:
+                with open(directory / ".lock", "a") as lock:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    self._adopt(directory)
+                    (directory / ".lock").unlink(missing_ok=True)
+                    directory.rmdir()
+            except (BlockingIOError, FileNotFoundError, OSError):
+                # Still owned by a live worker, or another worker adopted it first
+                continue
+
+    @property
+    def codec(self):
+        """Extended JSON so datetimes survive a replay as BSON dates (bson loads on first spool write)"""
+        if self._codec is None:
+            from bson import json_util
+            self._codec = json_util
+        return self._codec
+
+    async def start(self):
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        self._slots = asyncio.Semaphore(self.max_pending)
+        self._wakeup = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._claim_spool()
+        self._rotate()
+        # Anything left from a previous process still has to reach MongoDB
+        for path in sorted(self.worker_dir.glob("batch-*.jsonl")):
+            with open(path, encoding="utf-8") as f:
+                ops = [self.codec.loads(line) for line in f if line.strip()]
+            if ops:
+                self.pending.append((path, coalesce(ops), 0))
+                self.stats["replayed"] += len(ops)
+            else:
+                path.unlink(missing_ok=True)
+        if self.stats["replayed"]:
+            logger.info(f"Replaying {self.stats['replayed']} spooled writes from a previous run")
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+        if self._spool:
+            self._spool.close()
+            self._spool = None
+        if self._lock_file:
+            self._lock_file.close()
+            self._lock_file = None
+        if self.pending:
+            logger.warning(f"{sum(len(entries) for _, entries, _ in self.pending)} writes left in spool for next start")
+        elif self.worker_dir != self.spool_dir:
+            # Clean exit - nothing for the next start to adopt
+            for path in (self._current_path, self.worker_dir / ".lock"):
+                path.unlink(missing_ok=True)
+            try:
+                self.worker_dir.rmdir()
+            except OSError:
+                pass
+
+    async def put(self, collection: str, op: str, **fields):
+        """Queue an insert ('doc') or update ('filter', 'update', 'upsert', optional coalescing 'key')
+
+        Counter updates ('merge') and other updates that mustn't repeat on a replay ('once')
+        get an id the target document records.
+        """
+        entry = {"collection": collection, "op": op, **fields}
+        if fields.get("merge") or fields.get("once"):
+            entry["id"] = uuid.uuid4().hex
+        if not WRITE_BEHIND_ENABLED or self._spool is None:
+            remaining, error = await self._write(coalesce([entry]))
+            if remaining:
+                raise error
+            return
+        # Backpressure: wait for MongoDB to catch up once max_pending writes are outstanding
+        await self._slots.acquire()
+        self.buffer.append(entry)
+        WRITE_BEHIND_BUFFERED.set(len(self.buffer))
+        self._spool.write(self.codec.dumps(entry) + "\n")
+        self._spool.flush()
+        self.stats["enqueued"] += 1
+        if len(self.buffer) >= self.batch_size:
+            self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self):
+        if self._lock is None:
+            return
+        async with self._lock:
+            if self.buffer:
+                self.pending.append((self._rotate(), coalesce(self.buffer), len(self.buffer)))
+                self.buffer = []
+                WRITE_BEHIND_BUFFERED.set(0)
+            while self.pending:
+                path, entries, slots = self.pending[0]
+                with WRITE_BEHIND_FLUSH_LATENCY.time():
+                    remaining, error = await self._write(entries)
+                self.stats["flushed"] += sum(e["ops"] for e in entries) - sum(e["ops"] for e in remaining)
+                kept = []
+                for entry in remaining:
+                    if entry.get("attempts", 0) >= WRITE_BEHIND_MAX_ATTEMPTS:
+                        self._dead_letter(entry)
+                    else:
+                        kept.append(entry)
+                if kept:
+                    # Keep what is unwritten (and its spool file) and retry on the next tick
+                    self.stats["errors"] += 1
+                    logger.error(f"Error flushing {len(kept)} of {len(entries)} queued writes: {error}")
+                    if len(kept) < len(entries):
+                        self._respool(path, kept)
+                    self.pending[0] = (path, kept, slots)
+                    return
+                self.pending.pop(0)
+                path.unlink(missing_ok=True)
+                for _ in range(slots):
+                    self._slots.release()
+                self.stats["batches"] += 1
+
+    def _respool(self, path: Path, entries: List[Dict[str, Any]]):
+        """Cut a batch's spool file down to the writes that still have to reach MongoDB"""
+        partial = path.with_suffix(".partial")
+        with open(partial, "w", encoding="utf-8") as f:
+            f.writelines(self.codec.dumps(entry) + "\n" for entry in entries)
+        os.replace(partial, path)
+
+    def _dead_letter(self, entry: Dict[str, Any]):
+        """Set aside a write MongoDB keeps rejecting, so the ones queued behind it go through"""
+        path = self.spool_dir / "dead-letter.jsonl"
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(self.codec.dumps({**entry, "failed_at": datetime.now(timezone.utc)}) + "\n")
+        self.stats["dead_lettered"] += entry["ops"]
+        logger.error(
+            f"Moved a {entry['collection']} {entry['op']} to {path} after {entry['attempts']} attempts: {entry['error']}"
+        )
+
+    async def _write(self, entries: List[Dict[str, Any]]) -> tuple:
+        """Write entries with one unordered bulk_write per collection; returns (entries still to write, last error).
+
+        Entries MongoDB rejected come back with their attempts counted; if MongoDB is
+        unreachable, that collection and the ones after it come back unchanged.
+        """
+        from pymongo.errors import ConnectionFailure
+
+        by_collection: Dict[str, List[Dict[str, Any]]] = {}
+        for entry in entries:
+            by_collection.setdefault(entry["collection"], []).append(entry)
+        groups = list(by_collection.items())
+        remaining, error = [], None
+        for n, (name, group) in enumerate(groups):
+            try:
+                failed = await self._write_collection(name, group)
+            except ConnectionFailure as e:
+                return remaining + [entry for _, rest in groups[n:] for entry in rest], e
+            for entry, e in failed:
+                remaining.append({**entry, "attempts": entry.get("attempts", 0) + 1, "error": str(e)})
+                error = e
+        return remaining, error
+
+    async def _write_collection(self, name: str, group: List[Dict[str, Any]], recheck: bool = True) -> List[tuple]:
+        """bulk_write one collection's entries; returns (entry, error) for each one MongoDB rejected"""
+        from pymongo.errors import BulkWriteError, ConnectionFailure, WriteError
+
+        try:
+            await db[name].bulk_write([write_request(entry) for entry in group], ordered=False)
+            return []
+        except BulkWriteError as e:
+            if e.details.get("writeConcernErrors"):
+                # Applied but not acknowledged by enough members - retry them all (replays are idempotent)
+                return [(entry, e) for entry in group]
+            failed, duplicates = [], []
+            for err in e.details.get("writeErrors", []):
+                entry = group[err["index"]]
+                if err.get("code") != 11000:
+                    failed.append((entry, WriteError(err.get("errmsg"), err.get("code"), err)))
+                elif entry["op"] == "update" and recheck:
+                    duplicates.append(entry)
+            if duplicates:
+                # An upsert collides when another worker created the document first, or (with an id)
+                # when this write was already applied; the retry matches in the first case and collides again in the second
+                failed += await self._write_collection(name, duplicates, recheck=False)
+            return failed
+        except ConnectionFailure:
+            raise
+        except Exception as e:
+            # Rejected before reaching MongoDB (e.g. DocumentTooLarge): write one at a time to find the culprit
+            if len(group) == 1:
+                return [(group[0], e)]
+            failed = []
+            for entry in group:
+                failed += await self._write_collection(name, [entry], recheck)
+            return failed
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "buffered": len(self.buffer),
+            "pending_batches": len(self.pending)
+        }
+
+
+write_queue = WriteBehindQueue(
+    WRITE_BEHIND_SPOOL_DIR, WRITE_BEHIND_BATCH_SIZE, WRITE_BEHIND_FLUSH_INTERVAL, WRITE_BEHIND_MAX_PENDING
+)